@@ -1,9 +1,15 @@
 from transformers import AutoTokenizer, AutoModelForCausalLM
 import spacy
-import dateparser
 import json
 import re
 
+try:
+    from backend.date_normalizer import normalize_time
+    from backend.canvas_fixtures import assignments, assignments2
+except ImportError:  # running from inside backend/
+    from date_normalizer import normalize_time
+    from canvas_fixtures import assignments, assignments2
+
 #    python -m spacy download en_core_web_trf 
 
 ##### NER ######
@@ -138,22 +144,37 @@ def mark_time_tokens(text: str):
         marked_blocks.append(f"<ASSIGNMENT>{marked_block}</ASSIGNMENT>")
     return "\n".join(marked_blocks)
 
-def normalize_time(text: str):
-    """Normalize raw time expressions into (date, time)."""
-    dt = dateparser.parse(text)
-    if not dt:
-        return None, None
-    date_str = dt.strftime("%Y-%m-%d")
-    time_str = dt.strftime("%H:%M") if (dt.hour or dt.minute) else None
-    return date_str, time_str
-
-def mark_tags(text: str):
+def prepare_block(block: str):
     """
-    Mark assignments text with NER tags:
-    - <ASSIGNMENT>...</ASSIGNMENT> around each assignment block
-    - <ASSIGNMENT_NAME>...</ASSIGNMENT_NAME> for the assignment title
-    - <IGNORE>...</IGNORE> for 'Not available' lines and grading lines
-    - <DUE><DATE>...</DATE> <TIME>...</TIME></DUE> for due dates/times
+    Steps 1-2 of mark_tags for a single raw block: tag ignore lines and the
+    assignment name. Returns None for blocks that should be dropped.
+    """
+    print("Block:", block)
+    if not block.strip():
+        return None
+    if block.strip() in ["Assignment", "Quiz"]:
+        return None
+    lines = block.split("\n")
+    # Step 1: mark "Not available" and grading/points lines
+    for i, line in enumerate(lines):
+        if ("not available" in line.lower()) or ("points possible" in line.lower()) or ("no submission" in line.lower()) or ("available until" in line.lower()):
+            lines[i] = f"<IGNORE>{line}</IGNORE>"
+    #Step 1.5: remove lines that are exactly "Assignment" or "Quiz"
+    for i, line in enumerate(lines):
+        if re.fullmatch(r'\s*(Assignment|Quiz)\s*', line, flags=re.IGNORECASE):
+            lines[i] = ""   # delete only if the line is exactly "Assignment" or "Quiz"
+    # Step 2: wrap assignment name (first non-empty line not ignored)
+    for i, line in enumerate(lines):
+        if line.strip() and not ((line == "Assignment") or (line == "Quiz") or line.lower().startswith("due")) and "<IGNORE>" not in line:
+            print("170", line)
+            lines[i] = f"<ASSIGNMENT_NAME>{line.strip()}</ASSIGNMENT_NAME>"
+            break
+    return "\n".join(lines)
+
+def tag_block(block_text: str, doc):
+    """
+    Steps 3-5 of mark_tags: turn the spaCy entities of a prepared block
+    (plus the month regex safeguard) into <DUE> tags and wrap the block.
     """
     def inside_tag(text, start, end, tag):
         pattern = fr"<{tag}>(.*?)</{tag}>"
@@ -162,97 +183,89 @@ def mark_tags(text: str):
                 return True
         return False
 
-   #blocks = re.split(r'(?=Assignment\b)', text)
-    blocks = re.split(r'(?=(Assignment|Quiz)\b)', text)
-    #blocks = re.split(r'(?:Assignment|Quiz)\b', text)
-    marked_blocks = []
-    for block in blocks:
-        print("Block:", block)
-        if not block.strip():
+    # Step 3: spaCy DATE/TIME entities
+    ents = list(doc.ents)
+    merged = []
+    skip_next = False
+    for i, ent in enumerate(ents):
+        if skip_next:
+            skip_next = False
             continue
-        if block.strip() in ["Assignment", "Quiz"]:
+        # CARDINAL/ORDINAL/MONEY etc. would be parsed into bogus dates
+        if ent.label_ not in ("DATE", "TIME"):
             continue
-        lines = block.split("\n")
-        # Step 1: mark "Not available" and grading/points lines
-        for i, line in enumerate(lines):
-            if ("not available" in line.lower()) or ("points possible" in line.lower()) or ("no submission" in line.lower()) or ("available until" in line.lower()):
-                lines[i] = f"<IGNORE>{line}</IGNORE>"
-        #Step 1.5: remove lines that are exactly "Assignment" or "Quiz"
-        for i, line in enumerate(lines):
-            if re.fullmatch(r'\s*(Assignment|Quiz)\s*', line, flags=re.IGNORECASE):
-                lines[i] = ""   # delete only if the line is exactly "Assignment" or "Quiz"
-        # Step 2: wrap assignment name (first non-empty line not ignored)
-        for i, line in enumerate(lines):
-            if line.strip() and not ((line == "Assignment") or (line == "Quiz") or line.lower().startswith("due")) and "<IGNORE>" not in line:
-                print("170", line)
-                lines[i] = f"<ASSIGNMENT_NAME>{line.strip()}</ASSIGNMENT_NAME>"
-                break
-        block_text = "\n".join(lines)
-        # Step 3: spaCy DATE/TIME entities
-        doc = nlp_token_extractor(block_text)
-        ents = list(doc.ents)
-        merged = []
-        skip_next = False
-        for i, ent in enumerate(ents):
-            if skip_next:
-                skip_next = False
-                continue
-            # Skip entities inside <IGNORE> and <ASSIGNMENT_NAME>
-            print("Checking entity:", ent.text, ent.label_, "in text:", block_text[ent.start_char:ent.end_char])
-            print("block text:", block_text)
-            if inside_tag(block_text, ent.start_char, ent.end_char, "IGNORE") \
-                or inside_tag(block_text, ent.start_char, ent.end_char, "ASSIGNMENT_NAME"):
-                print("Skipping entity inside IGNORE or ASSIGNMENT_NAME:", ent.text)
+        # Skip entities inside <IGNORE> and <ASSIGNMENT_NAME>
+        print("Checking entity:", ent.text, ent.label_, "in text:", block_text[ent.start_char:ent.end_char])
+        print("block text:", block_text)
+        if inside_tag(block_text, ent.start_char, ent.end_char, "IGNORE") \
+            or inside_tag(block_text, ent.start_char, ent.end_char, "ASSIGNMENT_NAME"):
+            print("Skipping entity inside IGNORE or ASSIGNMENT_NAME:", ent.text)
             continue
-            # Merge DATE + TIME
-            if ent.label_ == "DATE" and i + 1 < len(ents) and ents[i+1].label_ == "TIME":
-                merged.append({
-                    "text": block_text[ent.start_char:ents[i+1].end_char],
-                    "start": ent.start_char,
-                    "end": ents[i+1].end_char
-                })
-                skip_next = True
-            else:
-                merged.append({
-                    "text": ent.text,
-                    "start": ent.start_char,
-                    "end": ent.end_char
-                })
-        # Step 4: replace spaCy entities and wrap in <DUE>
-        marked_block = block_text
-        offset = 0
-        for m in merged:
-            date_str, time_str = normalize_time(m["text"])
-            if not date_str and not time_str:
-                continue
-            start = m["start"] + offset
-            end = m["end"] + offset
-            parts = []
-            if date_str:
-                parts.append(f"<DATE>{date_str}</DATE>")
-            if time_str:
-                parts.append(f"<TIME>{time_str}</TIME>")
-            replacement = "<DUE>" + " ".join(parts) + "</DUE>"
-            marked_block = marked_block[:start] + replacement + marked_block[end:]
-            offset += len(replacement) - (end - start)
-        # Step 5: regex safeguard for anything SpaCy missed
-        def regex_replace_due(match):
-            d, t = normalize_time(match.group(0))
-            if not d and not t:
-                return match.group(0)
-            parts = []
-            if d:
-                parts.append(f"<DATE>{d}</DATE>")
-            if t:
-                parts.append(f"<TIME>{t}</TIME>")
-            return "<DUE>" + " ".join(parts) + "</DUE>"
-        marked_block = re.sub(
-            r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2}(?: at \d{1,2}:\d{2}\s?(?:am|pm))?\b',
-            regex_replace_due,
-            marked_block,
-            flags=re.IGNORECASE
-        )
-        marked_blocks.append(f"<ASSIGNMENT>{marked_block}</ASSIGNMENT>")
+        # Merge DATE + TIME; a TIME without a DATE would get today's date
+        if ent.label_ == "DATE" and i + 1 < len(ents) and ents[i+1].label_ == "TIME":
+            merged.append({
+                "text": block_text[ent.start_char:ents[i+1].end_char],
+                "start": ent.start_char,
+                "end": ents[i+1].end_char
+            })
+            skip_next = True
+        elif ent.label_ == "DATE":
+            merged.append({
+                "text": ent.text,
+                "start": ent.start_char,
+                "end": ent.end_char
+            })
+    # Step 4: replace spaCy entities and wrap in <DUE>
+    marked_block = block_text
+    offset = 0
+    for m in merged:
+        date_str, time_str = normalize_time(m["text"])
+        if not date_str and not time_str:
+            continue
+        start = m["start"] + offset
+        end = m["end"] + offset
+        parts = []
+        if date_str:
+            parts.append(f"<DATE>{date_str}</DATE>")
+        if time_str:
+            parts.append(f"<TIME>{time_str}</TIME>")
+        replacement = "<DUE>" + " ".join(parts) + "</DUE>"
+        marked_block = marked_block[:start] + replacement + marked_block[end:]
+        offset += len(replacement) - (end - start)
+    # Step 5: regex safeguard for anything SpaCy missed
+    def regex_replace_due(match):
+        d, t = normalize_time(match.group(0))
+        if not d and not t:
+            return match.group(0)
+        parts = []
+        if d:
+            parts.append(f"<DATE>{d}</DATE>")
+        if t:
+            parts.append(f"<TIME>{t}</TIME>")
+        return "<DUE>" + " ".join(parts) + "</DUE>"
+    marked_block = re.sub(
+        r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2}(?: at \d{1,2}:\d{2}\s?(?:am|pm))?\b',
+        regex_replace_due,
+        marked_block,
+        flags=re.IGNORECASE
+    )
+    return f"<ASSIGNMENT>{marked_block}</ASSIGNMENT>"
+
+def mark_tags(text: str, batch_size: int = 32, n_process: int = 1):
+    """
+    Mark assignments text with NER tags:
+    - <ASSIGNMENT>...</ASSIGNMENT> around each assignment block
+    - <ASSIGNMENT_NAME>...</ASSIGNMENT_NAME> for the assignment title
+    - <IGNORE>...</IGNORE> for 'Not available' lines and grading lines
+    - <DUE><DATE>...</DATE> <TIME>...</TIME></DUE> for due dates/times
+    Blocks are prepared first and tagged with a single batched nlp.pipe pass.
+    """
+   #blocks = re.split(r'(?=Assignment\b)', text)
+    blocks = re.split(r'(?=(Assignment|Quiz)\b)', text)
+    #blocks = re.split(r'(?:Assignment|Quiz)\b', text)
+    block_texts = [b for b in (prepare_block(block) for block in blocks) if b is not None]
+    docs = nlp_token_extractor.pipe(block_texts, batch_size=batch_size, n_process=n_process)
+    marked_blocks = [tag_block(block_text, doc) for block_text, doc in zip(block_texts, docs)]
     return "\n".join(marked_blocks)
 
 import re
@@ -414,66 +427,6 @@ Output format:
 tokenizer = AutoTokenizer.from_pretrained("google/gemma-3-270m-it")
 model = AutoModelForCausalLM.from_pretrained("google/gemma-3-270m-it")
 
-assignments = """
-Assignment
-Professional emails 
-Due Sep 8 at 11:59pm Sep 8 at 11:59pm
--/4 ptsNo submission for this assignment. 4 points possible.
-Assignment
-AI and education 
-Not available until Sep 3 at 12pm Sep 3 at 12pm
-Due Sep 9 at 11:59pm Sep 9 at 11:59pm
--/4 ptsNo submission for this assignment. 4 points possible.
-Assignment
-AI and relationships 
-Not available until Sep 3 at 12pm Sep 3 at 12pm
-Due Sep 9 at 11:59pm Sep 9 at 11:59pm
--/4 ptsNo submission for this assignment. 4 points possible.
-Assignment
-AI and employment 
-Not available until Sep 3 at 12pm Sep 3 at 12pm
-Due Sep 9 at 11:59pm Sep 9 at 11:59pm
--/4 ptsNo submission for this assignment. 4 points possible.
-Assignment
-Architecture diagram (prep) 
-Due Sep 16 at 11:59pm Sep 16 at 11:59pm
--/4 ptsNo submission for this assignment. 4 points possible.
-Assignment
-Readme 
-Due Sep 16 at 11:59pm Sep 16 at 11:59pm
--/4 ptsNo submission for this assignment. 4 points possible.
-Assignment
-Requirements (prep) 
-Not available until Sep 15 at 12am Sep 15 at 12am
-Due Sep 23 at 11:59pm Sep 23 at 11:59pm
--/4 ptsNo submission for this assignment. 4 points possible.
-Assignment
-Reddit comment 
-Not available until Sep 22 at 12am Sep 22 at 12am
-Due Sep 30 at 11:59pm Sep 30 at 11:59pm
--/4 ptsNo submission for this assignment. 4 points possible.
-Assignment
-Medium post (prep) 
-Not available until Sep 15 at 12am Sep 15 at 12am
-Due Sep 30 at 11:59pm Sep 30 at 11:59pm
--/4 ptsNo submission for this assignment. 4 points possible.
-Assignment
-Usability & accessibility (prep) 
-Not available until Oct 6 at 12am Oct 6 at 12am
-Due Oct 14 at 11:59pm Oct 14 at 11:59pm
--/0 ptsNo submission for this assignment. 0 points possible.
-Assignment
-Lightning Presentation 
-Not available until Oct 13 at 12am Oct 13 at 12am
-Due Nov 4 at 11:59pm Nov 4 at 11:59pm
--/16 ptsNo submission for this assignment. 16 points possible.
-Assignment
-Final Portfolio 
-Due Dec 8 at 11:59pm Dec 8 at 11:59pm
--/32 pts
-"""
-
-
 # assignments = """
 # Quiz
 # Quiz #1: Syllabus and Basics 
@@ -511,52 +464,7 @@ Due Dec 8 at 11:59pm Dec 8 at 11:59pm
 # Due Oct 12 at 11:59pm 
 # """
 
-assignments2 = """
-Quiz #1: Syllabus and Basics 
-Not available until Sep 4 at 5pm Sep 4 at 5pm
-Due Sep 8 at 11:59pm Sep 8 at 11:59pm
--/20 ptsNo submission for this assignment. 20 points possible.
-Assignment
-HW1: Encode and decode messages 
-Available until Sep 15 at 11:59pm Sep 15 at 11:59pm
-Due Sep 11 at 11:59pm Sep 11 at 11:59pm
--/50 ptsNo submission for this assignment. 50 points possible.
-Assignment
-HW2: Invent two new image filters and build a collage 
-Not available until Sep 9 at 5pm Sep 9 at 5pm
-Due Sep 18 at 11:59pm Sep 18 at 11:59pm
--/60 ptsNo submission for this assignment. 60 points possible.
-Quiz
-Quiz #2: Images 
-Not available until Sep 16 at 5pm Sep 16 at 5pm
-Due Sep 20 at 11:59pm Sep 20 at 11:59pm
--/20 ptsNo submission for this assignment. 20 points possible.
-Quiz
-Quiz #3: Copying and Transforming Pictures 
-Not available until Sep 25 at 5pm Sep 25 at 5pm
-Due Sep 28 at 11:59pm Sep 28 at 11:59pm
--/20 ptsNo submission for this assignment. 20 points possible.
-Assignment
-Project 1: Build an image collage 
-Not available until Sep 16 at 10am Sep 16 at 10am
-Due Oct 7 at 11:59pm Oct 7 at 11:59pm
--/55 ptsNo submission for this assignment. 55 points possible.
-Quiz
-Quiz #4: Sound Basics 
-Not available until Oct 9 at 5pm Oct 9 at 5pm
-Due Oct 12 at 11:59pm Oct 12 at 11:59pm
--/20 ptsNo submission for this assignment. 20 points possible.
-Assignment
-HW3: Create two sound filters 
-Not available until Oct 7 at 12am Oct 7 at 12am
-Due Oct 21 at 11:59pm Oct 21 at 11:59pm
--/50 ptsNo submission for this assignment. 50 points possible.
-Quiz
-Quiz #5: Advanced Sound 
-Not available until Oct 30 at 5pm Oct 30 at 5pm
-Due Nov 2 at 11:59pm Nov 2 at 11:59pm
--/20 pts
-"""
+
 
 # clean input 
 print("Extracted time tokens:", extract_time_token_entities(assignments))
@@ -1,36 +1,125 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from pydantic_core import to_json
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from typing import List
+import asyncio
+import bisect
+import copy
+import logging
+import os
+import threading
+import time
 import spacy
-import dateparser
+from spacy.language import Language
 import re
 import json
-from transformers import AutoTokenizer, AutoModelForCausalLM
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM, DynamicCache, TextIteratorStreamer, LogitsProcessorList
+
+try:
+    from backend.model_registry import ModelRegistry
+    from backend.generation_scheduler import GenerationScheduler
+    from backend.date_normalizer import normalize_time, normalize_stats
+    from backend.response_cache import ResponseCache, make_cache_key
+    from backend.chunking import pack_chunks, dedupe_items, item_key
+    from backend.json_stream import JSONArrayStreamParser
+    from backend.json_constraint import AssignmentsJSONGrammar
+    from backend.metrics import (
+        metrics, RequestTimings, REQUEST_SECONDS, TOKENS, CACHE_LOOKUPS,
+        BLOCK_CACHE_LOOKUPS, BLOCK_CACHE_SAVED_SECONDS,
+    )
+    from backend.worker_pool import WorkerPool
+    from backend.mmap_weights import safetensors_files, checkpoint_dtype, mmap_state_dict
+    from backend.calendar_batch import router as calendar_router
+    from backend.calendar_sync import router as calendar_sync_router
+    from backend.schema import GEMMA_WIRE, json_response, assignments_schema, batch_schema, json_body
+    from backend.tag_lexer import (
+        DUE_DATE_PATTERN, BLOCK_SPLIT_PATTERN, IGNORE_LINE_PATTERN, HEADER_LINE_PATTERN,
+        TAG_LIKE_PATTERN, replace_due_match, clean_due_tags, lex_block,
+    )
+except ImportError:  # running from inside backend/
+    from model_registry import ModelRegistry
+    from generation_scheduler import GenerationScheduler
+    from date_normalizer import normalize_time, normalize_stats
+    from response_cache import ResponseCache, make_cache_key
+    from chunking import pack_chunks, dedupe_items, item_key
+    from json_stream import JSONArrayStreamParser
+    from json_constraint import AssignmentsJSONGrammar
+    from metrics import (
+        metrics, RequestTimings, REQUEST_SECONDS, TOKENS, CACHE_LOOKUPS,
+        BLOCK_CACHE_LOOKUPS, BLOCK_CACHE_SAVED_SECONDS,
+    )
+    from worker_pool import WorkerPool
+    from mmap_weights import safetensors_files, checkpoint_dtype, mmap_state_dict
+    from calendar_batch import router as calendar_router
+    from calendar_sync import router as calendar_sync_router
+    from schema import GEMMA_WIRE, json_response, assignments_schema, batch_schema, json_body
+    from tag_lexer import (
+        DUE_DATE_PATTERN, BLOCK_SPLIT_PATTERN, IGNORE_LINE_PATTERN, HEADER_LINE_PATTERN,
+        TAG_LIKE_PATTERN, replace_due_match, clean_due_tags, lex_block,
+    )
 
 # Run with: uvicorn backend.ai_llm_backend:app --reload --port 8000
 # RUN FROM PROJECT ROOT
 
+# LOG_LEVEL=DEBUG logs every request payload, block, prompt and model output
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+logger = logging.getLogger(__name__)
+
 
 #need to handle available from and also ignore events that arent well formed so it can post anyway
 # -----------------------------
 # pydanitc Models
 # -----------------------------
-class AssignmentItem(BaseModel):
-    assignment: str
-    due_date: Optional[str] = None
-    time: Optional[str] = None
-
-class Assignments(BaseModel):
-    assignments: List[AssignmentItem]
-
 class ExtractRequest(BaseModel):
     text: str
 
+class BatchDocument(BaseModel):
+    id: str
+    text: str
+
+class BatchExtractRequest(BaseModel):
+    documents: List[BatchDocument]
+
+# Responses are built from the shared item schema (schema.py) and returned as
+# JSON bytes; these describe them in the OpenAPI docs.
+BLOCK_CACHE_STATS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "hits": {"type": "integer"},  # blocks answered from the block cache
+        "misses": {"type": "integer"},  # blocks that ran NER (and generation if the rules couldn't parse them)
+        "hit_rate": {"type": "number"},
+        "saved_ms": {"type": "number"},  # estimated time the cached blocks took when they were extracted
+    },
+}
+ASSIGNMENTS_SCHEMA = assignments_schema(
+    GEMMA_WIRE,
+    ner_tiers={"type": "array", "items": {"type": "string"}},  # NER tier that tagged each block
+    generated_tokens={"type": "integer"},  # tokens Gemma generated for this request
+    block_cache=BLOCK_CACHE_STATS_SCHEMA,  # set when BLOCK_CACHE is on
+)
+
 # -----------------------------
 # FastAPI App => React
 # -----------------------------
-app = FastAPI(title="Assignment Extractor API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warm up in the background so the port binds right away; /ready reports
+    # when the models are loaded and have run once
+    if extraction_pool is not None:
+        warmup_task = asyncio.create_task(asyncio.to_thread(start_extraction_pool))
+    else:
+        warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    yield
+    warmup_task.cancel()
+    if extraction_pool is not None:
+        extraction_pool.shutdown()
+
+app = FastAPI(title="Assignment Extractor API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -43,58 +132,374 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# POST /calendar/insert-events (bulk Google Calendar insert, see calendar_batch.py)
+app.include_router(calendar_router)
+# POST /calendar/events (merged, incremental event listing, see calendar_sync.py)
+app.include_router(calendar_sync_router)
 
 # -----------------------------
-# Load models
+# Load models (lazily, see model_registry.py)
 # -----------------------------
-nlp_token_extractor = spacy.load("en_core_web_trf")
-tokenizer = AutoTokenizer.from_pretrained("google/gemma-3-270m-it")
-model = AutoModelForCausalLM.from_pretrained("google/gemma-3-270m-it")
+MODEL_NAME = "google/gemma-3-270m-it"
+# Offline model directories, e.g. written by `python -m backend.export_models DIR`:
+#   GEMMA_MODEL_DIR: tokenizer + safetensors weights, loaded with
+#                    local_files_only (no hub requests or re-validation)
+#   SPACY_MODEL_DIR: spaCy pipelines saved with nlp.to_disk, one directory per
+#                    package name (en_core_web_sm, en_core_web_trf); a pipeline
+#                    missing there is loaded from its installed package
+GEMMA_MODEL_DIR = os.getenv("GEMMA_MODEL_DIR") or None
+SPACY_MODEL_DIR = os.getenv("SPACY_MODEL_DIR") or None
+GEMMA_MODEL_PATH = GEMMA_MODEL_DIR or MODEL_NAME
+HUB_KWARGS = {"local_files_only": True} if GEMMA_MODEL_DIR else {}
+# NER tiers are tried in order (NER_TIERS="rule,sm,trf"); a block only goes
+# to the next tier when the previous one found no <DUE> span for it.
+#   rule: blank English pipeline + compiled month/day regex matcher
+#   sm:   en_core_web_sm
+#   trf:  en_core_web_trf
+# (DUE_DATE_PATTERN, the month/day regex, lives in tag_lexer.py)
+
+@Language.component("due_date_matcher")
+def due_date_matcher(doc):
+    spans = []
+    for match in DUE_DATE_PATTERN.finditer(doc.text):
+        span = doc.char_span(match.start(), match.end(), label="DATE", alignment_mode="expand")
+        if span is not None and (not spans or span.start >= spans[-1].end):
+            spans.append(span)
+    doc.ents = spans
+    return doc
+
+NER_TIER_PACKAGES = {"sm": "en_core_web_sm", "trf": "en_core_web_trf"}
+
+def load_spacy_package(package: str):
+    if SPACY_MODEL_DIR:
+        path = os.path.join(SPACY_MODEL_DIR, package)
+        if os.path.isdir(path):
+            return spacy.load(path)
+    return spacy.load(package)
+
+def load_ner_tier(name: str):
+    if name == "rule":
+        nlp = spacy.blank("en")
+        nlp.add_pipe("due_date_matcher")
+        return nlp
+    if name in NER_TIER_PACKAGES:
+        return load_spacy_package(NER_TIER_PACKAGES[name])
+    raise ValueError(f"Unknown NER tier: {name}")
+
+NER_TIERS = [t.strip() for t in os.getenv("NER_TIERS", "rule,trf").split(",") if t.strip()]
+
+# Gemma inference mode for CPU hosts, comma separated (GEMMA_INFERENCE_MODE):
+#   fp32:    full precision, eager (default)
+#   bf16:    bfloat16 weights, only when the CPU has native bf16 support
+#   int8:    dynamic int8 quantization of the nn.Linear layers (fp32 activations)
+#   compile: torch.compile of the forward pass with a static KV cache
+#   mmap:    weights stay in a read-only memory map of the safetensors files,
+#            in the dtype they are stored in, so every worker process shares
+#            the same page-cache pages (ignored with int8, which repacks them)
+# Check a mode against the golden pastes with golden_check.py before using it.
+GEMMA_INFERENCE_MODE = {m.strip() for m in os.getenv("GEMMA_INFERENCE_MODE", "fp32").split(",") if m.strip()}
+
+def cpu_supports_bf16() -> bool:
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+def load_llm(modes=frozenset({"fp32"})):
+    dtype = torch.float32
+    mmap = "mmap" in modes and "int8" not in modes
+    if mmap:
+        # converting to another dtype would copy every tensor out of the map
+        files = safetensors_files(GEMMA_MODEL_PATH, local_files_only=bool(GEMMA_MODEL_DIR))
+        dtype = checkpoint_dtype(files)
+        if dtype == torch.bfloat16 and not cpu_supports_bf16():
+            logger.warning("mmap: checkpoint is bf16 but the CPU has no native bf16 support; export it as fp32 with export_models.py")
+    elif "bf16" in modes and "int8" not in modes:
+        if cpu_supports_bf16():
+            dtype = torch.bfloat16
+        else:
+            logger.warning("bf16 requested but the CPU has no native bf16 support, using fp32")
+    model = AutoModelForCausalLM.from_pretrained(GEMMA_MODEL_PATH, torch_dtype=dtype, **HUB_KWARGS)
+    if mmap:
+        # swap in tensors backed by the memory map; the loaded copies are freed
+        model.load_state_dict(mmap_state_dict(files), strict=False, assign=True)
+        model.tie_weights()
+        model.requires_grad_(False)
+    model.eval()
+    if "int8" in modes:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if "compile" in modes:
+        model.generation_config.cache_implementation = "static"
+        model.forward = torch.compile(model.forward, mode="reduce-overhead", fullgraph=True)
+    return model
+
+registry = ModelRegistry()
+for _tier in ("rule", "sm", "trf"):
+    registry.register(f"ner:{_tier}", lambda tier=_tier: load_ner_tier(tier))
+registry.register("tokenizer", lambda: AutoTokenizer.from_pretrained(GEMMA_MODEL_PATH, **HUB_KWARGS))
+registry.register("llm", lambda: load_llm(GEMMA_INFERENCE_MODE))
+
+def get_ner_pipeline(tier: str):
+    return registry.get(f"ner:{tier}")
+
+def get_tokenizer():
+    return registry.get("tokenizer")
+
+def get_model():
+    return registry.get("llm")
+
+# Models the startup warm-up loads and runs once ("ner", "llm"); anything not
+# listed is loaded on the first request that needs it.
+WARMUP_MODELS = [m.strip() for m in os.getenv("WARMUP_MODELS", "ner,llm").split(",") if m.strip()]
+WARMUP_TEXT = "Assignment\nWarm-up\nDue Sep 8 at 11:59pm"
+
+def warm_up():
+    """One dummy NER pass per configured tier and one dummy generate."""
+    try:
+        if "ner" in WARMUP_MODELS:
+            for tier in NER_TIERS:
+                get_ner_pipeline(tier)(WARMUP_TEXT)
+        if "llm" in WARMUP_MODELS:
+            tokenizer = get_tokenizer()
+            model = get_model()
+            inputs = tokenizer.apply_chat_template(
+                createMessages(WARMUP_TEXT),
+                add_generation_prompt=True,
+                tokenize=True,
+                return_dict=True,
+                return_tensors="pt"
+            ).to(model.device)
+            model.generate(**inputs, max_new_tokens=1, do_sample=False, pad_token_id=tokenizer.eos_token_id)
+            if PROMPT_PREFIX_CACHE:
+                get_prompt_prefix()
+            if CONSTRAINED_DECODING:
+                registry.get("json_grammar")
+    except Exception:
+        logger.exception("Warm-up failed")
+        return
+    registry.mark_ready()
+    logger.info("Models ready: %s", registry.status())
+
+# -----------------------------
+# Process-pool execution (EXTRACTION_WORKERS > 0)
+# -----------------------------
+# With EXTRACTION_WORKERS=N, each uncached paste is extracted (NER, generate,
+# parse) by one of N forked worker processes instead of in this process, so
+# N extractions run in parallel without sharing the GIL. The models are loaded
+# once in the parent before forking and shared by the workers copy-on-write;
+# each worker then warms up and uses cpu_count / N torch threads.
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0"))
+
+def preload_models():
+    """Load (without running) the models warm_up would use, before forking."""
+    if "ner" in WARMUP_MODELS:
+        for tier in NER_TIERS:
+            get_ner_pipeline(tier)
+    if "llm" in WARMUP_MODELS:
+        get_tokenizer()
+        get_model()
+        if CONSTRAINED_DECODING:
+            registry.get("json_grammar")
+
+def init_extraction_worker():
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // EXTRACTION_WORKERS))
+    warm_up()
+
+extraction_pool = WorkerPool(EXTRACTION_WORKERS, preload_models, init_extraction_worker) if EXTRACTION_WORKERS > 0 else None
+
+def start_extraction_pool():
+    try:
+        extraction_pool.start()
+    except Exception:
+        logger.exception("Starting extraction workers failed")
+        return
+    registry.mark_ready()
+    logger.info("Models ready: %s", registry.status())
+
+# spaCy batching for mark_tags (n_process > 1 forks worker processes)
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "32"))
+NER_N_PROCESS = int(os.getenv("NER_N_PROCESS", "1"))
+
+# TAGGING_MODE=lexer replaces mark_tags + remove_ignore_lines +
+# clean_all_assignment_blocks with the single-pass lexer in tag_lexer.py
+# (same cleaned text as NER_TIERS=rule, no spaCy; ner_tiers then reports "lexer")
+TAGGING_MODE = os.getenv("TAGGING_MODE", "ner")
 
 # -----------------------------
 # Utilities (from your script)
 # -----------------------------
-def normalize_time(text: str):
-    dt = dateparser.parse(text)
-    if not dt:
-        return None, None
-    date_str = dt.strftime("%Y-%m-%d")
-    time_str = dt.strftime("%H:%M") if (dt.hour or dt.minute) else None
-    return date_str, time_str
+IGNORE_SPAN_PATTERN = re.compile(r"<IGNORE>.*?</IGNORE>", flags=re.DOTALL | re.IGNORECASE)
+ASSIGNMENT_SPAN_PATTERN = re.compile(r'<ASSIGNMENT>.*?</ASSIGNMENT>', flags=re.DOTALL)
 
 def remove_ignore_lines(text: str) -> str:
     #remove everything inside <IGNORE>...</IGNORE>
-    cleaned_text = re.sub(r"<IGNORE>.*?</IGNORE>", "", text, flags=re.DOTALL | re.IGNORECASE)
+    cleaned_text = IGNORE_SPAN_PATTERN.sub("", text)
     #remove blank lines
     cleaned_text = "\n".join([line for line in cleaned_text.split("\n") if line.strip()])
     return cleaned_text
 
-def clean_due_tags(block_text: str):
-    # search for the 'Due' keyword
-    match = re.search(r'\bDue\b', block_text, flags=re.IGNORECASE)
-    if not match:
-        return block_text 
-    before_due = block_text[:match.end()]
-    after_due = block_text[match.end():]
-    #find all <DUE> tags in the text after 'Due'
-    due_tags = re.findall(r'<DUE>.*?</DUE>', after_due)
-    if not due_tags:
-        return block_text
-    first_due = due_tags[0]
-    #remove all <DUE> tags in the remainder
-    after_due_cleaned = re.sub(r'<DUE>.*?</DUE>', '', after_due)
-    # readd only the first <DUE>
-    after_due_cleaned = first_due + after_due_cleaned
-    return before_due + after_due_cleaned
-
+# clean_due_tags (keep only the first <DUE> after "Due") lives in tag_lexer.py
 
 def clean_all_assignment_blocks(marked_text: str):
     def clean_block(match):
         block = match.group(0)
         return clean_due_tags(block)
-    cleaned_text = re.sub(r'<ASSIGNMENT>.*?</ASSIGNMENT>', clean_block, marked_text, flags=re.DOTALL)
+    cleaned_text = ASSIGNMENT_SPAN_PATTERN.sub(clean_block, marked_text)
     return cleaned_text
 
+def prepare_block(block: str):
+    """
+    Steps 1-2 of mark_tags for a single raw block: tag ignore lines and the
+    assignment name. Returns None for blocks that should be dropped.
+    """
+    logger.debug("Block: %s", block)
+    if not block.strip():
+        return None
+    if block.strip() in ["Assignment", "Quiz"]:
+        return None
+    lines = block.split("\n")
+    # Step 1: mark "Not available" and grading/points lines
+    for i, line in enumerate(lines):
+        if IGNORE_LINE_PATTERN.search(line.lower()):
+            lines[i] = f"<IGNORE>{line}</IGNORE>"
+    #Step 1.5: remove lines that are exactly "Assignment" or "Quiz"
+    for i, line in enumerate(lines):
+        if HEADER_LINE_PATTERN.fullmatch(line):
+            lines[i] = ""   # delete only if the line is exactly "Assignment" or "Quiz"
+    # Step 2: wrap assignment name (first non-empty line not ignored)
+    for i, line in enumerate(lines):
+        if line.strip() and not ((line == "Assignment") or (line == "Quiz") or line.lower().startswith("due")) and "<IGNORE>" not in line:
+            logger.debug("Assignment name line: %s", line)
+            lines[i] = f"<ASSIGNMENT_NAME>{line.strip()}</ASSIGNMENT_NAME>"
+            break
+    return "\n".join(lines)
+
+PROTECTED_SPAN_PATTERN = re.compile(r'<(IGNORE|ASSIGNMENT_NAME)>(.*?)</\1>', flags=re.DOTALL)
+
+def protected_spans(block_text: str):
+    """
+    Sorted (starts, ends) of the text inside <IGNORE> and <ASSIGNMENT_NAME>
+    tags. Those tags sit on separate lines, so the intervals don't overlap
+    and containment can be checked with one bisect.
+    """
+    starts = []
+    ends = []
+    for m in PROTECTED_SPAN_PATTERN.finditer(block_text):
+        starts.append(m.start(2))
+        ends.append(m.end(2))
+    return starts, ends
+
+def inside_spans(spans, start: int, end: int) -> bool:
+    starts, ends = spans
+    i = bisect.bisect_right(starts, start) - 1
+    return i >= 0 and end <= ends[i]
+
+def tag_block(block_text: str, doc):
+    """
+    Steps 3-5 of mark_tags: turn the spaCy entities of a prepared block
+    (plus the month regex safeguard) into <DUE> tags and wrap the block.
+    Entities are collected as (start, end) spans and the tagged block is
+    built with a single join, so the cost stays linear in the block length.
+    """
+    spans = protected_spans(block_text)
+    # Step 3: spaCy DATE/TIME entities
+    ents = list(doc.ents)
+    merged = []
+    skip_next = False
+    for i, ent in enumerate(ents):
+        if skip_next:
+            skip_next = False
+            continue
+        # CARDINAL/ORDINAL/MONEY etc. would be parsed into bogus dates
+        if ent.label_ not in ("DATE", "TIME"):
+            continue
+        # Skip entities inside <IGNORE> and <ASSIGNMENT_NAME>
+        if inside_spans(spans, ent.start_char, ent.end_char):
+            logger.debug("Skipping entity inside IGNORE or ASSIGNMENT_NAME: %s", ent.text)
+            continue
+        # Merge DATE + TIME; a TIME without a DATE would get today's date
+        if ent.label_ == "DATE" and i + 1 < len(ents) and ents[i+1].label_ == "TIME":
+            merged.append((ent.start_char, ents[i+1].end_char))
+            skip_next = True
+        elif ent.label_ == "DATE":
+            merged.append((ent.start_char, ent.end_char))
+    # Step 4: replace spaCy entities and wrap in <DUE>
+    pieces = []
+    pos = 0
+    for start, end in merged:
+        date_str, time_str = normalize_time(block_text[start:end])
+        if not date_str and not time_str:
+            continue
+        parts = []
+        if date_str:
+            parts.append(f"<DATE>{date_str}</DATE>")
+        if time_str:
+            parts.append(f"<TIME>{time_str}</TIME>")
+        pieces.append(block_text[pos:start])
+        pieces.append("<DUE>" + " ".join(parts) + "</DUE>")
+        pos = end
+    pieces.append(block_text[pos:])
+    marked_block = "".join(pieces)
+    # Step 5: regex safeguard for anything SpaCy missed
+    marked_block = DUE_DATE_PATTERN.sub(replace_due_match, marked_block)
+    return f"<ASSIGNMENT>{marked_block}</ASSIGNMENT>"
+
+def mark_tags_batch(texts):
+    """
+    mark_tags_with_tiers for several documents at once: the blocks of every
+    document go through each NER tier in one nlp.pipe call, then are regrouped
+    per document. Returns one (marked, block_tiers) pair per text.
+    """
+    block_texts = []
+    doc_blocks = [[] for _ in texts]  # indices into block_texts, per document
+    for doc_index, text in enumerate(texts):
+       #blocks = re.split(r'(?=Assignment\b)', text)
+        blocks = BLOCK_SPLIT_PATTERN.split(text)
+        #blocks = re.split(r'(?:Assignment|Quiz)\b', text)
+        for block_text in (prepare_block(block) for block in blocks):
+            if block_text is not None:
+                doc_blocks[doc_index].append(len(block_texts))
+                block_texts.append(block_text)
+    marked_blocks, block_tiers = tag_prepared_blocks(block_texts)
+    return [
+        ("\n".join(marked_blocks[i] for i in indices), [block_tiers[i] for i in indices])
+        for indices in doc_blocks
+    ]
+
+def tag_prepared_blocks(block_texts):
+    """
+    Run prepared blocks through the NER tiers (Steps 3-5 of mark_tags).
+    Returns (marked blocks, tier per block).
+    """
+    marked_blocks = [None] * len(block_texts)
+    block_tiers = [None] * len(block_texts)
+    pending = list(range(len(block_texts)))
+    for tier in NER_TIERS:
+        if not pending:
+            break
+        docs = get_ner_pipeline(tier).pipe(
+            [block_texts[i] for i in pending], batch_size=NER_BATCH_SIZE, n_process=NER_N_PROCESS
+        )
+        missing_due = []
+        for i, doc in zip(pending, docs):
+            marked_blocks[i] = tag_block(block_texts[i], doc)
+            block_tiers[i] = tier
+            if "<DUE>" not in remove_ignore_lines(marked_blocks[i]):
+                missing_due.append(i)
+        pending = missing_due
+    return marked_blocks, block_tiers
+
+def mark_tags_with_tiers(text: str):
+    """
+    Same as mark_tags, but also returns the NER tier that tagged each block.
+    All blocks are prepared first and run through the first tier together with
+    nlp.pipe; blocks without a <DUE> span (outside <IGNORE>) are re-run as one
+    batch through the next tier, and so on.
+    """
+    return mark_tags_batch([text])[0]
+
 def mark_tags(text: str):
     """
     Mark assignments text with NER tags:
@@ -103,103 +508,32 @@ def mark_tags(text: str):
     - <IGNORE>...</IGNORE> for 'Not available' lines and grading lines
     - <DUE><DATE>...</DATE> <TIME>...</TIME></DUE> for due dates/times
     """
-    def inside_tag(text, start, end, tag):
-        pattern = fr"<{tag}>(.*?)</{tag}>"
-        for m in re.finditer(pattern, text, flags=re.DOTALL):
-            if m.start(1) <= start and end <= m.end(1):
-                return True
-        return False
+    marked, _ = mark_tags_with_tiers(text)
+    return marked
 
-   #blocks = re.split(r'(?=Assignment\b)', text)
-    blocks = re.split(r'(?=(Assignment|Quiz)\b)', text)
-    #blocks = re.split(r'(?:Assignment|Quiz)\b', text)
-    marked_blocks = []
-    for block in blocks:
-        print("Block:", block)
-        if not block.strip():
-            continue
-        if block.strip() in ["Assignment", "Quiz"]:
-            continue
-        lines = block.split("\n")
-        # Step 1: mark "Not available" and grading/points lines
-        for i, line in enumerate(lines):
-            if ("not available" in line.lower()) or ("points possible" in line.lower()) or ("no submission" in line.lower()) or ("available until" in line.lower()):
-                lines[i] = f"<IGNORE>{line}</IGNORE>"
-        #Step 1.5: remove lines that are exactly "Assignment" or "Quiz"
-        for i, line in enumerate(lines):
-            if re.fullmatch(r'\s*(Assignment|Quiz)\s*', line, flags=re.IGNORECASE):
-                lines[i] = ""   # delete only if the line is exactly "Assignment" or "Quiz"
-        # Step 2: wrap assignment name (first non-empty line not ignored)
-        for i, line in enumerate(lines):
-            if line.strip() and not ((line == "Assignment") or (line == "Quiz") or line.lower().startswith("due")) and "<IGNORE>" not in line:
-                print("170", line)
-                lines[i] = f"<ASSIGNMENT_NAME>{line.strip()}</ASSIGNMENT_NAME>"
-                break
-        block_text = "\n".join(lines)
-        # Step 3: spaCy DATE/TIME entities
-        doc = nlp_token_extractor(block_text)
-        ents = list(doc.ents)
-        merged = []
-        skip_next = False
-        for i, ent in enumerate(ents):
-            if skip_next:
-                skip_next = False
-                continue
-            # Skip entities inside <IGNORE> and <ASSIGNMENT_NAME>
-            if inside_tag(block_text, ent.start_char, ent.end_char, "IGNORE") \
-                or inside_tag(block_text, ent.start_char, ent.end_char, "ASSIGNMENT_NAME"):
-                print("Skipping entity inside IGNORE or ASSIGNMENT_NAME:", ent.text)
-            continue
-            # Merge DATE + TIME
-            if ent.label_ == "DATE" and i + 1 < len(ents) and ents[i+1].label_ == "TIME":
-                merged.append({
-                    "text": block_text[ent.start_char:ents[i+1].end_char],
-                    "start": ent.start_char,
-                    "end": ents[i+1].end_char
-                })
-                skip_next = True
-            else:
-                merged.append({
-                    "text": ent.text,
-                    "start": ent.start_char,
-                    "end": ent.end_char
-                })
-        # Step 4: replace spaCy entities and wrap in <DUE>
-        marked_block = block_text
-        offset = 0
-        for m in merged:
-            date_str, time_str = normalize_time(m["text"])
-            if not date_str and not time_str:
-                continue
-            start = m["start"] + offset
-            end = m["end"] + offset
-            parts = []
-            if date_str:
-                parts.append(f"<DATE>{date_str}</DATE>")
-            if time_str:
-                parts.append(f"<TIME>{time_str}</TIME>")
-            replacement = "<DUE>" + " ".join(parts) + "</DUE>"
-            marked_block = marked_block[:start] + replacement + marked_block[end:]
-            offset += len(replacement) - (end - start)
-        # Step 5: regex safeguard for anything SpaCy missed
-        def regex_replace_due(match):
-            d, t = normalize_time(match.group(0))
-            if not d and not t:
-                return match.group(0)
-            parts = []
-            if d:
-                parts.append(f"<DATE>{d}</DATE>")
-            if t:
-                parts.append(f"<TIME>{t}</TIME>")
-            return "<DUE>" + " ".join(parts) + "</DUE>"
-        marked_block = re.sub(
-            r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2}(?: at \d{1,2}:\d{2}\s?(?:am|pm))?\b',
-            regex_replace_due,
-            marked_block,
-            flags=re.IGNORECASE
-        )
-        marked_blocks.append(f"<ASSIGNMENT>{marked_block}</ASSIGNMENT>")
-    return "\n".join(marked_blocks)
+# -----------------------------
+# Rule-based extraction (skips the LLM for well-formed blocks)
+# -----------------------------
+RULE_EXTRACTOR = os.getenv("RULE_EXTRACTOR", "1") == "1"
+ASSIGNMENT_BLOCK_PATTERN = re.compile(r'<ASSIGNMENT>.*?</ASSIGNMENT>', flags=re.DOTALL)
+ASSIGNMENT_NAME_PATTERN = re.compile(r'<ASSIGNMENT_NAME>(.*?)</ASSIGNMENT_NAME>', flags=re.DOTALL)
+DUE_TAG_PATTERN = re.compile(r'<DUE>(?:<DATE>(.*?)</DATE>)? ?(?:<TIME>(.*?)</TIME>)?</DUE>')
+
+def parse_tagged_block(block: str):
+    """
+    Build the assignment item straight from a cleaned <ASSIGNMENT> block.
+    Only handles the unambiguous case: one non-empty <ASSIGNMENT_NAME> without
+    dates in it and exactly one <DUE> with a <DATE> outside the name.
+    Returns None when the block needs the LLM.
+    """
+    names = ASSIGNMENT_NAME_PATTERN.findall(block)
+    if len(names) != 1 or "<DUE>" in names[0] or not names[0].strip():
+        return None
+    dues = DUE_TAG_PATTERN.findall(ASSIGNMENT_NAME_PATTERN.sub("", block))
+    if len(dues) != 1 or not dues[0][0]:
+        return None
+    due_date, time = dues[0]
+    return {"assignment": names[0].strip(), "due_date": due_date, "time": time or None, "source": "rule"}
 
 # build prompt
 # For prompt building
@@ -229,6 +563,26 @@ Output format:
         }
     ]
 
+def normalize_item(item: dict):
+    """Normalize one validated item (GEMMA_WIRE dict) in place (see postprocess_json)."""
+    # Skip assignments that say "Not available"
+    if "not available" in item["assignment"].lower():
+        item["due_date"] = None
+        item["time"] = None
+        return item
+    # Normalize due_date
+    if item["due_date"]:
+        d, t = normalize_time(item["due_date"])
+        item["due_date"] = d or None
+        # If time sneaks into due_date, pull it out
+        if t and not item["time"]:
+            item["time"] = t
+    # Normalize time
+    if item["time"]:
+        _, t = normalize_time(item["time"])
+        item["time"] = t or None
+    return item
+
 def postprocess_json(generated_json: str, raw_text: str = ""):
     """
     Normalize model JSON output:
@@ -254,29 +608,10 @@ def postprocess_json(generated_json: str, raw_text: str = ""):
         else:
             print("Error: No JSON array found in model output.")
             return []
+    # drop malformed items and fill in the missing fields
+    data = GEMMA_WIRE.clean(data)
     for item in data:
-        # Skip assignments that say "Not available"
-        if "assignment" in item and "not available" in item["assignment"].lower():
-            item.pop("due_date", None)
-            item.pop("time", None)
-            continue
-        # Normalize due_date
-        if "due_date" in item and item["due_date"]:
-            d, t = normalize_time(item["due_date"])
-            if d:
-                item["due_date"] = d
-            else:
-                item.pop("due_date", None)
-            # If time sneaks into due_date, pull it out
-            if t and "time" not in item:
-                item["time"] = t
-        # Normalize time
-        if "time" in item and item["time"]:
-            _, t = normalize_time(item["time"])
-            if t:
-                item["time"] = t
-            else:
-                item.pop("time", None)
+        normalize_item(item)
     return data
 
     """
@@ -312,38 +647,712 @@ def postprocess_json(generated_json: str, raw_text: str = ""):
     return data
 
 # -----------------------------
-# FastAPI Endpoint
+# Batched generation
 # -----------------------------
+GENERATION_KWARGS = dict(
+    max_new_tokens=750,
+    do_sample=False,
+    temperature=0.7,
+    top_p=0.9,
+)
 
-#https://f034b03bd14d.ngrok-free.app
-
-@app.post("/extract-assignments", response_model=Assignments)
-def extract_assignments(req: ExtractRequest):
-    # Step 1: mark, remove ignored lines, clean <DUE>
-    print("req", req.text)
-    marked = mark_tags(req.text)
-    cleaned = clean_all_assignment_blocks(remove_ignore_lines(marked))
-    # Step 2: create prompt
+def build_prompt_ids(cleaned: str):
+    """Chat-template token ids for one request's cleaned, tagged text."""
     messages = createMessages(cleaned)
-    print("messages", messages)
-    inputs = tokenizer.apply_chat_template(
+    logger.debug("messages %s", messages)
+    return get_tokenizer().apply_chat_template(
         messages,
         add_generation_prompt=True,
         tokenize=True,
-        return_dict=True,
-        return_tensors="pt"
-    ).to(model.device)
+        return_dict=True
+    )["input_ids"]
+
+# Constrain Gemma's output to the Assignments JSON array and stop as soon as
+# the array closes (CONSTRAINED_DECODING=0 turns it off).
+CONSTRAINED_DECODING = os.getenv("CONSTRAINED_DECODING", "1") == "1"
+
+registry.register("json_grammar", lambda: AssignmentsJSONGrammar(get_tokenizer()))
+
+def generation_extras():
+    """Per-call generate kwargs on top of GENERATION_KWARGS."""
+    extras = {}
+    if CONSTRAINED_DECODING:
+        extras["logits_processor"] = LogitsProcessorList([registry.get("json_grammar").logits_processor()])
+    return extras
+
+# Prompt-lookup decoding (PROMPT_LOOKUP_TOKENS=N, 0 turns it off): almost
+# every output token is copied from the tagged input, so generate drafts up to
+# N tokens by n-gram lookup in the prompt and verifies them in one forward
+# pass. With greedy decoding the output is identical to plain generate.
+# transformers only supports it for a batch of one, so batched scheduler calls
+# decode plainly, and it doesn't combine with the "compile" mode's static cache.
+# With "int8" the verification pass runs the quantized kernels on a different
+# sequence length than one-token decoding, so near-tied logits can round to a
+# different argmax and the output can drift from plain generate. It is off by
+# default there; set PROMPT_LOOKUP_TOKENS explicitly to opt in, after checking
+# the outputs with bench_prompt_lookup.py.
+PROMPT_LOOKUP_TOKENS = (
+    int(os.getenv("PROMPT_LOOKUP_TOKENS", "0" if "int8" in GEMMA_INFERENCE_MODE else "10"))
+    if "compile" not in GEMMA_INFERENCE_MODE else 0
+)
+PROMPT_LOOKUP_MAX_NGRAM = int(os.getenv("PROMPT_LOOKUP_MAX_NGRAM", "3"))
+
+def single_prompt_extras():
+    """generation_extras() for a batch of one, with prompt-lookup drafting when enabled."""
+    extras = generation_extras()
+    if PROMPT_LOOKUP_TOKENS > 0:
+        extras["prompt_lookup_num_tokens"] = PROMPT_LOOKUP_TOKENS
+        extras["max_matching_ngram_size"] = PROMPT_LOOKUP_MAX_NGRAM
+    return extras
+
+def decode_generated(new_tokens):
+    """(text, token count) of one row's generated ids, cut after its first EOS."""
+    tokenizer = get_tokenizer()
+    new_tokens = list(new_tokens)
+    if tokenizer.eos_token_id in new_tokens:
+        new_tokens = new_tokens[:new_tokens.index(tokenizer.eos_token_id) + 1]
+    return tokenizer.decode(new_tokens), len(new_tokens)
+
+def generate_batch(prompts):
+    """
+    Run several prompts (lists of token ids) through one model.generate call.
+    Prompts are left-padded; each row is cut at its first EOS so the decoded
+    text matches what a single-prompt generate would have returned.
+    Returns (text, generated token count) per prompt.
+    """
+    if PROMPT_PREFIX_CACHE and len(prompts) == 1:
+        result = generate_with_prefix_cache(prompts[0])
+        if result is not None:
+            return [result]
+    tokenizer = get_tokenizer()
+    model = get_model()
+    tokenizer.padding_side = "left"
+    batch = tokenizer.pad({"input_ids": prompts}, padding=True, return_tensors="pt").to(model.device)
+    outputs = model.generate(
+        **batch,
+        **GENERATION_KWARGS,
+        **(single_prompt_extras() if len(prompts) == 1 else generation_extras()),
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.eos_token_id
+    )
+    prompt_len = batch["input_ids"].shape[-1]
+    return [decode_generated(row[prompt_len:].tolist()) for row in outputs]
+
+# The instruction text in createMessages is the same for every request, so its
+# KV cache is computed once and single-prompt generations only prefill their
+# own suffix. Batched (left-padded) prompts don't line up with the cached
+# positions and take the normal path, and the "compile" inference mode uses its
+# own static cache instead.
+PROMPT_PREFIX_CACHE = os.getenv("PROMPT_PREFIX_CACHE", "1") == "1" and "compile" not in GEMMA_INFERENCE_MODE
+
+def load_prompt_prefix():
+    """Token ids and past_key_values of the constant chat-template prefix."""
+    tokenizer = get_tokenizer()
+    model = get_model()
+    a = build_prompt_ids("<ASSIGNMENT>a</ASSIGNMENT>")
+    b = build_prompt_ids("Quiz 1")
+    n = 0
+    while n < min(len(a), len(b)) and a[n] == b[n]:
+        n += 1
+    # drop the last shared token in case it merges with the start of the input
+    prefix_ids = a[:max(n - 1, 0)]
+    with torch.no_grad():
+        cache = model(
+            input_ids=torch.tensor([prefix_ids], device=model.device),
+            past_key_values=DynamicCache(),
+            use_cache=True
+        ).past_key_values
+    logger.info("Cached %d prompt prefix tokens", len(prefix_ids))
+    return prefix_ids, cache
+
+registry.register("prompt_prefix", load_prompt_prefix)
+
+def get_prompt_prefix():
+    return registry.get("prompt_prefix")
+
+def generate_with_prefix_cache(prompt, streamer=None):
+    """
+    Generate for a single prompt, reusing the cached prefix KV when the prompt
+    starts with it. Returns (text, generated token count), or None when the
+    prompt doesn't match the prefix.
+    """
+    prefix_ids, prefix_cache = get_prompt_prefix()
+    if len(prompt) <= len(prefix_ids) or prompt[:len(prefix_ids)] != prefix_ids:
+        return None
+    tokenizer = get_tokenizer()
+    model = get_model()
+    input_ids = torch.tensor([prompt], device=model.device)
     outputs = model.generate(
-        **inputs,
-        max_new_tokens=750,
-        do_sample=False,
-        temperature=0.7,
-        top_p=0.9,
+        input_ids=input_ids,
+        attention_mask=torch.ones_like(input_ids),
+        past_key_values=copy.deepcopy(prefix_cache),
+        streamer=streamer,
+        **GENERATION_KWARGS,
+        **single_prompt_extras(),
         eos_token_id=tokenizer.eos_token_id,
         pad_token_id=tokenizer.eos_token_id
     )
-    generated_text = tokenizer.decode(outputs[0][inputs['input_ids'].shape[-1]:])
-    print("generated_text", generated_text)
-    # Step 3: parse JSON
-    assignments_list = postprocess_json(generated_text)
-    return {"assignments": assignments_list}
+    return decode_generated(outputs[0][len(prompt):].tolist())
+
+def generate_streaming(prompt):
+    """
+    Generate for one prompt outside the scheduler and yield the decoded text
+    as it is produced (TextIteratorStreamer only supports a batch of one).
+    """
+    tokenizer = get_tokenizer()
+    model = get_model()
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True)
+
+    def run():
+        try:
+            if PROMPT_PREFIX_CACHE and generate_with_prefix_cache(prompt, streamer) is not None:
+                return
+            input_ids = torch.tensor([prompt], device=model.device)
+            model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                streamer=streamer,
+                **GENERATION_KWARGS,
+                **single_prompt_extras(),
+                eos_token_id=tokenizer.eos_token_id,
+                pad_token_id=tokenizer.eos_token_id
+            )
+        except Exception:
+            logger.exception("Streaming generate failed")
+            streamer.end()
+
+    threading.Thread(target=run, daemon=True).start()
+    yield from streamer
+
+# concurrent requests are batched into one generate call: up to
+# GEN_MAX_BATCH_SIZE prompts, waiting at most GEN_MAX_WAIT_MS for more to arrive
+scheduler = GenerationScheduler(
+    generate_batch,
+    max_batch_size=int(os.getenv("GEN_MAX_BATCH_SIZE", "8")),
+    max_wait_ms=float(os.getenv("GEN_MAX_WAIT_MS", "10")),
+)
+
+# -----------------------------
+# FastAPI Endpoint
+# -----------------------------
+
+#https://f034b03bd14d.ngrok-free.app
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once the startup warm-up has finished, 503 before."""
+    status = registry.status()
+    if extraction_pool is not None:
+        status["extraction_pool"] = extraction_pool.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+# identical pastes (same model and pipeline settings, same year) are answered
+# from the cache without running NER or generation; RESPONSE_CACHE_DB adds an
+# on-disk SQLite tier, so the key must change whenever a setting changes the body
+response_cache = ResponseCache.from_env()
+
+def extraction_setup() -> str:
+    """Everything besides the text and the year that an extracted response (or block) depends on."""
+    return (
+        f"{MODEL_NAME}|{TAGGING_MODE}|{','.join(NER_TIERS)}|rules={int(RULE_EXTRACTOR)}"
+        f"|constrained={int(CONSTRAINED_DECODING)}|mode={','.join(sorted(GEMMA_INFERENCE_MODE))}"
+        f"|lookup={PROMPT_LOOKUP_TOKENS}"
+    )
+
+@app.get("/cache-stats")
+def cache_stats():
+    return {"normalize_time": normalize_stats(), "responses": response_cache.stats(), "blocks": block_cache.stats()}
+
+# Blocks left for the LLM are packed into chunks of at most CHUNK_TOKEN_BUDGET
+# input tokens and CHUNK_MAX_BLOCKS blocks, so each chunk's JSON fits in
+# max_new_tokens; the chunks are generated together through the scheduler.
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "1024"))
+CHUNK_MAX_BLOCKS = int(os.getenv("CHUNK_MAX_BLOCKS", "16"))
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer()(text, add_special_tokens=False)["input_ids"])
+
+# -----------------------------
+# Block-level extraction cache
+# -----------------------------
+# Pastes of the same course page mostly repeat blocks that were extracted
+# before. With BLOCK_CACHE=1 each block's items and tagging tier are cached
+# under the hash of the normalized raw block, extraction_setup() and the
+# year, so only new or changed blocks run NER and generation. Every paste is
+# prepared block by block either way, and generated items are put back at the
+# block whose assignment name they carry, so the items come out in block
+# order whether they were cached or not. When an item of a multi-block chunk
+# can't be attributed (or the chunk produced nothing), none of that chunk's
+# blocks is cached. Every entry also keeps the seconds its block took, which
+# is reported as the time saved on later hits. BLOCK_CACHE_SIZE / _TTL_S / _DB
+# work as for the response cache (with EXTRACTION_WORKERS, _DB shares the
+# entries between workers; each process opens its own SQLite connection).
+BLOCK_CACHE = os.getenv("BLOCK_CACHE", "1") == "1"
+block_cache = ResponseCache.from_env("BLOCK_CACHE", default_size=4096)
+TAG_PATTERN = re.compile(r'</?[A-Z_]+>')
+
+def raw_blocks(text: str):
+    """The raw blocks of a paste that prepare_block keeps, in order."""
+    return [
+        block for block in BLOCK_SPLIT_PATTERN.split(text)
+        if block.strip() and block.strip() not in ("Assignment", "Quiz")
+    ]
+
+def tag_raw_blocks(blocks, use_lexer: bool, timings: RequestTimings):
+    """Cleaned <ASSIGNMENT> block and tagging tier per raw block."""
+    if use_lexer:
+        with timings.stage("lexer"):
+            return [lex_block(block) for block in blocks], ["lexer"] * len(blocks)
+    with timings.stage("ner"):
+        marked_blocks, block_tiers = tag_prepared_blocks([prepare_block(block) for block in blocks])
+    with timings.stage("tag_cleanup"):
+        cleaned = [clean_all_assignment_blocks(remove_ignore_lines(marked)) for marked in marked_blocks]
+    return cleaned, block_tiers
+
+def prepare_request(text: str, timings: RequestTimings = None):
+    """
+    Everything before generation for one paste. Returns (block_items, prompts,
+    block_tiers, block_plan): block_items holds a list of items per block
+    (rule-parsed or cached) or None for the blocks in the prompts, and
+    block_plan what finish_extraction needs to put the generated items back.
+    """
+    timings = timings or RequestTimings()
+    logger.debug("req %s", text)
+    return prepare_texts([text], timings)[0]
+
+def prepare_documents(texts, timings: RequestTimings):
+    """
+    prepare_request for several documents with one NER pass over all of
+    them. Returns the prepared tuple or the exception raised for each document.
+    """
+    try:
+        return prepare_texts(texts, timings)
+    except Exception:
+        # isolate the document that broke the shared pass
+        prepared = []
+        for text in texts:
+            try:
+                prepared.append(prepare_request(text, timings))
+            except Exception as e:
+                prepared.append(e)
+        return prepared
+
+def prepare_texts(texts, timings: RequestTimings):
+    """
+    Look every block up in the block cache, then tag the missing blocks of
+    all texts together (one nlp.pipe per NER tier), rule-parse them and pack
+    the rest into prompts per text.
+    """
+    started = time.perf_counter()
+    docs = [raw_blocks(text) for text in texts]
+    keys = [None] * len(texts)
+    entries = [[None] * len(blocks) for blocks in docs]
+    disk_hits = [0] * len(texts)
+    if BLOCK_CACHE:
+        with timings.stage("block_cache"):
+            setup = extraction_setup()
+            keys = [[make_cache_key(block, setup) for block in blocks] for blocks in docs]
+            for d, doc_keys in enumerate(keys):
+                disk_before = block_cache.disk_hits
+                entries[d] = [block_cache.get(key) for key in doc_keys]
+                disk_hits[d] = block_cache.disk_hits - disk_before
+    misses = [[i for i, entry in enumerate(doc_entries) if entry is None] for doc_entries in entries]
+    # the lexer only runs for tag-free pastes; the others go through NER
+    cleaned = [[None] * len(blocks) for blocks in docs]
+    tiers = [[None if entry is None else entry["tier"] for entry in doc_entries] for doc_entries in entries]
+    for use_lexer in (True, False):
+        group = [
+            (d, i) for d, text in enumerate(texts)
+            if (TAGGING_MODE == "lexer" and not TAG_LIKE_PATTERN.search(text)) == use_lexer
+            for i in misses[d]
+        ]
+        if not group:
+            continue
+        tagged, group_tiers = tag_raw_blocks([docs[d][i] for d, i in group], use_lexer, timings)
+        for (d, i), block, tier in zip(group, tagged, group_tiers):
+            cleaned[d][i] = block
+            tiers[d][i] = tier
+    miss_count = sum(len(doc_misses) for doc_misses in misses)
+    prepare_share = (time.perf_counter() - started) / max(miss_count, 1)
+    return [
+        prepare_blocks(docs[d], cleaned[d], tiers[d], keys[d], entries[d], misses[d], disk_hits[d], prepare_share, timings)
+        for d in range(len(texts))
+    ]
+
+def prepare_blocks(blocks, cleaned, block_tiers, keys, entries, misses, disk_hits: int, prepare_share: float,
+                   timings: RequestTimings):
+    """Rule extraction and prompt building for one text's tagged blocks."""
+    started = time.perf_counter()
+    block_items = [None if entry is None else copy.deepcopy(entry["items"]) for entry in entries]
+    llm_blocks = []
+    # Step 2: parse complete blocks directly, prompt only for the rest
+    with timings.stage("rules"):
+        for i in misses:
+            item = parse_tagged_block(cleaned[i]) if RULE_EXTRACTOR else None
+            if item is None:
+                llm_blocks.append(i)
+            else:
+                block_items[i] = [item]
+    logger.debug("ner tiers %s", block_tiers)
+    logger.debug("%d cached block(s), %d rule-parsed, %d left for the LLM",
+                 len(blocks) - len(misses), len(misses) - len(llm_blocks), len(llm_blocks))
+    with timings.stage("prompt_build"):
+        chunks = pack_chunks([cleaned[i] for i in llm_blocks], count_tokens, CHUNK_TOKEN_BUDGET, CHUNK_MAX_BLOCKS)
+        prompts = [build_prompt_ids("\n".join(chunk)) for chunk in chunks]
+    # pack_chunks keeps the block order, so each chunk holds the next blocks
+    chunk_blocks = []
+    for chunk in chunks:
+        start = sum(len(indices) for indices in chunk_blocks)
+        chunk_blocks.append(llm_blocks[start:start + len(chunk)])
+    hits = len(blocks) - len(misses)
+    saved_s = sum((entry["seconds"] for entry in entries if entry is not None), 0.0)
+    prepared_at = time.perf_counter()
+    block_plan = {
+        "keys": keys,  # None when BLOCK_CACHE is off
+        "raw": blocks,
+        "cleaned": cleaned,
+        "tiers": list(block_tiers),
+        "misses": misses,
+        "chunk_blocks": chunk_blocks,
+        "hits": hits,
+        "disk_hits": disk_hits,
+        "saved_s": saved_s,
+        "prepare_share_s": prepare_share + (prepared_at - started) / max(len(misses), 1),
+        "prepared_at": prepared_at,
+    }
+    return block_items, prompts, block_tiers, block_plan
+
+def name_key(name: str) -> str:
+    return " ".join(TAG_PATTERN.sub("", name).split()).casefold()
+
+def block_names(raw_block: str, cleaned_block: str):
+    """
+    Name keys an item generated from a block may carry: its raw name line and
+    the tag-stripped name in the tagged block (clean_due_tags can cut dates
+    out of names, so the two may differ).
+    """
+    names = set()
+    for text in (prepare_block(raw_block), cleaned_block):
+        found = ASSIGNMENT_NAME_PATTERN.search(text or "")
+        if found and name_key(found.group(1)):
+            names.add(name_key(found.group(1)))
+    return names
+
+def attribute_items(items, chunk_names):
+    """
+    Index into chunk_names (the block_names of a chunk's blocks) of the block
+    each generated item came from, or None when no single block matches.
+    """
+    if len(chunk_names) == 1:
+        return [0] * len(items)
+    owners = []
+    for item in items:
+        name = name_key(item.get("assignment") or "")
+        matches = [i for i, names in enumerate(chunk_names) if name in names]
+        if len(matches) != 1:
+            matches = [
+                i for i, names in enumerate(chunk_names)
+                if name and any(block_name in name or name in block_name for block_name in names)
+            ]
+        owners.append(matches[0] if len(matches) == 1 else None)
+    return owners
+
+def place_block_items(block_items, chunk_items, block_plan):
+    """
+    Put the generated items of each chunk at the blocks they came from (items
+    that can't be attributed go to the chunk's first block) and cache every
+    uncached block whose items are known. Returns the filled block_items.
+    """
+    block_items = list(block_items)
+    llm_block_count = sum(len(indices) for indices in block_plan["chunk_blocks"])
+    generate_share = (time.perf_counter() - block_plan["prepared_at"]) / max(llm_block_count, 1)
+    uncacheable = set()
+    for indices, items in zip(block_plan["chunk_blocks"], chunk_items):
+        chunk_names = [block_names(block_plan["raw"][i], block_plan["cleaned"][i]) for i in indices]
+        owners = attribute_items(items, chunk_names)
+        for i in indices:
+            block_items[i] = []
+        for item, owner in zip(items, owners):
+            block_items[indices[0 if owner is None else owner]].append(item)
+        if not items or None in owners:
+            uncacheable.update(indices)
+    if block_plan["keys"] is None:
+        return block_items
+    llm_blocks = {i for indices in block_plan["chunk_blocks"] for i in indices}
+    for i in block_plan["misses"]:
+        if block_items[i] is None or i in uncacheable:
+            continue
+        seconds = block_plan["prepare_share_s"] + (generate_share if i in llm_blocks else 0.0)
+        block_cache.set(block_plan["keys"][i], {
+            "items": copy.deepcopy(block_items[i]), "tier": block_plan["tiers"][i], "seconds": seconds,
+        })
+    return block_items
+
+def block_cache_stats(block_plan):
+    lookups = block_plan["hits"] + len(block_plan["misses"])
+    return {
+        "hits": block_plan["hits"],
+        "misses": len(block_plan["misses"]),
+        "hit_rate": block_plan["hits"] / lookups if lookups else 0.0,
+        "saved_ms": round(block_plan["saved_s"] * 1000, 1),
+    }
+
+def block_cache_counts(block_plan):
+    """The block-cache lookups of one prepared paste (None when BLOCK_CACHE is off)."""
+    if block_plan["keys"] is None:
+        return None
+    return {
+        "hits": block_plan["hits"],
+        "misses": len(block_plan["misses"]),
+        "disk_hits": block_plan["disk_hits"],
+        "saved_s": block_plan["saved_s"],
+    }
+
+def record_block_cache(counts, in_worker: bool = False):
+    """
+    Count one paste's block-cache lookups in this (the serving) process's
+    /metrics. Lookups made in a pool worker were counted on the worker's copy
+    of block_cache, so they are added to this one for /cache-stats too.
+    """
+    if counts is None:
+        return
+    BLOCK_CACHE_LOOKUPS.inc(counts["hits"], result="hit")
+    BLOCK_CACHE_LOOKUPS.inc(counts["misses"], result="miss")
+    BLOCK_CACHE_SAVED_SECONDS.inc(counts["saved_s"])
+    if in_worker:
+        block_cache.count_lookups(counts["hits"], counts["misses"], counts["disk_hits"])
+
+async def generate_prompts(prompts):
+    """Generate every prompt through the scheduler; returns (text, token count) per prompt."""
+    return await asyncio.gather(
+        *(asyncio.wrap_future(scheduler.submit(prompt_ids)) for prompt_ids in prompts)
+    )
+
+def finish_extraction(block_items, generations, block_plan):
+    """
+    Parse the generated JSON, put it at its blocks and merge it with the
+    rule-parsed and cached items; returns (assignments, generated tokens).
+    """
+    chunk_items = []
+    generated_tokens = 0
+    for generated_text, token_count in generations:
+        logger.debug("generated_text %s", generated_text)
+        generated_tokens += token_count
+        # Step 3: parse JSON
+        items = postprocess_json(generated_text)
+        for item in items:
+            item["source"] = "llm"
+        chunk_items.append(items)
+    block_items = place_block_items(block_items, chunk_items, block_plan)
+    assignments_list = dedupe_items(
+        [item for items in block_items if items is not None for item in items], ("assignment", "due_date", "time")
+    )
+    return assignments_list, generated_tokens
+
+def extraction_result(assignments_list, block_tiers, generated_tokens, block_plan):
+    """The response body of one extracted paste."""
+    result = {"assignments": assignments_list, "ner_tiers": block_tiers, "generated_tokens": generated_tokens}
+    if block_plan["keys"] is not None:
+        result["block_cache"] = block_cache_stats(block_plan)
+    return result
+
+def finish_timings(response: Response, timings: RequestTimings, endpoint: str, cache: str):
+    response.headers["Server-Timing"] = timings.server_timing()
+    REQUEST_SECONDS.observe(timings.total(), endpoint=endpoint, cache=cache)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint: stage/request latency, token and cache metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/extract-assignments", responses=json_body(ASSIGNMENTS_SCHEMA))
+async def extract_assignments(req: ExtractRequest):
+    timings = RequestTimings()
+    with timings.stage("cache"):
+        cache_key = make_cache_key(req.text, extraction_setup())
+        cached = response_cache.get(cache_key)
+    if cached is not None:
+        CACHE_LOOKUPS.inc(result="hit")
+        response = json_response(cached)
+        response.headers["X-Cache"] = "HIT"
+        finish_timings(response, timings, "extract", "hit")
+        return response
+    CACHE_LOOKUPS.inc(result="miss")
+    result = await run_extraction(req.text, timings)
+    if result["assignments"]:
+        response_cache.set(cache_key, result)
+    response = json_response(result)
+    response.headers["X-Cache"] = "MISS"
+    finish_timings(response, timings, "extract", "miss")
+    return response
+
+def extract_in_process(text: str, timings: RequestTimings = None):
+    """
+    The whole extraction of one paste without the scheduler, as run by the
+    pool workers. Returns (result, prompt token count, stage durations,
+    block-cache lookups), which the parent records as its own.
+    """
+    timings = timings or RequestTimings()
+    block_items, prompts, block_tiers, block_plan = prepare_request(text, timings)
+    with timings.stage("generate"):
+        generations = []
+        for i in range(0, len(prompts), scheduler.max_batch_size):
+            generations.extend(generate_batch(prompts[i:i + scheduler.max_batch_size]))
+    with timings.stage("parse"):
+        assignments_list, generated_tokens = finish_extraction(block_items, generations, block_plan)
+    result = extraction_result(assignments_list, block_tiers, generated_tokens, block_plan)
+    return result, sum(len(prompt_ids) for prompt_ids in prompts), timings.durations, block_cache_counts(block_plan)
+
+async def run_extraction(text: str, timings: RequestTimings):
+    """Extract one uncached paste, in a pool worker when EXTRACTION_WORKERS is set."""
+    if extraction_pool is not None:
+        result, prompt_tokens, durations, block_counts = await asyncio.wrap_future(
+            extraction_pool.submit(extract_in_process, text)
+        )
+        for name, seconds in durations.items():
+            timings.add(name, seconds)
+        record_block_cache(block_counts, in_worker=True)
+    else:
+        # NER and tokenization are CPU-bound, keep them off the event loop
+        block_items, prompts, block_tiers, block_plan = await run_in_threadpool(prepare_request, text, timings)
+        record_block_cache(block_cache_counts(block_plan))
+        with timings.stage("generate"):
+            generations = await generate_prompts(prompts)
+        with timings.stage("parse"):
+            assignments_list, generated_tokens = finish_extraction(block_items, generations, block_plan)
+        result = extraction_result(assignments_list, block_tiers, generated_tokens, block_plan)
+        prompt_tokens = sum(len(prompt_ids) for prompt_ids in prompts)
+    if prompt_tokens:
+        TOKENS.observe(prompt_tokens, kind="prompt")
+        TOKENS.observe(result["generated_tokens"], kind="generated")
+    return result
+
+# Documents per /extract-assignments/batch request
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "32"))
+
+@app.post("/extract-assignments/batch", responses=json_body(batch_schema(ASSIGNMENTS_SCHEMA)))
+async def extract_assignments_batch(req: BatchExtractRequest):
+    """
+    Extract several documents (e.g. one paste per course) in one request.
+    Cached documents are answered straight away; the rest share one NER pass
+    and their prompts are generated together through the scheduler. Results
+    are keyed by document id, and a failing document only sets its own error.
+    """
+    ids = [doc.id for doc in req.documents]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=422, detail="Document ids must be unique")
+    if len(ids) > BATCH_MAX_DOCUMENTS:
+        raise HTTPException(status_code=422, detail=f"At most {BATCH_MAX_DOCUMENTS} documents per batch")
+    timings = RequestTimings()
+    results = {}
+    pending = []
+    with timings.stage("cache"):
+        for doc in req.documents:
+            cache_key = make_cache_key(doc.text, extraction_setup())
+            cached = response_cache.get(cache_key)
+            CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss")
+            if cached is not None:
+                results[doc.id] = {**cached, "cached": True}
+            else:
+                pending.append((doc, cache_key))
+    if extraction_pool is not None:
+        # documents are spread over the workers instead of sharing one NER pass
+        extracted = await asyncio.gather(
+            *(run_extraction(doc.text, timings) for doc, _ in pending), return_exceptions=True
+        )
+        for (doc, cache_key), result in zip(pending, extracted):
+            if isinstance(result, Exception):
+                logger.error("Batch document %r failed", doc.id, exc_info=result)
+                results[doc.id] = {"assignments": [], "error": f"{type(result).__name__}: {result}"}
+                continue
+            if result["assignments"]:
+                response_cache.set(cache_key, result)
+            results[doc.id] = result
+        response = json_response({"results": {doc_id: {"cached": False, "error": None, **results[doc_id]} for doc_id in ids}})
+        finish_timings(response, timings, "batch", "hit" if not pending else "miss")
+        return response
+    prepared = await run_in_threadpool(prepare_documents, [doc.text for doc, _ in pending], timings)
+    for prepared_doc in prepared:
+        if not isinstance(prepared_doc, Exception):
+            record_block_cache(block_cache_counts(prepared_doc[3]))
+
+    async def generate_document(prepared_doc):
+        if isinstance(prepared_doc, Exception):
+            raise prepared_doc
+        return await generate_prompts(prepared_doc[1])
+
+    # every document's prompts are submitted at once, so the scheduler
+    # batches generation across documents
+    with timings.stage("generate"):
+        generations = await asyncio.gather(
+            *(generate_document(prepared_doc) for prepared_doc in prepared), return_exceptions=True
+        )
+    with timings.stage("parse"):
+        for (doc, cache_key), prepared_doc, doc_generations in zip(pending, prepared, generations):
+            if isinstance(doc_generations, Exception):
+                logger.error("Batch document %r failed", doc.id, exc_info=doc_generations)
+                results[doc.id] = {"assignments": [], "error": f"{type(doc_generations).__name__}: {doc_generations}"}
+                continue
+            block_items, prompts, block_tiers, block_plan = prepared_doc
+            assignments_list, generated_tokens = finish_extraction(block_items, doc_generations, block_plan)
+            if prompts:
+                TOKENS.observe(sum(len(prompt_ids) for prompt_ids in prompts), kind="prompt")
+                TOKENS.observe(generated_tokens, kind="generated")
+            result = extraction_result(assignments_list, block_tiers, generated_tokens, block_plan)
+            if assignments_list:
+                response_cache.set(cache_key, result)
+            results[doc.id] = result
+    # keep the request's document order
+    response = json_response({"results": {doc_id: {"cached": False, "error": None, **results[doc_id]} for doc_id in ids}})
+    finish_timings(response, timings, "batch", "hit" if not pending else "miss")
+    return response
+
+def stream_extracted(text: str):
+    """
+    NDJSON lines for /extract-assignments/stream: rule-parsed items first, then
+    each LLM item as soon as its JSON object is complete.
+    """
+    cache_key = make_cache_key(text, extraction_setup())
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        CACHE_LOOKUPS.inc(result="hit")
+        for item in cached["assignments"]:
+            yield to_json(item) + b"\n"
+        return
+    CACHE_LOOKUPS.inc(result="miss")
+    block_items, prompts, block_tiers, block_plan = prepare_request(text)
+    record_block_cache(block_cache_counts(block_plan))
+    key_fields = ("assignment", "due_date", "time")
+    assignments_list = dedupe_items(
+        [item for items in block_items if items is not None for item in items], key_fields
+    )
+    for item in assignments_list:
+        yield to_json(item) + b"\n"
+    seen = {item_key(item, key_fields) for item in assignments_list}
+    generations = []
+    for prompt_ids in prompts:
+        parser = JSONArrayStreamParser()
+        pieces = []
+        for piece in generate_streaming(prompt_ids):
+            pieces.append(piece)
+            for item in GEMMA_WIRE.clean(parser.feed(piece)):
+                item = normalize_item(item)
+                item["source"] = "llm"
+                key = item_key(item, key_fields)
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield to_json(item) + b"\n"
+        generated_text = "".join(pieces)
+        generations.append((generated_text, count_tokens(generated_text)))
+    # cache the body /extract-assignments would have built from these
+    # generations (block order, not streamed order), so both endpoints
+    # answer a later hit the same way
+    assignments_list, generated_tokens = finish_extraction(block_items, generations, block_plan)
+    if assignments_list:
+        response_cache.set(cache_key, extraction_result(assignments_list, block_tiers, generated_tokens, block_plan))
+
+@app.post("/extract-assignments/stream")
+def extract_assignments_stream(req: ExtractRequest):
+    """Streaming variant of /extract-assignments: one JSON item per line."""
+    return StreamingResponse(stream_extracted(req.text), media_type="application/x-ndjson")
@@ -1,7 +1,32 @@
-from pydantic import BaseModel, ValidationError
-from typing import List, Optional
+try:
+    from backend.schema import AssignmentItem, WireSchema
+except ImportError:  # running from inside backend/
+    from schema import AssignmentItem, WireSchema
 
-class Assignments(BaseModel):
-    assignment: str
-    due_date: str
-    due_time: Optional[str] = None
\ No newline at end of file
+class Assignments(AssignmentItem):
+    """
+    The shared AssignmentItem (schema.py) under this module's field names:
+    assignment, due_date, due_time. Validate model output with
+    Assignments.model_validate(data) or ASSIGNMENTS_WIRE.items(data_list).
+    """
+    __slots__ = ()
+
+    def __init__(self, assignment: str, due_date=None, due_time=None):
+        super().__init__(assignment, due_date, due_time)
+
+    @property
+    def assignment(self) -> str:
+        return self.name
+
+    @assignment.setter
+    def assignment(self, value: str):
+        self.name = value
+
+    @classmethod
+    def model_validate(cls, data) -> "Assignments":
+        return ASSIGNMENTS_WIRE.item(data)
+
+    def model_dump(self) -> dict:
+        return ASSIGNMENTS_WIRE.dump([self])[0]
+
+ASSIGNMENTS_WIRE = WireSchema({"name": "assignment", "due_date": "due_date", "due_time": "due_time"}, Assignments)
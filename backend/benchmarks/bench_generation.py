@@ -0,0 +1,117 @@
+"""
+Generation throughput of the batching scheduler (GEN_MAX_BATCH_SIZE) and
+time to first token of the streaming endpoint (PROMPT_PREFIX_CACHE).
+
+Throughput: submits --requests golden Canvas chunk prompts (the prompts
+golden_check.py uses, repeated as needed) at once, as that many concurrent
+clients would, to a GenerationScheduler running the server's generate_batch,
+once per batch size, and reports requests/s and generated tokens/s. Batch
+size 1 is the unbatched baseline (one generate call per request).
+
+Time to first token: runs every golden prompt through generate_streaming
+(the stream endpoint) and generate_batch (the JSON endpoint, whose first
+byte is the whole generation), with the prompt prefix cache on and off,
+and reports the median TTFT of each. It exits non-zero if any streamed or
+prefix-cached output differs from plain non-streaming generation.
+
+Run from the project root (needs the Gemma model, or GEMMA_MODEL_DIR):
+    python -m backend.benchmarks.bench_generation
+    python -m backend.benchmarks.bench_generation --batch-sizes 1,8,16 --requests 32
+"""
+import argparse
+import itertools
+import statistics
+import sys
+import time
+
+from backend import ai_llm_backend as backend
+from backend.generation_scheduler import GenerationScheduler
+from backend.golden_check import golden_prompts
+
+def scheduler_throughput(prompts, batch_size: int, max_wait_ms: float):
+    """(seconds, generated tokens, batches run) for every prompt submitted at once."""
+    scheduler = GenerationScheduler(backend.generate_batch, max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+    start = time.perf_counter()
+    futures = [scheduler.submit(prompt_ids) for prompt_ids in prompts]
+    generated = sum(token_count for _, token_count in (future.result() for future in futures))
+    return time.perf_counter() - start, generated, scheduler.batches_run
+
+def streaming_ttft(prompt_ids):
+    """(seconds to the first streamed text, whole streamed text) for one prompt."""
+    start = time.perf_counter()
+    first = None
+    pieces = []
+    for piece in backend.generate_streaming(prompt_ids):
+        if first is None and piece:
+            first = time.perf_counter() - start
+        pieces.append(piece)
+    return first, "".join(pieces)
+
+def blocking_ttft(prompt_ids):
+    """(seconds until the whole generation is back, its text) for one prompt."""
+    start = time.perf_counter()
+    (text, _), = backend.generate_batch([prompt_ids])
+    return time.perf_counter() - start, text
+
+def ttft_table(golden, repeats: int):
+    """{mode: median TTFT seconds}, and the number of outputs that differ from plain generation."""
+    modes = [
+        ("non-streaming, no prefix", blocking_ttft, False),
+        ("non-streaming, prefix", blocking_ttft, True),
+        ("streaming, no prefix", streaming_ttft, False),
+        ("streaming, prefix", streaming_ttft, True),
+    ]
+    prefix_cache = backend.PROMPT_PREFIX_CACHE
+    if not prefix_cache:
+        modes = [mode for mode in modes if not mode[2]]
+    medians, mismatches = {}, 0
+    try:
+        expected = {}
+        for label, fn, use_prefix in modes:
+            backend.PROMPT_PREFIX_CACHE = use_prefix
+            samples = []
+            for i, prompt_ids in enumerate(golden):
+                for _ in range(repeats):
+                    seconds, text = fn(prompt_ids)
+                    samples.append(seconds)
+                    mismatches += expected.setdefault(i, text).strip() != text.strip()
+            medians[label] = statistics.median(samples)
+    finally:
+        backend.PROMPT_PREFIX_CACHE = prefix_cache
+    return medians, mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", default="1,8", help="scheduler max_batch_size values, comma-separated")
+    parser.add_argument("--requests", type=int, default=16, help="concurrent requests per batch size")
+    parser.add_argument("--max-wait-ms", type=float, default=10.0, help="scheduler max_wait_ms")
+    parser.add_argument("--ttft-repeats", type=int, default=3, help="runs per prompt and mode for TTFT")
+    args = parser.parse_args()
+
+    golden = list(golden_prompts().values())
+    prompts = list(itertools.islice(itertools.cycle(golden), args.requests))
+    backend.generate_batch(prompts[:1])  # load the models and warm up
+
+    print(f"{args.requests} concurrent requests ({len(golden)} distinct golden prompts)")
+    print(f"{'batch size':>10} {'batches':>8} {'seconds':>8} {'req/s':>7} {'tok/s':>8} {'speedup':>8}")
+    baseline_s = None
+    for batch_size in (int(v) for v in args.batch_sizes.split(",") if v.strip()):
+        seconds, generated, batches = scheduler_throughput(prompts, batch_size, args.max_wait_ms)
+        baseline_s = baseline_s or seconds
+        print(f"{batch_size:10d} {batches:8d} {seconds:8.2f} {args.requests / seconds:7.2f} "
+              f"{generated / seconds:8.1f} {baseline_s / seconds:7.2f}x")
+
+    if not backend.PROMPT_PREFIX_CACHE:
+        print("\nPROMPT_PREFIX_CACHE is off (or the compile mode is on); only the no-prefix rows are measured")
+    medians, mismatches = ttft_table(golden, args.ttft_repeats)
+    baseline_s = medians["non-streaming, no prefix"]
+    print(f"\n{'mode':<26} {'median TTFT s':>14} {'speedup':>8}")
+    for label, seconds in medians.items():
+        print(f"{label:<26} {seconds:14.3f} {baseline_s / seconds:7.2f}x")
+    if mismatches:
+        print(f"FAIL: {mismatches} streamed or prefix-cached outputs differ from plain generation")
+        sys.exit(1)
+    print(f"OK: identical output in every mode on all {len(golden)} prompts")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Micro-benchmark for mark_tags on synthetic pastes of growing size.
+
+Run from the project root (uses the offline "rule" NER tier):
+    python -m backend.benchmarks.bench_mark_tags
+
+Two shapes are timed:
+- canvas:   one "Assignment" block per item, like a Canvas assignments page
+- schedule: a single long block with one dated line per item, like a
+            syllabus schedule table (the worst case for per-block work)
+Time per item should stay flat as the paste grows.
+"""
+import os
+import time
+
+os.environ.setdefault("NER_TIERS", "rule")
+
+from backend.ai_llm_backend import mark_tags
+
+MONTHS = ["Sep", "Oct", "Nov", "Dec"]
+SIZES = [125, 250, 500, 1000]
+REPEATS = 3
+
+def canvas_paste(n: int) -> str:
+    blocks = []
+    for i in range(n):
+        month = MONTHS[i % len(MONTHS)]
+        day = i % 28 + 1
+        blocks.append(
+            f"Assignment\nHomework {i}: Problem set \n"
+            f"Not available until {month} {day} at 12pm {month} {day} at 12pm\n"
+            f"Due {month} {day} at 11:59pm {month} {day} at 11:59pm\n"
+            f"-/10 ptsNo submission for this assignment. 10 points possible.\n"
+        )
+    return "".join(blocks)
+
+def schedule_paste(n: int) -> str:
+    lines = ["Course schedule"]
+    for i in range(n):
+        month = MONTHS[i % len(MONTHS)]
+        lines.append(f"Reading response {i} due {month} {i % 28 + 1} at 11:59pm, 5 points possible")
+    return "\n".join(lines)
+
+def best_time(text: str) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        mark_tags(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    for name, build in (("canvas", canvas_paste), ("schedule", schedule_paste)):
+        best_time(build(SIZES[0]))  # load the pipeline and fill the date cache
+        base = None
+        print(f"{name}:")
+        for n in SIZES:
+            seconds = best_time(build(n))
+            per_item = seconds / n * 1e6
+            base = base or per_item
+            print(f"  {n:>5} items  {seconds * 1000:8.1f} ms  {per_item:7.1f} us/item  x{per_item / base:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Per-worker memory and startup time of the Gemma backend.
+
+Starts N independent worker processes (like `uvicorn --workers N`), each of
+which imports ai_llm_backend, loads and warms up the models, and then waits
+while the parent reads its RSS, PSS and private memory from
+/proc/<pid>/smaps_rollup. PSS splits shared pages between the processes
+mapping them, so its sum is what the workers really cost together; with
+GEMMA_INFERENCE_MODE=mmap the weights are shared page cache instead of
+per-process copies.
+
+Two configurations are measured: "baseline" with the current environment,
+and "mmap" with GEMMA_INFERENCE_MODE=mmap plus, with --model-dir, the
+offline directories written by export_models.py. Linux only.
+
+Run from the project root:
+    python -m backend.export_models models
+    python -m backend.benchmarks.bench_model_memory --workers 4 --model-dir models
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+def child():
+    start = time.perf_counter()
+    # stdout carries the result line; the backend's own prints go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        from backend import ai_llm_backend as backend
+        backend.preload_models()
+        loaded = time.perf_counter() - start
+        backend.warm_up()
+    print(json.dumps({"load_s": round(loaded, 3), "startup_s": round(time.perf_counter() - start, 3)}), flush=True)
+    sys.stdin.read()  # stay alive until the parent has measured every worker
+
+def smaps_rollup_mb(pid: int):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(values["Rss"], 1),
+        "pss_mb": round(values["Pss"], 1),
+        "private_mb": round(values["Private_Clean"] + values["Private_Dirty"], 1),
+    }
+
+def measure(label: str, env: dict, workers: int):
+    """Start the workers one after another (as a restart would), then measure them together."""
+    procs, rows = [], []
+    try:
+        for _ in range(workers):
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "backend.benchmarks.bench_model_memory", "--child"],
+                env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+            )
+            procs.append(proc)
+            line = proc.stdout.readline()
+            if not line:
+                raise RuntimeError(f"{label}: worker {proc.pid} exited during startup")
+            rows.append(json.loads(line))
+        for proc, row in zip(procs, rows):
+            row.update(smaps_rollup_mb(proc.pid))
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait()
+    return {
+        "label": label,
+        "workers": rows,
+        "total_pss_mb": round(sum(r["pss_mb"] for r in rows), 1),
+        "total_rss_mb": round(sum(r["rss_mb"] for r in rows), 1),
+    }
+
+def print_result(result):
+    print(f"\n{result['label']}")
+    print(f"{'worker':<8} {'load s':>8} {'startup s':>10} {'RSS MB':>9} {'PSS MB':>9} {'private MB':>11}")
+    for i, r in enumerate(result["workers"]):
+        print(f"{i:<8} {r['load_s']:8.2f} {r['startup_s']:10.2f} {r['rss_mb']:9.1f} {r['pss_mb']:9.1f} {r['private_mb']:11.1f}")
+    print(f"{'total':<8} {'':>8} {'':>10} {result['total_rss_mb']:9.1f} {result['total_pss_mb']:9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--model-dir", help="export_models.py output directory for the mmap run")
+    parser.add_argument("--output", default="bench_model_memory.json", help="where to write the JSON results")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    baseline_env = dict(os.environ)
+    mmap_env = dict(os.environ)
+    modes = {m.strip() for m in mmap_env.get("GEMMA_INFERENCE_MODE", "fp32").split(",") if m.strip()}
+    mmap_env["GEMMA_INFERENCE_MODE"] = ",".join(sorted(modes | {"mmap"}))
+    if args.model_dir:
+        mmap_env["GEMMA_MODEL_DIR"] = os.path.join(args.model_dir, "gemma")
+        mmap_env["SPACY_MODEL_DIR"] = os.path.join(args.model_dir, "spacy")
+
+    results = [measure("baseline", baseline_env, args.workers), measure("mmap", mmap_env, args.workers)]
+    for result in results:
+        print_result(result)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+if __name__ == "__main__":
+    main()
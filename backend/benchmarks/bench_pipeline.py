@@ -0,0 +1,369 @@
+"""
+Per-stage benchmark of the extraction pipeline.
+
+Runs synthetic Canvas pastes and the recorded pastes in canvas_fixtures.py
+(repeated to grow them) through every stage of each backend on its own and
+reports p50/p95 latency, throughput and the peak RSS during each stage:
+the process's RSS high-water mark is reset (/proc/self/clear_refs) before
+the stage and read back (VmHWM) after it, so temporary buffers the stage
+frees again are included. Linux only; elsewhere the RSS fields are null.
+
+Gemma stages:  mark_tags, remove_ignore_lines, clean_all_assignment_blocks,
+               tokenization (chunking + chat template), generation,
+               postprocess_json
+Gemini stages: chunking, build_prompt, generation (incl. JSON parsing),
+               add_all_day_copies
+
+Every block goes to the model (the rule extractor is bypassed) so the LLM
+stages see the whole paste. By default the tokenizer, Gemma and Gemini are
+replaced with deterministic offline stubs that answer from the tagged input;
+--real-llm uses the real tokenizer and model instead (Gemini is always
+stubbed). Results are written as JSON for comparison across commits.
+
+Run from the project root:
+    python -m backend.benchmarks.bench_pipeline
+    python -m backend.benchmarks.bench_pipeline --backend gemma --sizes 50,200 --output before.json
+    python -m backend.benchmarks.bench_pipeline --compare before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import time
+
+os.environ.setdefault("NER_TIERS", "rule")
+# the Gemini backend refuses to import without a key; the stub never uses it
+os.environ.setdefault("GEMINI_KEY", "offline-benchmark")
+
+from backend.benchmarks.bench_mark_tags import canvas_paste
+from backend.canvas_fixtures import GOLDEN_FIXTURES
+
+DEFAULT_SIZES = "25,100,400"
+FIXTURE_REPEATS = [1, 4, 16]
+
+# -----------------------------
+# Deterministic stubs
+# -----------------------------
+class StubTokenizer:
+    """
+    Reversible word-level tokenizer: every run of word or whitespace
+    characters is one token. Stands in for the Gemma tokenizer offline.
+    """
+    PIECE_PATTERN = re.compile(r"\w+|\s+|[^\w\s]")
+    eos_token = "<eos>"
+
+    def __init__(self):
+        self.vocab = {self.eos_token: 0}
+        self.pieces = [self.eos_token]
+        self.eos_token_id = 0
+
+    def encode(self, text: str):
+        ids = []
+        for piece in self.PIECE_PATTERN.findall(text):
+            if piece not in self.vocab:
+                self.vocab[piece] = len(self.pieces)
+                self.pieces.append(piece)
+            ids.append(self.vocab[piece])
+        return ids
+
+    def __call__(self, text: str, add_special_tokens: bool = True):
+        return {"input_ids": self.encode(text)}
+
+    def apply_chat_template(self, messages, add_generation_prompt=True, tokenize=True, return_dict=True):
+        text = "".join(f"<{m['role']}>{m['content']}" for m in messages)
+        return {"input_ids": self.encode(text)}
+
+    def decode(self, ids):
+        return "".join(self.pieces[i] for i in ids)
+
+class StubGemma:
+    """
+    Answers a prompt with the JSON the rule extractor would build from its
+    <ASSIGNMENT> blocks, optionally sleeping token_ms per output token.
+    """
+    def __init__(self, backend, token_ms: float = 0.0):
+        self.backend = backend
+        self.token_ms = token_ms
+
+    def generate(self, prompt_ids):
+        tokenizer = self.backend.get_tokenizer()
+        prompt = tokenizer.decode(prompt_ids)
+        items = []
+        for block in self.backend.ASSIGNMENT_BLOCK_PATTERN.findall(prompt.split("Input:", 1)[-1]):
+            item = self.backend.parse_tagged_block(block)
+            if item is not None:
+                items.append({"assignment": item["assignment"], "due_date": item["due_date"], "time": item["time"]})
+        output_ids = tokenizer.encode(json.dumps(items)) + [tokenizer.eos_token_id]
+        if self.token_ms:
+            time.sleep(len(output_ids) * self.token_ms / 1000)
+        return self.backend.decode_generated(output_ids)
+
+STUB_DUE_PATTERN = re.compile(r"Due (\w{3}) (\d{1,2})(?: at (\d{1,2})(?::(\d{2}))?(am|pm))?")
+
+class StubGeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+class StubGeminiModel:
+    """Stands in for genai.GenerativeModel: a regex pass over the prompt's input text."""
+    def __init__(self, backend, latency_ms: float = 0.0):
+        self.backend = backend
+        self.latency_ms = latency_ms
+
+    async def generate_content_async(self, prompt, request_options=None):
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        text = prompt.split("**Real Input Text:**", 1)[-1]
+        year = datetime.date.today().year
+        items = []
+        for block in self.backend.split_blocks(text):
+            lines = [line.strip() for line in block.split("\n") if line.strip()]
+            names = [line for line in lines if line not in ("Assignment", "Quiz", "---") and not line.startswith("Due")]
+            due = STUB_DUE_PATTERN.search(block)
+            if not names or not due:
+                continue
+            month, day, hour, minute, meridiem = due.groups()
+            try:
+                due_date = datetime.datetime.strptime(f"{year} {month} {day}", "%Y %b %d").date().isoformat()
+            except ValueError:
+                continue
+            due_time = None
+            if hour:
+                hour = int(hour) % 12 + (12 if meridiem == "pm" else 0)
+                due_time = f"{hour:02d}:{minute or '00'}"
+            items.append({"name": names[0], "due_date": due_date, "due_time": due_time})
+        return StubGeminiResponse("```json\n" + json.dumps(items, indent=2) + "\n```")
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def percentile(samples, q: float) -> float:
+    """Nearest-rank percentile of samples (q in 0-100)."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+def proc_status_mb(field: str):
+    """A memory field of /proc/self/status (e.g. VmRSS, VmHWM) in MB, None off Linux."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def reset_peak_rss():
+    """Reset this process's RSS high-water mark (VmHWM) to its current RSS."""
+    gc.collect()
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def run_stage(fn, repeats: int):
+    """
+    Call fn repeats times (stdout silenced). Returns (last result, measurement)
+    with the seconds per call, the RSS before the first call and the peak RSS
+    over all calls.
+    """
+    samples = []
+    result = None
+    reset_peak_rss()
+    rss_before = proc_status_mb("VmRSS")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        # the backends print model loads and parse errors; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, {"samples": samples, "rss_before_mb": rss_before, "peak_rss_mb": proc_status_mb("VmHWM")}
+
+def stage_row(backend_name, input_name, items, chars, stage, measured):
+    samples = measured["samples"]
+    mean = sum(samples) / len(samples)
+    rss_before, peak = measured["rss_before_mb"], measured["peak_rss_mb"]
+    return {
+        "backend": backend_name,
+        "input": input_name,
+        "items": items,
+        "chars": chars,
+        "stage": stage,
+        "runs": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "mean_ms": round(mean * 1000, 3),
+        "items_per_s": round(items / mean, 1) if mean else None,
+        "chars_per_s": round(chars / mean, 1) if mean else None,
+        # peak RSS during the stage, and how far above the RSS at its start that is
+        "peak_rss_mb": round(peak, 1) if peak is not None else None,
+        "peak_rss_delta_mb": round(peak - rss_before, 1) if peak is not None and rss_before is not None else None,
+    }
+
+def bench_inputs(sizes):
+    """(name, text) pairs: synthetic Canvas pastes, then the recorded ones grown by repetition."""
+    inputs = [(f"synthetic-{n}", canvas_paste(n)) for n in sizes]
+    for name, text in GOLDEN_FIXTURES.items():
+        for repeat in FIXTURE_REPEATS:
+            inputs.append((f"{name}x{repeat}", "\n".join([text] * repeat)))
+    return inputs
+
+# -----------------------------
+# Pipelines
+# -----------------------------
+def bench_gemma(inputs, repeats: int, real_llm: bool, token_ms: float):
+    from backend import ai_llm_backend as backend
+    from backend.chunking import pack_chunks, split_blocks
+
+    if real_llm:
+        generate = lambda prompt_ids: backend.generate_batch([prompt_ids])[0]
+    else:
+        backend.registry.register("tokenizer", StubTokenizer)
+        generate = StubGemma(backend, token_ms).generate
+
+    rows = []
+    for input_name, text in inputs:
+        items = len(split_blocks(text))
+        row = lambda stage, measured: rows.append(stage_row("gemma", input_name, items, len(text), stage, measured))
+
+        marked, measured = run_stage(lambda: backend.mark_tags(text), repeats)
+        row("mark_tags", measured)
+        without_ignored, measured = run_stage(lambda: backend.remove_ignore_lines(marked), repeats)
+        row("remove_ignore_lines", measured)
+        cleaned, measured = run_stage(lambda: backend.clean_all_assignment_blocks(without_ignored), repeats)
+        row("clean_all_assignment_blocks", measured)
+
+        def tokenize():
+            blocks = backend.ASSIGNMENT_BLOCK_PATTERN.findall(cleaned)
+            chunks = pack_chunks(blocks, backend.count_tokens, backend.CHUNK_TOKEN_BUDGET, backend.CHUNK_MAX_BLOCKS)
+            return [backend.build_prompt_ids("\n".join(chunk)) for chunk in chunks]
+        prompts, measured = run_stage(tokenize, repeats)
+        row("tokenization", measured)
+        generations, measured = run_stage(lambda: [generate(prompt_ids) for prompt_ids in prompts], repeats)
+        row("generation", measured)
+        _, measured = run_stage(
+            lambda: [item for generated_text, _ in generations for item in backend.postprocess_json(generated_text)],
+            repeats,
+        )
+        row("postprocess_json", measured)
+    return rows
+
+def bench_gemini(inputs, repeats: int, latency_ms: float):
+    from backend import gemini_api_backend as backend
+
+    backend.gemini_model = StubGeminiModel(backend, latency_ms)
+    # one loop for every run: gemini_semaphore binds to the loop it is first used on
+    loop = asyncio.new_event_loop()
+
+    async def generate_all(prompts):
+        results = await asyncio.gather(*(backend.generate_assignments(prompt) for prompt in prompts))
+        return [item for result in results for item in result]
+
+    rows = []
+    try:
+        for input_name, text in inputs:
+            items = len(backend.split_blocks(text))
+            row = lambda stage, measured: rows.append(stage_row("gemini", input_name, items, len(text), stage, measured))
+
+            chunks, measured = run_stage(
+                lambda: backend.pack_chunks(
+                    backend.split_blocks(text), backend.estimate_tokens,
+                    backend.GEMINI_CHUNK_TOKEN_BUDGET, backend.GEMINI_CHUNK_MAX_BLOCKS,
+                ),
+                repeats,
+            )
+            row("chunking", measured)
+            prompts, measured = run_stage(lambda: [backend.build_prompt("".join(chunk)) for chunk in chunks], repeats)
+            row("build_prompt", measured)
+            extracted, measured = run_stage(lambda: loop.run_until_complete(generate_all(prompts)), repeats)
+            row("generation", measured)
+            _, measured = run_stage(lambda: backend.add_all_day_copies(extracted), repeats)
+            row("add_all_day_copies", measured)
+    finally:
+        loop.close()
+    return rows
+
+# -----------------------------
+# Reporting
+# -----------------------------
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_table(rows, baseline=None):
+    previous = {}
+    if baseline:
+        previous = {(r["backend"], r["input"], r["stage"]): r for r in baseline["results"]}
+    header = f"{'backend':<7} {'input':<16} {'stage':<28} {'p50 ms':>10} {'p95 ms':>10} {'items/s':>11} {'stage peak MB':>14} {'peak +MB':>9}"
+    if previous:
+        header += f" {'p50 vs base':>12}"
+    print(header)
+    for r in rows:
+        line = (
+            f"{r['backend']:<7} {r['input']:<16} {r['stage']:<28} {r['p50_ms']:10.3f} {r['p95_ms']:10.3f}"
+            f" {r['items_per_s'] or 0:11.1f} {r['peak_rss_mb'] or 0:14.1f} {r['peak_rss_delta_mb'] or 0:+9.1f}"
+        )
+        old = previous.get((r["backend"], r["input"], r["stage"]))
+        if old and old["p50_ms"]:
+            line += f" {r['p50_ms'] / old['p50_ms']:11.2f}x"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["gemma", "gemini", "all"], default="all")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="synthetic paste sizes in items, comma-separated")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per stage and input")
+    parser.add_argument("--real-llm", action="store_true", help="use the real Gemma tokenizer and model")
+    parser.add_argument("--stub-token-ms", type=float, default=0.0, help="simulated Gemma cost per output token")
+    parser.add_argument("--stub-gemini-ms", type=float, default=0.0, help="simulated Gemini latency per call")
+    parser.add_argument("--output", default="bench_pipeline.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="earlier results file to show p50 ratios against")
+    args = parser.parse_args()
+
+    inputs = bench_inputs([int(n) for n in args.sizes.split(",") if n.strip()])
+    rows = []
+    if args.backend in ("gemma", "all"):
+        rows += bench_gemma(inputs, args.repeats, args.real_llm, args.stub_token_ms)
+    if args.backend in ("gemini", "all"):
+        rows += bench_gemini(inputs, args.repeats, args.stub_gemini_ms)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(rows, baseline)
+
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "backend": args.backend,
+            "sizes": args.sizes,
+            "repeats": args.repeats,
+            "real_llm": args.real_llm,
+            "stub_token_ms": args.stub_token_ms,
+            "stub_gemini_ms": args.stub_gemini_ms,
+            "ner_tiers": os.environ.get("NER_TIERS"),
+        },
+        "results": rows,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {len(rows)} results to {args.output}")
+
+if __name__ == "__main__":
+    main()
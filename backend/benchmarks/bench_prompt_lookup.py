@@ -0,0 +1,94 @@
+"""
+Prompt-lookup decoding (PROMPT_LOOKUP_TOKENS) against plain greedy generate.
+
+Runs every golden Canvas prompt (the same chunk prompts golden_check.py
+uses) through the Gemma model once with plain generate and once per
+prompt-lookup draft length, and reports generated tokens, latency and
+tokens per second. It exits non-zero if any prompt-lookup output differs
+from plain generate. Prompt lookup is off by default with int8; run this
+under GEMMA_INFERENCE_MODE=int8 before opting in with PROMPT_LOOKUP_TOKENS.
+
+Run from the project root (needs the Gemma model, or GEMMA_MODEL_DIR):
+    python -m backend.benchmarks.bench_prompt_lookup
+    python -m backend.benchmarks.bench_prompt_lookup --draft-tokens 5,10,20 --repeats 3
+    GEMMA_INFERENCE_MODE=int8 python -m backend.benchmarks.bench_prompt_lookup
+"""
+import argparse
+import sys
+import time
+
+import torch
+
+from backend import ai_llm_backend as backend
+from backend.golden_check import golden_prompts
+
+def generate(prompt_ids, extras):
+    """(generated ids, seconds) for one prompt, cut after the first EOS."""
+    tokenizer = backend.get_tokenizer()
+    model = backend.get_model()
+    input_ids = torch.tensor([prompt_ids], device=model.device)
+    start = time.perf_counter()
+    with torch.no_grad():
+        outputs = model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            **backend.GENERATION_KWARGS,
+            **backend.generation_extras(),
+            **extras,
+            eos_token_id=tokenizer.eos_token_id,
+            pad_token_id=tokenizer.eos_token_id
+        )
+    seconds = time.perf_counter() - start
+    new_tokens = outputs[0][len(prompt_ids):].tolist()
+    if tokenizer.eos_token_id in new_tokens:
+        new_tokens = new_tokens[:new_tokens.index(tokenizer.eos_token_id) + 1]
+    return new_tokens, seconds
+
+def run(prompts, extras, repeats: int):
+    """Best-of-repeats latency per prompt: {name: (generated ids, seconds)}."""
+    results = {}
+    for name, prompt_ids in prompts.items():
+        best = None
+        for _ in range(repeats):
+            tokens, seconds = generate(prompt_ids, extras)
+            if best is None or seconds < best[1]:
+                best = (tokens, seconds)
+        results[name] = best
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--draft-tokens", default="10", help="prompt_lookup_num_tokens values to try, comma-separated")
+    parser.add_argument("--max-ngram", type=int, default=backend.PROMPT_LOOKUP_MAX_NGRAM, help="max_matching_ngram_size")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per prompt (the fastest is reported)")
+    args = parser.parse_args()
+
+    prompts = golden_prompts()
+    generate(next(iter(prompts.values())), {})  # load the models and warm up
+    modes = [("plain", {})]
+    for n in (int(v) for v in args.draft_tokens.split(",") if v.strip()):
+        modes.append((f"lookup-{n}", {"prompt_lookup_num_tokens": n, "max_matching_ngram_size": args.max_ngram}))
+    results = {label: run(prompts, extras, args.repeats) for label, extras in modes}
+
+    plain = results["plain"]
+    mismatches = 0
+    print(f"{'prompt':<18} {'mode':<12} {'tokens':>7} {'latency s':>10} {'tok/s':>8} {'speedup':>8}  identical")
+    for name in prompts:
+        for label, _ in modes:
+            tokens, seconds = results[label][name]
+            identical = tokens == plain[name][0]
+            mismatches += not identical
+            print(f"{name:<18} {label:<12} {len(tokens):7d} {seconds:10.3f} {len(tokens) / seconds:8.1f} "
+                  f"{plain[name][1] / seconds:7.2f}x  {identical}")
+    for label, _ in modes:
+        tokens = sum(len(t) for t, _ in results[label].values())
+        seconds = sum(s for _, s in results[label].values())
+        print(f"{'total':<18} {label:<12} {tokens:7d} {seconds:10.3f} {tokens / seconds:8.1f} "
+              f"{sum(s for _, s in plain.values()) / seconds:7.2f}x")
+    if mismatches:
+        print(f"FAIL: {mismatches} prompt-lookup outputs differ from plain generate")
+        sys.exit(1)
+    print(f"OK: prompt-lookup output matches plain generate on all {len(prompts)} prompts")
+
+if __name__ == "__main__":
+    main()
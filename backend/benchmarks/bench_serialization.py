@@ -0,0 +1,114 @@
+"""
+Benchmark of response serialization for a 1,000-item extraction: the shared
+schema (schema.py: validate the items once, return JSON bytes) against the
+per-backend pydantic response models it replaced, run through FastAPI's
+response_model path (validate the handler's dicts, then encode them).
+
+Run from the project root:
+    python -m backend.benchmarks.bench_serialization
+    python -m backend.benchmarks.bench_serialization --items 5000
+
+"miss" is a freshly extracted response (model output dicts in, body out);
+"hit" is a response-cache hit, whose stored dicts are already in wire format.
+Every case is checked for an identical JSON body before it is timed.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import List, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import BaseModel
+
+from backend.schema import GEMMA_WIRE, GEMINI_WIRE, json_response
+
+# --- the response models before schema.py ---
+class GemmaItem(BaseModel):
+    assignment: str
+    due_date: Optional[str] = None
+    time: Optional[str] = None
+    source: Optional[str] = None
+
+class GemmaAssignments(BaseModel):
+    assignments: List[GemmaItem]
+    ner_tiers: Optional[List[str]] = None
+    generated_tokens: Optional[int] = None
+
+class GeminiItem(BaseModel):
+    name: str
+    due_date: Optional[str] = None
+    due_time: Optional[str] = None
+
+class GeminiAssignments(BaseModel):
+    assignments: List[GeminiItem]
+
+def gemma_output(items: int):
+    return [
+        {"assignment": f"Homework {i}", "due_date": f"2025-10-{i % 28 + 1:02d}",
+         "time": "23:59" if i % 3 else None, "source": "rule" if i % 4 else "llm"}
+        for i in range(items)
+    ]
+
+def gemini_output(items: int):
+    return [
+        {"name": f"Homework {i}", "due_date": f"2025-10-{i % 28 + 1:02d}", "due_time": "23:59" if i % 3 else None}
+        for i in range(items)
+    ]
+
+def response_model_body(field, content) -> bytes:
+    """What FastAPI does with a handler's dict return value and response_model."""
+    return JSONResponse(asyncio.run(serialize_response(field=field, response_content=content))).body
+
+def best_time(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    gemma_field = create_model_field(name="Response_extract", type_=GemmaAssignments, mode="serialization")
+    gemini_field = create_model_field(name="Response_extract", type_=GeminiAssignments, mode="serialization")
+    gemma_items = gemma_output(args.items)
+    gemini_items = gemini_output(args.items)
+    gemma_extra = {"ner_tiers": ["rule"] * args.items, "generated_tokens": 0}
+    cases = [
+        ("gemma miss",
+         lambda: response_model_body(gemma_field, {"assignments": gemma_items, **gemma_extra}),
+         lambda: json_response({"assignments": GEMMA_WIRE.clean(gemma_items), **gemma_extra}).body),
+        ("gemma hit",
+         lambda: response_model_body(gemma_field, {"assignments": gemma_items, **gemma_extra}),
+         lambda: json_response({"assignments": gemma_items, **gemma_extra}).body),
+        ("gemini miss",
+         lambda: response_model_body(gemini_field, {"assignments": gemini_items}),
+         lambda: json_response({"assignments": GEMINI_WIRE.clean(gemini_items)}).body),
+        ("gemini hit",
+         lambda: response_model_body(gemini_field, {"assignments": gemini_items}),
+         lambda: json_response({"assignments": gemini_items}).body),
+    ]
+
+    mismatches = [name for name, before, after in cases if json.loads(before()) != json.loads(after())]
+    if mismatches:
+        print(f"FAIL: response bodies differ for {', '.join(mismatches)}")
+        sys.exit(1)
+
+    print(f"{args.items} items per response")
+    print(f"{'case':<12} {'response_model ms':>18} {'schema.py ms':>13} {'speedup':>8}")
+    for name, before, after in cases:
+        before_s = best_time(before, args.repeats)
+        after_s = best_time(after, args.repeats)
+        print(f"{name:<12} {before_s * 1000:18.2f} {after_s * 1000:13.2f} {before_s / after_s:7.1f}x")
+    print(f"OK: identical bodies for all {len(cases)} cases")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark of the single-pass tagging lexer (TAGGING_MODE=lexer) against the
+regex/spaCy chain it replaces:
+    clean_all_assignment_blocks(remove_ignore_lines(mark_tags(text)))
+
+Run from the project root (the chain uses the offline "rule" NER tier):
+    python -m backend.benchmarks.bench_tag_lexer
+
+Every input is checked for identical output before it is timed, so this
+also fails loudly if the two ever drift apart.
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+os.environ.setdefault("NER_TIERS", "rule")
+
+from backend.ai_llm_backend import mark_tags, remove_ignore_lines, clean_all_assignment_blocks
+from backend.benchmarks.bench_mark_tags import canvas_paste, schedule_paste, SIZES, REPEATS
+from backend.canvas_fixtures import GOLDEN_FIXTURES
+from backend.tag_lexer import lex_tagged_text
+
+def regex_chain(text: str) -> str:
+    # mark_tags prints every block; keep that out of the timing output
+    with contextlib.redirect_stdout(io.StringIO()):
+        return clean_all_assignment_blocks(remove_ignore_lines(mark_tags(text)))
+
+def lexer(text: str) -> str:
+    return lex_tagged_text(text)[0]
+
+def best_time(fn, text: str) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    inputs = list(GOLDEN_FIXTURES.items())
+    for n in SIZES:
+        inputs.append((f"canvas-{n}", canvas_paste(n)))
+        inputs.append((f"schedule-{n}", schedule_paste(n)))
+
+    mismatches = [name for name, text in inputs if regex_chain(text) != lexer(text)]
+    if mismatches:
+        print(f"FAIL: lexer output differs from the regex chain for {', '.join(mismatches)}")
+        sys.exit(1)
+
+    regex_chain(inputs[0][1])  # load the pipeline and fill the date cache
+    print(f"{'input':<16} {'chain ms':>10} {'lexer ms':>10} {'speedup':>8}")
+    for name, text in inputs:
+        chain_s = best_time(regex_chain, text)
+        lexer_s = best_time(lexer, text)
+        print(f"{name:<16} {chain_s * 1000:10.2f} {lexer_s * 1000:10.2f} {chain_s / lexer_s:7.1f}x")
+    print(f"OK: identical output on all {len(inputs)} inputs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import base64
+import functools
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from google.auth.exceptions import RefreshError
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from pydantic import BaseModel
+
+# -----------------------------
+# Bulk Google Calendar insert (shared by both backends)
+# -----------------------------
+# Approved events are inserted with Calendar API batch requests (one
+# multipart/mixed HTTP call per CALENDAR_BATCH_SIZE events, the documented
+# Calendar limit is 50) using the caller's OAuth access token. Items that fail
+# with a retryable status are sent again in the next round, with exponential
+# backoff, up to CALENDAR_MAX_RETRIES times; every item reports its own status.
+# A failed batch call (a 5xx, or a dropped connection with no status at all)
+# may still have inserted some of its events, so every event is sent with a
+# client-side id derived from the call and its position: a retry of an event
+# that did land gets a 409 duplicate, which is reported as inserted instead
+# of creating a second copy. Events that already carry an id keep it.
+# CALENDAR_API_ROOT points the client at another server (e.g. a local fake).
+CALENDAR_API_ROOT = os.getenv("CALENDAR_API_ROOT") or None
+CALENDAR_BATCH_SIZE = min(int(os.getenv("CALENDAR_BATCH_SIZE", "50")), 50)
+CALENDAR_MAX_RETRIES = int(os.getenv("CALENDAR_MAX_RETRIES", "3"))
+CALENDAR_RETRY_BACKOFF_S = float(os.getenv("CALENDAR_RETRY_BACKOFF_S", "0.5"))
+CALENDAR_MAX_EVENTS = int(os.getenv("CALENDAR_MAX_EVENTS", "500"))
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RETRYABLE_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}  # sent as 403s
+
+class CalendarInsertRequest(BaseModel):
+    calendar_id: str
+    events: List[Dict[str, Any]]  # Calendar API event resources, as events.insert takes them
+
+class EventInsertResult(BaseModel):
+    index: int  # position in the request's events list
+    status: str  # "inserted" or "failed"
+    attempts: int
+    event_id: Optional[str] = None
+    html_link: Optional[str] = None
+    error: Optional[str] = None
+    http_status: Optional[int] = None
+
+class CalendarInsertResponse(BaseModel):
+    results: List[EventInsertResult]
+    inserted: int
+    failed: int
+    batches: int  # batch HTTP requests sent
+
+@functools.lru_cache(maxsize=1)
+def calendar_discovery_doc():
+    """The bundled Calendar v3 discovery document, pointed at CALENDAR_API_ROOT if set."""
+    doc = json.loads(get_static_doc("calendar", "v3"))
+    if CALENDAR_API_ROOT:
+        doc["rootUrl"] = CALENDAR_API_ROOT.rstrip("/") + "/"
+    return doc
+
+def calendar_service(access_token: str):
+    return build_from_document(calendar_discovery_doc(), credentials=Credentials(access_token))
+
+def error_reason(error) -> Optional[str]:
+    try:
+        return json.loads(error.content)["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+def error_status(error) -> Optional[int]:
+    return getattr(getattr(error, "resp", None), "status", None)
+
+def client_event_id(call_id: str, index: int) -> str:
+    """Deterministic Calendar event id (base32hex, as the API requires) for one event of one call."""
+    digest = hashlib.sha256(f"{call_id}:{index}".encode()).digest()
+    return base64.b32hexencode(digest).decode().lower().rstrip("=")
+
+def is_duplicate(error) -> bool:
+    """A 409 for an event id that already exists, i.e. an earlier attempt did insert it."""
+    return error_status(error) == 409 and error_reason(error) == "duplicate"
+
+def is_retryable(error) -> bool:
+    status = error_status(error)
+    if status is None:
+        return True  # connection-level failure of the whole batch
+    return status in RETRYABLE_STATUSES or (status == 403 and error_reason(error) in RETRYABLE_REASONS)
+
+def insert_events(access_token: str, calendar_id: str, events) -> CalendarInsertResponse:
+    """Insert every event through batch requests; returns per-item results in request order."""
+    service = calendar_service(access_token)
+    call_id = uuid.uuid4().hex
+    events = [dict(event, id=event.get("id") or client_event_id(call_id, i)) for i, event in enumerate(events)]
+    results = [EventInsertResult(index=i, status="failed", attempts=0) for i in range(len(events))]
+    pending = list(range(len(events)))
+    batches = 0
+    for attempt in range(CALENDAR_MAX_RETRIES + 1):
+        if not pending:
+            break
+        if attempt:
+            time.sleep(CALENDAR_RETRY_BACKOFF_S * 2 ** (attempt - 1))
+        retry = []
+
+        def on_response(request_id, response, exception):
+            i = int(request_id)
+            result = results[i]
+            if exception is None:
+                result.status = "inserted"
+                result.event_id = response.get("id")
+                result.html_link = response.get("htmlLink")
+                result.error = result.http_status = None
+                return
+            if is_duplicate(exception):
+                # inserted by an earlier attempt whose response was lost
+                result.status = "inserted"
+                result.event_id = events[i]["id"]
+                result.error = result.http_status = None
+                return
+            result.error = str(exception)
+            result.http_status = error_status(exception)
+            if is_retryable(exception):
+                retry.append(i)
+
+        for start in range(0, len(pending), CALENDAR_BATCH_SIZE):
+            chunk = pending[start:start + CALENDAR_BATCH_SIZE]
+            batch = service.new_batch_http_request(callback=on_response)
+            for i in chunk:
+                results[i].attempts += 1
+                batch.add(service.events().insert(calendarId=calendar_id, body=events[i]), request_id=str(i))
+            batches += 1
+            try:
+                batch.execute()
+            except RefreshError as e:
+                # the access token was rejected and can't be refreshed here
+                for i in chunk:
+                    results[i].error = f"Access token rejected: {e}"
+                    results[i].http_status = 401
+                continue
+            except Exception as e:
+                # the batch call itself failed; every item in it is retried
+                # (their client-side ids make a retry of a landed insert a 409)
+                for i in chunk:
+                    results[i].error = str(e)
+                    results[i].http_status = error_status(e)
+                    if is_retryable(e):
+                        retry.append(i)
+        pending = sorted(retry)
+    inserted = sum(r.status == "inserted" for r in results)
+    return CalendarInsertResponse(results=results, inserted=inserted, failed=len(results) - inserted, batches=batches)
+
+def bearer_token(authorization: str) -> str:
+    """The access token of an 'Authorization: Bearer <token>' header (401 otherwise)."""
+    scheme, _, access_token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not access_token:
+        raise HTTPException(status_code=401, detail="Expected 'Authorization: Bearer <access token>'")
+    return access_token
+
+router = APIRouter()
+
+@router.post("/calendar/insert-events", response_model=CalendarInsertResponse)
+def insert_calendar_events(req: CalendarInsertRequest, authorization: str = Header(...)):
+    """
+    Insert approved events into one calendar with the caller's Google OAuth
+    token (Authorization: Bearer <token>). Per-item failures are reported in
+    the results, not as an error status.
+    """
+    access_token = bearer_token(authorization)
+    if len(req.events) > CALENDAR_MAX_EVENTS:
+        raise HTTPException(status_code=422, detail=f"At most {CALENDAR_MAX_EVENTS} events per request")
+    return insert_events(access_token, req.calendar_id, req.events)
@@ -0,0 +1,124 @@
+"""
+End-to-end check of POST /calendar/insert-events against a local fake
+Google Calendar server (no network, no Google account).
+
+The fake server (fake_calendar_server.py) speaks the Calendar API batch
+protocol and fails events tagged "[flaky]" or "[ratelimit]" once and
+"[bad]" always, and drops the connection of the first batch holding a
+"[lost]" event after inserting it. The check posts a Gemini-sized approval
+(every timed item plus its all-day copy) through the endpoint, exits
+non-zero unless every item reports the expected status and was inserted
+exactly once, and compares the time against one events.insert per event.
+
+Run from the project root:
+    python -m backend.calendar_batch_check
+    python -m backend.calendar_batch_check --items 60 --latency-ms 50
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+from backend.fake_calendar_server import start_fake_calendar
+
+def approved_events(items: int):
+    """Every item as a timed event plus its all-day copy, as the Gemini backend returns them."""
+    events = []
+    for i in range(items):
+        tag = "[bad]" if i == items - 1 else "[lost]" if i == 1 else "[flaky]" if i % 7 == 3 else "[ratelimit]" if i % 11 == 5 else ""
+        day = f"2025-10-{i % 28 + 1:02d}"
+        events.append({
+            "summary": f"Assignment {i} {tag}".strip(),
+            "start": {"dateTime": f"{day}T23:59:00", "timeZone": "America/New_York"},
+            "end": {"dateTime": f"{day}T23:59:00", "timeZone": "America/New_York"},
+        })
+        events.append({"summary": f"Assignment {i} (all day) {tag}".strip(), "start": {"date": day}, "end": {"date": day}})
+    return events
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=60, help="approved assignments (each becomes two events)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated latency per HTTP request")
+    args = parser.parse_args()
+
+    fake, server, api_root = start_fake_calendar(args.latency_ms)
+    os.environ["CALENDAR_API_ROOT"] = api_root
+    os.environ.setdefault("CALENDAR_RETRY_BACKOFF_S", "0.05")
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from backend import calendar_batch
+
+    app = FastAPI()
+    app.include_router(calendar_batch.router)
+    client = TestClient(app)
+    events = approved_events(args.items)
+
+    start = time.perf_counter()
+    response = client.post(
+        "/calendar/insert-events",
+        json={"calendar_id": "primary", "events": events},
+        headers={"Authorization": "Bearer fake-token"},
+    )
+    batch_s = time.perf_counter() - start
+    body = response.json()
+
+    failures = []
+    if response.status_code != 200:
+        failures.append(f"status {response.status_code}: {body}")
+    else:
+        if [r["index"] for r in body["results"]] != list(range(len(events))):
+            failures.append("results are not in request order")
+        # the batch that held a "[lost]" event is sent again, either by the HTTP
+        # client itself or as the endpoint's next round, so only the status of
+        # its events is fixed
+        lost_batches = {
+            i // calendar_batch.CALENDAR_BATCH_SIZE for i, event in enumerate(events) if "[lost]" in event["summary"]
+        }
+        for i, (result, event) in enumerate(zip(body["results"], events)):
+            summary = event["summary"]
+            expected = "failed" if "[bad]" in summary else "inserted"
+            attempts = 2 if "[flaky]" in summary or "[ratelimit]" in summary else 1
+            if i // calendar_batch.CALENDAR_BATCH_SIZE in lost_batches:
+                attempts = result["attempts"]
+            if result["status"] != expected or result["attempts"] != attempts:
+                failures.append(f"{summary}: {result}")
+        stored = [e["summary"] for e in fake.calendars.get("primary", {}).values()]
+        duplicates = sorted({summary for summary in stored if stored.count(summary) > 1})
+        if duplicates:
+            failures.append(f"inserted more than once: {duplicates}")
+        if len(stored) != body["inserted"]:
+            failures.append(f"{len(stored)} events stored, {body['inserted']} reported inserted")
+        if any(size > calendar_batch.CALENDAR_BATCH_SIZE for size in fake.batch_sizes):
+            failures.append(f"batch larger than {calendar_batch.CALENDAR_BATCH_SIZE}: {fake.batch_sizes}")
+    missing_auth = client.post("/calendar/insert-events", json={"calendar_id": "primary", "events": events[:1]})
+    if missing_auth.status_code == 200:
+        failures.append("request without an access token was accepted")
+
+    # baseline: one events.insert round trip per event, as dashboard.js did
+    service = calendar_batch.calendar_service("fake-token")
+    start = time.perf_counter()
+    for event in events:
+        try:
+            service.events().insert(calendarId="primary", body=event).execute()
+        except Exception:
+            pass
+    sequential_s = time.perf_counter() - start
+    server.shutdown()
+
+    if response.status_code == 200:
+        print(f"{len(events)} events: {body['inserted']} inserted, {body['failed']} failed, "
+              f"{body['batches']} batch request(s) of sizes {fake.batch_sizes} "
+              f"(expected {math.ceil(len(events) / calendar_batch.CALENDAR_BATCH_SIZE)} + retries)")
+    print(f"batch endpoint: {batch_s:.2f}s   one insert per event: {sequential_s:.2f}s   "
+          f"({sequential_s / batch_s:.1f}x)")
+    if failures:
+        print("FAIL:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("OK: every event reported the expected status")
+
+if __name__ == "__main__":
+    main()
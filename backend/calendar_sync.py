@@ -0,0 +1,179 @@
+import asyncio
+import datetime
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from fastapi import APIRouter, Header, HTTPException
+from googleapiclient.errors import HttpError
+from pydantic import BaseModel
+
+try:
+    from backend.calendar_batch import calendar_service, bearer_token
+except ImportError:  # running from inside backend/
+    from calendar_batch import calendar_service, bearer_token
+
+# -----------------------------
+# Incremental calendar event aggregation (shared by both backends)
+# -----------------------------
+# POST /calendar/events lists the events of every requested calendar
+# concurrently and returns them in one response. Each (access token,
+# calendar) keeps its event set and the nextSyncToken of its last listing,
+# so later refreshes only pull what changed since (a 410 from the API falls
+# back to a full listing). The user's timezone setting is cached per token
+# for CALENDAR_TIMEZONE_TTL_S. Tokens are only kept as SHA-256 hashes.
+CALENDAR_SYNC_MAX_CALENDARS = int(os.getenv("CALENDAR_SYNC_MAX_CALENDARS", "1024"))
+CALENDAR_SYNC_PAGE_SIZE = int(os.getenv("CALENDAR_SYNC_PAGE_SIZE", "250"))
+CALENDAR_TIMEZONE_TTL_S = float(os.getenv("CALENDAR_TIMEZONE_TTL_S", "3600"))
+
+class CalendarEventsRequest(BaseModel):
+    calendar_ids: List[str]
+    time_min: Optional[str] = None  # RFC 3339; defaults to the start of today in the user's timezone
+    max_results: int = 50  # per calendar, soonest first
+
+class CalendarEventsResponse(BaseModel):
+    timezone: str
+    time_min: str
+    events_by_calendar: Dict[str, List[Dict[str, Any]]]
+    sync: Dict[str, str]  # "full" or "incremental" listing per calendar
+    errors: Dict[str, str] = {}  # calendars that couldn't be listed
+
+class CalendarSyncState:
+    def __init__(self):
+        self.lock = threading.Lock()  # one listing per calendar at a time
+        self.time_min = None
+        self.sync_token = None
+        self.events = {}  # event id -> event
+
+sync_states = OrderedDict()  # (token hash, calendar id) -> CalendarSyncState, least recently used first
+timezones = {}  # token hash -> (timezone, expiry)
+states_lock = threading.Lock()
+
+def token_key(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode()).hexdigest()
+
+def sync_state(key: str, calendar_id: str) -> CalendarSyncState:
+    with states_lock:
+        state = sync_states.get((key, calendar_id))
+        if state is None:
+            state = sync_states[(key, calendar_id)] = CalendarSyncState()
+        sync_states.move_to_end((key, calendar_id))
+        while len(sync_states) > CALENDAR_SYNC_MAX_CALENDARS:
+            sync_states.popitem(last=False)
+        return state
+
+def user_timezone(access_token: str) -> str:
+    key = token_key(access_token)
+    with states_lock:
+        cached = timezones.get(key)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    value = calendar_service(access_token).settings().get(setting="timezone").execute()["value"]
+    with states_lock:
+        timezones[key] = (value, time.monotonic() + CALENDAR_TIMEZONE_TTL_S)
+    return value
+
+def list_all(service, calendar_id: str, **params):
+    """Every page of one events.list; returns (items, nextSyncToken)."""
+    items = []
+    page_token = None
+    while True:
+        page = service.events().list(
+            calendarId=calendar_id, singleEvents=True, maxResults=CALENDAR_SYNC_PAGE_SIZE,
+            pageToken=page_token, **params
+        ).execute()
+        items.extend(page.get("items", []))
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return items, page.get("nextSyncToken")
+
+def sync_calendar(access_token: str, calendar_id: str, time_min: datetime.datetime):
+    """(events from time_min's listing window on, "full" or "incremental") for one calendar."""
+    state = sync_state(token_key(access_token), calendar_id)
+    with state.lock:
+        service = calendar_service(access_token)
+        # an earlier window start than the cached listing needs a full listing
+        mode = "incremental" if state.sync_token and time_min >= state.time_min else "full"
+        if mode == "incremental":
+            try:
+                changes, sync_token = list_all(service, calendar_id, syncToken=state.sync_token)
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                mode = "full"  # sync token expired
+            else:
+                for event in changes:
+                    if event.get("status") == "cancelled":
+                        state.events.pop(event["id"], None)
+                    else:
+                        state.events[event["id"]] = event
+        if mode == "full":
+            items, sync_token = list_all(service, calendar_id, timeMin=time_min.isoformat())
+            state.events = {event["id"]: event for event in items if event.get("status") != "cancelled"}
+            state.time_min = time_min
+        state.sync_token = sync_token
+        return list(state.events.values()), mode
+
+def event_time(when: dict, tz: ZoneInfo) -> Optional[datetime.datetime]:
+    """A start/end field as an aware datetime (all-day dates at midnight in tz)."""
+    if when.get("dateTime"):
+        value = datetime.datetime.fromisoformat(when["dateTime"])
+        return value if value.tzinfo else value.replace(tzinfo=tz)
+    if when.get("date"):
+        return datetime.datetime.combine(datetime.date.fromisoformat(when["date"]), datetime.time(), tz)
+    return None
+
+def upcoming(events, time_min: datetime.datetime, tz: ZoneInfo, max_results: int):
+    """Events that end after time_min, soonest start first (as events.list orderBy=startTime)."""
+    timed = []
+    for event in events:
+        start = event_time(event.get("start", {}), tz)
+        end = event_time(event.get("end", {}), tz) or start
+        if start is not None and end > time_min:
+            timed.append((start, event.get("id", ""), event))
+    timed.sort(key=lambda entry: entry[:2])
+    return [event for _, _, event in timed[:max_results]]
+
+router = APIRouter()
+
+@router.post("/calendar/events", response_model=CalendarEventsResponse)
+async def calendar_events(req: CalendarEventsRequest, authorization: str = Header(...)):
+    """
+    Upcoming events of every requested calendar in one response, listed
+    concurrently and incrementally (see the section comment above).
+    """
+    access_token = bearer_token(authorization)
+    try:
+        timezone = await asyncio.to_thread(user_timezone, access_token)
+    except HttpError as e:
+        raise HTTPException(status_code=e.resp.status, detail=f"Reading the timezone setting failed: {e}")
+    tz = ZoneInfo(timezone)
+    if req.time_min:
+        try:
+            time_min = event_time({"dateTime": req.time_min}, tz)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="time_min must be an RFC 3339 timestamp")
+    else:
+        time_min = datetime.datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    calendar_ids = list(dict.fromkeys(req.calendar_ids))
+    listings = await asyncio.gather(
+        *(asyncio.to_thread(sync_calendar, access_token, calendar_id, time_min) for calendar_id in calendar_ids),
+        return_exceptions=True,
+    )
+    events_by_calendar, sync, errors = {}, {}, {}
+    for calendar_id, listing in zip(calendar_ids, listings):
+        if isinstance(listing, Exception):
+            errors[calendar_id] = str(listing)
+            events_by_calendar[calendar_id] = []
+            continue
+        events, sync[calendar_id] = listing
+        events_by_calendar[calendar_id] = upcoming(events, time_min, tz, req.max_results)
+    return CalendarEventsResponse(
+        timezone=timezone, time_min=time_min.isoformat(),
+        events_by_calendar=events_by_calendar, sync=sync, errors=errors,
+    )
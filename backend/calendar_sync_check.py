@@ -0,0 +1,148 @@
+"""
+End-to-end check of POST /calendar/events against the local Calendar
+stand-in (fake_calendar_server.py; no network, no Google account).
+
+Lists several calendars through the endpoint, then changes them (adds,
+deletes, expires the sync tokens, asks for a calendar that doesn't exist)
+and lists again. Exits non-zero unless every response matches the
+stand-in's current events, later refreshes are incremental, and the
+timezone setting is read only once. The time is compared against what
+dashboard.js did before: settings.get plus one events.list per calendar,
+one after another.
+
+Run from the project root:
+    python -m backend.calendar_sync_check
+    python -m backend.calendar_sync_check --calendars 6 --latency-ms 80
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+from zoneinfo import ZoneInfo
+
+from backend.fake_calendar_server import start_fake_calendar
+
+TOKEN = "fake-token"
+
+def fill_calendars(fake, calendars: int, events_per_calendar: int):
+    tz = ZoneInfo(fake.timezone)
+    today = datetime.datetime.now(tz).replace(hour=9, minute=0, second=0, microsecond=0)
+    for c in range(calendars):
+        for i in range(events_per_calendar):
+            # a few days back to a couple of weeks ahead, every fifth one all day
+            start = today + datetime.timedelta(days=i % 17 - 3, hours=i % 5)
+            if i % 5 == 0:
+                fake.add_event(f"cal-{c}", {
+                    "summary": f"Calendar {c} all-day {i}",
+                    "start": {"date": start.date().isoformat()},
+                    "end": {"date": (start.date() + datetime.timedelta(days=1)).isoformat()},
+                })
+            else:
+                fake.add_event(f"cal-{c}", {
+                    "summary": f"Calendar {c} event {i}",
+                    "start": {"dateTime": start.isoformat()},
+                    "end": {"dateTime": (start + datetime.timedelta(hours=1)).isoformat()},
+                })
+
+def expected_events(fake, calendar_sync, calendar_ids, time_min, max_results: int):
+    tz = ZoneInfo(fake.timezone)
+    expected = {}
+    for calendar_id in calendar_ids:
+        events = [e for e in fake.calendars.get(calendar_id, {}).values() if e.get("status") != "cancelled"]
+        expected[calendar_id] = [e["id"] for e in calendar_sync.upcoming(events, time_min, tz, max_results)]
+    return expected
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calendars", type=int, default=4)
+    parser.add_argument("--events", type=int, default=300, help="events per calendar")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="simulated latency per HTTP request")
+    args = parser.parse_args()
+
+    fake, server, api_root = start_fake_calendar(args.latency_ms)
+    os.environ["CALENDAR_API_ROOT"] = api_root
+    fill_calendars(fake, args.calendars, args.events)
+    calendar_ids = [f"cal-{c}" for c in range(args.calendars)]
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from backend import calendar_sync
+
+    app = FastAPI()
+    app.include_router(calendar_sync.router)
+    client = TestClient(app)
+    failures = []
+
+    def refresh(label: str, ids, expected_sync):
+        before = dict(fake.requests)
+        start = time.perf_counter()
+        response = client.post(
+            "/calendar/events", json={"calendar_ids": ids}, headers={"Authorization": f"Bearer {TOKEN}"}
+        )
+        seconds = time.perf_counter() - start
+        if response.status_code != 200:
+            failures.append(f"{label}: status {response.status_code}: {response.text}")
+            return seconds
+        body = response.json()
+        time_min = datetime.datetime.fromisoformat(body["time_min"])
+        expected = expected_events(fake, calendar_sync, [i for i in ids if i in fake.calendars], time_min, 50)
+        for calendar_id, ids_expected in expected.items():
+            got = [e["id"] for e in body["events_by_calendar"][calendar_id]]
+            if got != ids_expected:
+                failures.append(f"{label}: {calendar_id} returned {len(got)} events, expected {len(ids_expected)}")
+        for calendar_id, mode in expected_sync.items():
+            if body["sync"].get(calendar_id) != mode:
+                failures.append(f"{label}: {calendar_id} synced {body['sync'].get(calendar_id)!r}, expected {mode!r}")
+        missing = [i for i in ids if i not in fake.calendars]
+        if sorted(body["errors"]) != sorted(missing):
+            failures.append(f"{label}: errors for {sorted(body['errors'])}, expected {missing}")
+        lists = fake.requests.get("events.list", 0) - before.get("events.list", 0)
+        settings = fake.requests.get("settings.get", 0) - before.get("settings.get", 0)
+        print(f"{label:<24} {seconds:6.2f}s  events.list calls: {lists:3d}  settings.get calls: {settings}  "
+              f"sync: {sorted(set(body['sync'].values()))}")
+        return seconds
+
+    # baseline: what dashboard.js did on every refresh
+    service = calendar_sync.calendar_service(TOKEN)
+    start = time.perf_counter()
+    service.settings().get(setting="timezone").execute()
+    for calendar_id in calendar_ids:
+        service.events().list(calendarId=calendar_id, timeMin=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                              singleEvents=True, orderBy="startTime", maxResults=50).execute()
+    baseline_s = time.perf_counter() - start
+    print(f"{'sequential (before)':<24} {baseline_s:6.2f}s")
+
+    full_s = refresh("first refresh", calendar_ids, {i: "full" for i in calendar_ids})
+    if fake.requests.get("settings.get", 0) != 2:  # the baseline's and the endpoint's first
+        failures.append("the first refresh didn't read the timezone setting")
+
+    tz = ZoneInfo(fake.timezone)
+    tomorrow = datetime.datetime.now(tz).replace(hour=14, minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+    fake.add_event(calendar_ids[0], {
+        "summary": "Added after the first refresh",
+        "start": {"dateTime": tomorrow.isoformat()},
+        "end": {"dateTime": (tomorrow + datetime.timedelta(hours=1)).isoformat()},
+    })
+    deleted = next(e["id"] for e in fake.calendars[calendar_ids[-1]].values() if e.get("status") != "cancelled")
+    fake.delete_event(calendar_ids[-1], deleted)
+    incremental_s = refresh("after add + delete", calendar_ids, {i: "incremental" for i in calendar_ids})
+    if fake.requests.get("settings.get", 0) != 2:
+        failures.append("the timezone setting was read again instead of coming from the cache")
+
+    fake.expire_sync_tokens()
+    refresh("after tokens expired", calendar_ids, {i: "full" for i in calendar_ids})
+    refresh("with a missing calendar", calendar_ids + ["no-such-calendar"], {i: "incremental" for i in calendar_ids})
+    server.shutdown()
+
+    print(f"first refresh {baseline_s / full_s:.1f}x, incremental refresh {baseline_s / incremental_s:.1f}x "
+          f"faster than the sequential listing")
+    if failures:
+        print("FAIL:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("OK: every refresh matched the calendars' current events")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Recorded Canvas pastes used by ai_assignment_adder.py and as the golden set
+# for golden_check.py.
+
+assignments = """
+Assignment
+Professional emails 
+Due Sep 8 at 11:59pm Sep 8 at 11:59pm
+-/4 ptsNo submission for this assignment. 4 points possible.
+Assignment
+AI and education 
+Not available until Sep 3 at 12pm Sep 3 at 12pm
+Due Sep 9 at 11:59pm Sep 9 at 11:59pm
+-/4 ptsNo submission for this assignment. 4 points possible.
+Assignment
+AI and relationships 
+Not available until Sep 3 at 12pm Sep 3 at 12pm
+Due Sep 9 at 11:59pm Sep 9 at 11:59pm
+-/4 ptsNo submission for this assignment. 4 points possible.
+Assignment
+AI and employment 
+Not available until Sep 3 at 12pm Sep 3 at 12pm
+Due Sep 9 at 11:59pm Sep 9 at 11:59pm
+-/4 ptsNo submission for this assignment. 4 points possible.
+Assignment
+Architecture diagram (prep) 
+Due Sep 16 at 11:59pm Sep 16 at 11:59pm
+-/4 ptsNo submission for this assignment. 4 points possible.
+Assignment
+Readme 
+Due Sep 16 at 11:59pm Sep 16 at 11:59pm
+-/4 ptsNo submission for this assignment. 4 points possible.
+Assignment
+Requirements (prep) 
+Not available until Sep 15 at 12am Sep 15 at 12am
+Due Sep 23 at 11:59pm Sep 23 at 11:59pm
+-/4 ptsNo submission for this assignment. 4 points possible.
+Assignment
+Reddit comment 
+Not available until Sep 22 at 12am Sep 22 at 12am
+Due Sep 30 at 11:59pm Sep 30 at 11:59pm
+-/4 ptsNo submission for this assignment. 4 points possible.
+Assignment
+Medium post (prep) 
+Not available until Sep 15 at 12am Sep 15 at 12am
+Due Sep 30 at 11:59pm Sep 30 at 11:59pm
+-/4 ptsNo submission for this assignment. 4 points possible.
+Assignment
+Usability & accessibility (prep) 
+Not available until Oct 6 at 12am Oct 6 at 12am
+Due Oct 14 at 11:59pm Oct 14 at 11:59pm
+-/0 ptsNo submission for this assignment. 0 points possible.
+Assignment
+Lightning Presentation 
+Not available until Oct 13 at 12am Oct 13 at 12am
+Due Nov 4 at 11:59pm Nov 4 at 11:59pm
+-/16 ptsNo submission for this assignment. 16 points possible.
+Assignment
+Final Portfolio 
+Due Dec 8 at 11:59pm Dec 8 at 11:59pm
+-/32 pts
+"""
+
+assignments2 = """
+Quiz #1: Syllabus and Basics 
+Not available until Sep 4 at 5pm Sep 4 at 5pm
+Due Sep 8 at 11:59pm Sep 8 at 11:59pm
+-/20 ptsNo submission for this assignment. 20 points possible.
+Assignment
+HW1: Encode and decode messages 
+Available until Sep 15 at 11:59pm Sep 15 at 11:59pm
+Due Sep 11 at 11:59pm Sep 11 at 11:59pm
+-/50 ptsNo submission for this assignment. 50 points possible.
+Assignment
+HW2: Invent two new image filters and build a collage 
+Not available until Sep 9 at 5pm Sep 9 at 5pm
+Due Sep 18 at 11:59pm Sep 18 at 11:59pm
+-/60 ptsNo submission for this assignment. 60 points possible.
+Quiz
+Quiz #2: Images 
+Not available until Sep 16 at 5pm Sep 16 at 5pm
+Due Sep 20 at 11:59pm Sep 20 at 11:59pm
+-/20 ptsNo submission for this assignment. 20 points possible.
+Quiz
+Quiz #3: Copying and Transforming Pictures 
+Not available until Sep 25 at 5pm Sep 25 at 5pm
+Due Sep 28 at 11:59pm Sep 28 at 11:59pm
+-/20 ptsNo submission for this assignment. 20 points possible.
+Assignment
+Project 1: Build an image collage 
+Not available until Sep 16 at 10am Sep 16 at 10am
+Due Oct 7 at 11:59pm Oct 7 at 11:59pm
+-/55 ptsNo submission for this assignment. 55 points possible.
+Quiz
+Quiz #4: Sound Basics 
+Not available until Oct 9 at 5pm Oct 9 at 5pm
+Due Oct 12 at 11:59pm Oct 12 at 11:59pm
+-/20 ptsNo submission for this assignment. 20 points possible.
+Assignment
+HW3: Create two sound filters 
+Not available until Oct 7 at 12am Oct 7 at 12am
+Due Oct 21 at 11:59pm Oct 21 at 11:59pm
+-/50 ptsNo submission for this assignment. 50 points possible.
+Quiz
+Quiz #5: Advanced Sound 
+Not available until Oct 30 at 5pm Oct 30 at 5pm
+Due Nov 2 at 11:59pm Nov 2 at 11:59pm
+-/20 pts
+"""
+
+GOLDEN_FIXTURES = {"assignments": assignments, "assignments2": assignments2}
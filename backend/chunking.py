@@ -0,0 +1,55 @@
+import re
+
+# -----------------------------
+# Chunked (map-reduce) extraction helpers
+# -----------------------------
+# Same boundary mark_tags splits on: the start of every "Assignment"/"Quiz" word
+BLOCK_BOUNDARY_PATTERN = re.compile(r'(?=(?:Assignment|Quiz)\b)')
+
+def split_blocks(text: str):
+    """Split a raw paste on assignment block boundaries (nothing is dropped)."""
+    return [block for block in BLOCK_BOUNDARY_PATTERN.split(text) if block]
+
+def pack_chunks(blocks, count_tokens, token_budget: int, max_blocks: int = None):
+    """
+    Group consecutive blocks into chunks of at most token_budget tokens (as
+    measured by count_tokens) and at most max_blocks blocks. A single block
+    over the budget gets a chunk of its own rather than being cut.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for block in blocks:
+        tokens = count_tokens(block)
+        full = current and (
+            current_tokens + tokens > token_budget
+            or (max_blocks and len(current) >= max_blocks)
+        )
+        if full:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(block)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def item_key(item, key_fields):
+    """Dedup key of an item: its key_fields values, strings trimmed and lowercased."""
+    return tuple(
+        item.get(field).strip().lower() if isinstance(item.get(field), str) else item.get(field)
+        for field in key_fields
+    )
+
+def dedupe_items(items, key_fields):
+    """Drop items whose key_fields values were already seen, keeping the first."""
+    seen = set()
+    unique = []
+    for item in items:
+        key = item_key(item, key_fields)
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(item)
+    return unique
@@ -0,0 +1,103 @@
+import datetime
+import os
+from functools import lru_cache
+
+from dateparser.date import DateDataParser
+
+# -----------------------------
+# Cached date/time normalization
+# -----------------------------
+# The same strings ("Sep 8 at 11:59pm", "2025-09-08", "23:59") come up for every
+# spaCy entity, regex safeguard match and postprocess_json field, within a
+# request and across requests. Results are memoized per (text, anchor day):
+# the anchor is today's date, which fills in missing years and is the base for
+# relative expressions, so cached values roll over with the calendar.
+NORMALIZE_CACHE_SIZE = int(os.getenv("NORMALIZE_CACHE_SIZE", "4096"))
+
+# Common LMS formats, tried with strptime before falling back to dateparser.
+# Formats without a year are parsed with the anchor year prepended.
+DATE_FORMATS = [
+    "%b %d at %I:%M%p",
+    "%b %d at %I:%M %p",
+    "%b %d at %I%p",
+    "%b %d %I:%M%p",
+    "%b %d",
+    "%B %d at %I:%M%p",
+    "%B %d at %I:%M %p",
+    "%B %d",
+]
+FULL_DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M",
+]
+TIME_FORMATS = [
+    "%H:%M",
+    "%I:%M%p",
+    "%I:%M %p",
+    "%I%p",
+]
+
+fast_path_hits = 0
+fallback_parses = 0
+
+@lru_cache(maxsize=1)
+def get_date_parser(anchor: datetime.date):
+    """Pre-built dateparser instance for the given anchor day."""
+    return DateDataParser(
+        languages=["en"],
+        settings={
+            "RELATIVE_BASE": datetime.datetime.combine(anchor, datetime.time()),
+            "PREFER_DATES_FROM": "current_period",
+        },
+    )
+
+def parse_fast(text: str, anchor: datetime.date):
+    """strptime for the common LMS formats; None if none of them match."""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(f"{anchor.year} {text}", f"%Y {fmt}")
+        except ValueError:
+            pass
+    for fmt in FULL_DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    for fmt in TIME_FORMATS:
+        try:
+            t = datetime.datetime.strptime(text, fmt).time()
+            return datetime.datetime.combine(anchor, t)
+        except ValueError:
+            pass
+    return None
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_cached(text: str, anchor: datetime.date):
+    global fast_path_hits, fallback_parses
+    dt = parse_fast(text.strip(), anchor)
+    if dt is not None:
+        fast_path_hits += 1
+    else:
+        fallback_parses += 1
+        dt = get_date_parser(anchor).get_date_data(text).date_obj
+    if not dt:
+        return None, None
+    date_str = dt.strftime("%Y-%m-%d")
+    time_str = dt.strftime("%H:%M") if (dt.hour or dt.minute) else None
+    return date_str, time_str
+
+def normalize_time(text: str):
+    """Normalize raw time expressions into (date, time)."""
+    return normalize_cached(text, datetime.date.today())
+
+def normalize_stats():
+    """Cache hit/miss counters, plus how the misses were parsed."""
+    info = normalize_cached.cache_info()
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "fast_path": fast_path_hits,
+        "dateparser": fallback_parses,
+    }
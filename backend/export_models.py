@@ -0,0 +1,60 @@
+"""
+Writes the models the Gemma backend loads into a local directory, so
+workers start without contacting the Hugging Face hub and can memory-map
+the weights (GEMMA_INFERENCE_MODE=mmap).
+
+    DIR/gemma/                 tokenizer + safetensors weights -> GEMMA_MODEL_DIR
+    DIR/spacy/en_core_web_sm/  nlp.to_disk pipelines          -> SPACY_MODEL_DIR
+    DIR/spacy/en_core_web_trf/
+
+mmap keeps the weights in the dtype they are saved in, so export them in the
+dtype you want to run (fp32 unless the CPU has native bf16 support).
+
+Run from the project root:
+    python -m backend.export_models models
+    python -m backend.export_models models --dtype bf16 --spacy en_core_web_sm
+"""
+import argparse
+import os
+
+import spacy
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from backend.ai_llm_backend import MODEL_NAME, NER_TIER_PACKAGES
+
+DTYPES = {"fp32": torch.float32, "bf16": torch.bfloat16}
+
+def export_gemma(out_dir: str, dtype):
+    AutoTokenizer.from_pretrained(MODEL_NAME).save_pretrained(out_dir)
+    model = AutoModelForCausalLM.from_pretrained(MODEL_NAME, torch_dtype=dtype)
+    model.save_pretrained(out_dir, safe_serialization=True)
+    print(f"Saved {MODEL_NAME} ({dtype}) to {out_dir}")
+
+def export_spacy(out_dir: str, packages):
+    os.makedirs(out_dir, exist_ok=True)
+    for package in packages:
+        try:
+            nlp = spacy.load(package)
+        except OSError as e:
+            print(f"Skipping {package}: {e}")
+            continue
+        nlp.to_disk(os.path.join(out_dir, package))
+        print(f"Saved {package} to {os.path.join(out_dir, package)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir", help="directory to write gemma/ and spacy/ into")
+    parser.add_argument("--dtype", choices=sorted(DTYPES), default="fp32", help="dtype to save the Gemma weights in")
+    parser.add_argument(
+        "--spacy", default=",".join(NER_TIER_PACKAGES.values()),
+        help="spaCy packages to save, comma-separated (empty for none)",
+    )
+    args = parser.parse_args()
+
+    export_gemma(os.path.join(args.out_dir, "gemma"), DTYPES[args.dtype])
+    export_spacy(os.path.join(args.out_dir, "spacy"), [p.strip() for p in args.spacy.split(",") if p.strip()])
+    print(f"Set GEMMA_MODEL_DIR={os.path.join(args.out_dir, 'gemma')} SPACY_MODEL_DIR={os.path.join(args.out_dir, 'spacy')}")
+
+if __name__ == "__main__":
+    main()
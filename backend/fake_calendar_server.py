@@ -0,0 +1,202 @@
+"""
+Local stand-in for the parts of the Google Calendar API the backends use,
+for calendar_batch_check.py and calendar_sync_check.py (no network, no
+Google account). Point the backends at it with CALENDAR_API_ROOT.
+
+Supports events.insert (single and in multipart/mixed batch requests),
+events.list with paging and incremental sync (syncToken / nextSyncToken,
+410 for expired tokens) and settings.get. Inserted events whose summary
+contains "[flaky]" fail their first attempt with 503, "[ratelimit]" with
+403 rateLimitExceeded, and "[bad]" always fail with 400. A batch holding
+the first attempt of a "[lost]" event is carried out, but the connection is
+dropped before the response is sent. Inserting an event id that already
+exists gives a 409 duplicate, as the Calendar API does.
+"""
+import email.parser
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+def error_body(code: int, reason: str, message: str):
+    return {"error": {"code": code, "message": message, "errors": [{"reason": reason, "message": message}]}}
+
+def event_end(event) -> str:
+    end = event.get("end", {})
+    return end.get("dateTime") or end.get("date") or ""
+
+class FakeCalendar:
+    def __init__(self, latency_ms: float = 0.0, timezone: str = "America/New_York"):
+        self.latency_s = latency_ms / 1000
+        self.timezone = timezone
+        self.lock = threading.Lock()
+        self.calendars = {}  # calendar id -> {event id: event}
+        self.changes = {}  # calendar id -> [(sequence, event id)]
+        self.sequence = 0
+        self.expired_before = 0  # sync tokens older than this get a 410
+        self.attempts = {}  # summary -> inserts tried
+        self.batch_sizes = []
+        self.requests = {}  # request kind -> count
+
+    def count(self, kind: str):
+        with self.lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    # --- state changes (also used directly by the checks) ---
+    def add_event(self, calendar_id: str, event: dict) -> dict:
+        with self.lock:
+            self.sequence += 1
+            event = dict(event, id=event.get("id") or uuid.uuid4().hex,
+                         htmlLink=f"https://calendar.local/{calendar_id}", status="confirmed")
+            self.calendars.setdefault(calendar_id, {})[event["id"]] = event
+            self.changes.setdefault(calendar_id, []).append((self.sequence, event["id"]))
+            return event
+
+    def delete_event(self, calendar_id: str, event_id: str):
+        with self.lock:
+            self.sequence += 1
+            self.calendars[calendar_id][event_id] = {"id": event_id, "status": "cancelled"}
+            self.changes[calendar_id].append((self.sequence, event_id))
+
+    def expire_sync_tokens(self):
+        with self.lock:
+            self.sequence += 1
+            self.expired_before = self.sequence
+
+    def insert(self, calendar_id: str, event: dict):
+        """(status, response body) for one events.insert."""
+        summary = event.get("summary", "")
+        with self.lock:
+            attempt = self.attempts[summary] = self.attempts.get(summary, 0) + 1
+            exists = event.get("id") in self.calendars.get(calendar_id, {})
+        if exists:
+            return 409, error_body(409, "duplicate", "The requested identifier already exists.")
+        if "[bad]" in summary:
+            return 400, error_body(400, "invalid", "Missing end time.")
+        if "[flaky]" in summary and attempt == 1:
+            return 503, error_body(503, "backendError", "Backend Error")
+        if "[ratelimit]" in summary and attempt == 1:
+            return 403, error_body(403, "rateLimitExceeded", "Rate Limit Exceeded")
+        return 200, self.add_event(calendar_id, event)
+
+    def list_events(self, calendar_id: str, params: dict):
+        """(status, response body) for one events.list page."""
+        page_size = int(params.get("maxResults", 250))
+        offset = int(params.get("pageToken", 0))
+        with self.lock:
+            events = self.calendars.get(calendar_id)
+            if events is None:
+                return 404, error_body(404, "notFound", "Not Found")
+            if "syncToken" in params:
+                token_calendar, _, since = params["syncToken"].rpartition(":")
+                since = int(since)
+                if token_calendar != calendar_id or since < self.expired_before:
+                    return 410, error_body(410, "fullSyncRequired", "Sync token is no longer valid, a full sync is required.")
+                changed = sorted({event_id for seq, event_id in self.changes[calendar_id] if seq > since})
+                items = [events[event_id] for event_id in changed]
+            else:
+                time_min = params.get("timeMin", "")
+                items = [e for e in events.values() if e.get("status") != "cancelled" and event_end(e) >= time_min]
+                items.sort(key=lambda e: e["id"])
+            body = {"kind": "calendar#events", "items": items[offset:offset + page_size]}
+            if offset + page_size < len(items):
+                body["nextPageToken"] = str(offset + page_size)
+            else:
+                body["nextSyncToken"] = f"{calendar_id}:{self.sequence}"
+        return 200, body
+
+def make_handler(fake: FakeCalendar):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status: int, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def authorized(self) -> bool:
+            time.sleep(fake.latency_s)
+            if self.headers.get("Authorization", "").startswith("Bearer "):
+                return True
+            self.send_json(401, error_body(401, "authError", "Invalid Credentials"))
+            return False
+
+        def do_GET(self):
+            if not self.authorized():
+                return
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path.endswith("/users/me/settings/timezone"):
+                fake.count("settings.get")
+                self.send_json(200, {"kind": "calendar#setting", "id": "timezone", "value": fake.timezone})
+            elif "/calendars/" in url.path and url.path.endswith("/events"):
+                fake.count("events.list")
+                self.send_json(*fake.list_events(calendar_id_from_path(url.path), params))
+            else:
+                self.send_json(404, error_body(404, "notFound", "Not Found"))
+
+        def do_POST(self):
+            if not self.authorized():
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.startswith("/batch/calendar/v3"):
+                fake.count("batch")
+                self.do_batch(body)
+            elif "/events" in self.path:
+                fake.count("events.insert")
+                self.send_json(*fake.insert(calendar_id_from_path(self.path), json.loads(body)))
+            else:
+                self.send_json(404, error_body(404, "notFound", "Not Found"))
+
+        def do_batch(self, body: bytes):
+            header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+            parts = email.parser.BytesParser().parsebytes(header + body).get_payload()
+            with fake.lock:
+                fake.batch_sizes.append(len(parts))
+            boundary = uuid.uuid4().hex
+            out = []
+            lost = False
+            for part in parts:
+                path, event = parse_http_request(part.get_payload(decode=True))
+                status, response = fake.insert(calendar_id_from_path(path), event)
+                lost = lost or ("[lost]" in event.get("summary", "") and fake.attempts[event["summary"]] == 1)
+                content_id = part["Content-ID"].strip("<>")
+                out.append(
+                    f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(response)}\r\n"
+                )
+            if lost:
+                self.close_connection = True
+                return
+            data = ("".join(out) + f"--{boundary}--\r\n").encode()
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/mixed; boundary={boundary}")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+def parse_http_request(raw: bytes):
+    """(path, json body) of one application/http batch part."""
+    head, _, body = raw.replace(b"\r\n", b"\n").partition(b"\n\n")
+    _, path, _ = head.split(b"\n", 1)[0].decode().split(" ", 2)
+    return path, json.loads(body) if body.strip() else None
+
+def calendar_id_from_path(path: str) -> str:
+    # /calendar/v3/calendars/<id>/events?alt=json
+    return unquote(path.split("/calendars/", 1)[1].split("/", 1)[0])
+
+def start_fake_calendar(latency_ms: float = 0.0):
+    """(fake, server, API root URL) with the server running on a daemon thread."""
+    fake = FakeCalendar(latency_ms)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(fake))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return fake, server, f"http://127.0.0.1:{server.server_port}/"
@@ -1,28 +1,56 @@
 import os
 import json
+import asyncio
 import datetime
-from typing import List, Optional
+import logging
+from typing import List
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from pydantic_core import to_json
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 import google.generativeai as genai
 
-# --- Pydantic Models ---
+try:
+    from backend.response_cache import ResponseCache, make_cache_key
+    from backend.chunking import split_blocks, pack_chunks, dedupe_items, item_key
+    from backend.json_stream import JSONArrayStreamParser
+    from backend.metrics import metrics, RequestTimings, REQUEST_SECONDS, TOKENS, CACHE_LOOKUPS
+    from backend.calendar_batch import router as calendar_router
+    from backend.calendar_sync import router as calendar_sync_router
+    from backend.schema import GEMINI_WIRE, json_response, assignments_schema, batch_schema, json_body
+except ImportError:  # running from inside backend/
+    from response_cache import ResponseCache, make_cache_key
+    from chunking import split_blocks, pack_chunks, dedupe_items, item_key
+    from json_stream import JSONArrayStreamParser
+    from metrics import metrics, RequestTimings, REQUEST_SECONDS, TOKENS, CACHE_LOOKUPS
+    from calendar_batch import router as calendar_router
+    from calendar_sync import router as calendar_sync_router
+    from schema import GEMINI_WIRE, json_response, assignments_schema, batch_schema, json_body
 
-class AssignmentItem(BaseModel):
-    name: str
-    due_date: Optional[str] = None
-    due_time: Optional[str] = None
+# LOG_LEVEL=DEBUG logs every raw Gemini response
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+logger = logging.getLogger(__name__)
 
-class Assignments(BaseModel):
-    assignments: List[AssignmentItem]
+# --- Pydantic Models ---
 
 class ExtractRequest(BaseModel):
     text: str
 
+class BatchDocument(BaseModel):
+    id: str
+    text: str
+
+class BatchExtractRequest(BaseModel):
+    documents: List[BatchDocument]
+
+# Responses are built from the shared item schema (schema.py) and returned as
+# JSON bytes; this describes them in the OpenAPI docs.
+ASSIGNMENTS_SCHEMA = assignments_schema(GEMINI_WIRE)
+
 # --- FastAPI App Setup ---
 
 app = FastAPI(title="Gemini Assignment Extractor API")
@@ -39,6 +67,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# POST /calendar/insert-events (bulk Google Calendar insert, see calendar_batch.py)
+app.include_router(calendar_router)
+# POST /calendar/events (merged, incremental event listing, see calendar_sync.py)
+app.include_router(calendar_sync_router)
 
 # --- Gemini API Configuration ---
 
@@ -50,16 +82,32 @@ if not api_key:
 genai.configure(api_key=api_key)
 
 MODEL_NAME="gemini-2.5-flash-lite"
-@app.post("/extract-assignments", response_model=Assignments)
-def extract_assignments(req: ExtractRequest):
-    """
-    Receives text, extracts assignment details using Gemini, 
-    and returns them as a structured JSON object.
-    """
-    model = genai.GenerativeModel(MODEL_NAME)
 
+# One model instance for the whole process; its client (and connection) is
+# reused by every request instead of being rebuilt per call.
+gemini_model = genai.GenerativeModel(MODEL_NAME)
+
+# Caps in-flight Gemini calls and bounds how long each one may take.
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+GEMINI_TIMEOUT_S = float(os.getenv("GEMINI_TIMEOUT_S", "30"))
+gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+# Identical pastes are answered without calling Gemini. The key includes the
+# year because the prompt tells the model to assume the current year.
+response_cache = ResponseCache.from_env()
+
+# Large pastes are split on assignment block boundaries into chunks of roughly
+# GEMINI_CHUNK_TOKEN_BUDGET tokens (estimated at 4 characters per token) that
+# are extracted concurrently and merged.
+GEMINI_CHUNK_TOKEN_BUDGET = int(os.getenv("GEMINI_CHUNK_TOKEN_BUDGET", "2000"))
+GEMINI_CHUNK_MAX_BLOCKS = int(os.getenv("GEMINI_CHUNK_MAX_BLOCKS", "40"))
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+def build_prompt(text: str) -> str:
     # The prompt is updated with specific rules and examples (few-shot learning).
-    prompt = f"""
+    return f"""
         You are an intelligent assistant that extracts assignment information from text.
         Your task is to identify all assignments, quizzes, or deadlines and return them as a valid JSON array of objects.
 
@@ -102,28 +150,53 @@ def extract_assignments(req: ExtractRequest):
 
         **Real Input Text:**
         ---
-        {req.text}
+        {text}
         ---
     """
-    
-    print("Sending text to Gemini for extraction...")
-    assignments_list = []
-    try:
-        response = model.generate_content(prompt)
-        
-        # It's good practice to print the raw response for debugging
-        print("--- Raw Gemini Response ---")
-        print(response.text)
-        print("---------------------------")
-        
+
+async def request_assignments(prompt: str, timings: RequestTimings = None):
+    """Send the prompt to Gemini and parse the JSON array it returns (raises on failure)."""
+    timings = timings or RequestTimings()
+    logger.debug("Sending text to Gemini for extraction...")
+    with timings.stage("generate"):
+        async with gemini_semaphore:
+            response = await asyncio.wait_for(
+                gemini_model.generate_content_async(prompt, request_options={"timeout": GEMINI_TIMEOUT_S}),
+                timeout=GEMINI_TIMEOUT_S,
+            )
+
+    logger.debug("--- Raw Gemini Response ---\n%s\n---------------------------", response.text)
+    record_token_usage(response)
+
+    with timings.stage("parse"):
         cleaned_response = response.text.strip().replace("```json", "").replace("```", "").strip()
         assignments_list = json.loads(cleaned_response)
-        print(f"Successfully extracted {len(assignments_list)} assignment(s).")
+    logger.debug("Successfully extracted %d assignment(s).", len(assignments_list))
+    return assignments_list
 
+async def generate_assignments(prompt: str, timings: RequestTimings = None):
+    """request_assignments, but failures are logged and give an empty list."""
+    try:
+        return await request_assignments(prompt, timings)
+    except asyncio.TimeoutError:
+        print(f"Gemini call timed out after {GEMINI_TIMEOUT_S}s")
     except (json.JSONDecodeError, Exception) as e:
         print(f"Error processing Gemini response: {e}")
-        assignments_list = []
+    return []
+
+def record_token_usage(response):
+    """Observe Gemini's reported prompt/output token counts, when it sends them."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    if prompt_tokens:
+        TOKENS.observe(prompt_tokens, kind="prompt")
+    if output_tokens:
+        TOKENS.observe(output_tokens, kind="generated")
 
+def add_all_day_copies(assignments_list):
     # This is the logic to duplicate events if a time is specified
     processed_assignments = []
     for assignment in assignments_list:
@@ -139,7 +212,183 @@ def extract_assignments(req: ExtractRequest):
         else:
             processed_assignments.append(assignment)
             
-    print(f"Returning {len(processed_assignments)} processed assignment(s).")
-    return {"assignments": processed_assignments}
+    return processed_assignments
+
+@app.get("/cache-stats")
+def cache_stats():
+    return {"responses": response_cache.stats()}
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint: stage/request latency, token and cache metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def finish_timings(response: Response, timings: RequestTimings, endpoint: str, cache: str):
+    response.headers["Server-Timing"] = timings.server_timing()
+    REQUEST_SECONDS.observe(timings.total(), endpoint=endpoint, cache=cache)
+
+@app.post("/extract-assignments", responses=json_body(ASSIGNMENTS_SCHEMA))
+async def extract_assignments(req: ExtractRequest):
+    """
+    Receives text, extracts assignment details using Gemini, 
+    and returns them as a structured JSON object.
+    """
+    timings = RequestTimings()
+    with timings.stage("cache"):
+        cache_key = make_cache_key(req.text, MODEL_NAME)
+        cached = response_cache.get(cache_key)
+    if cached is not None:
+        CACHE_LOOKUPS.inc(result="hit")
+        response = json_response(cached)
+        response.headers["X-Cache"] = "HIT"
+        finish_timings(response, timings, "extract", "hit")
+        return response
+    CACHE_LOOKUPS.inc(result="miss")
+    with timings.stage("prompt_build"):
+        chunks = pack_chunks(split_blocks(req.text), estimate_tokens, GEMINI_CHUNK_TOKEN_BUDGET, GEMINI_CHUNK_MAX_BLOCKS)
+        prompts = [build_prompt("".join(chunk)) for chunk in chunks]
+    logger.debug("Extracting %d chunk(s)", len(chunks))
+    # generate/parse are summed over the chunks, which run concurrently
+    chunk_results = await asyncio.gather(
+        *(generate_assignments(prompt, timings) for prompt in prompts)
+    )
+    with timings.stage("dedupe"):
+        assignments_list = dedupe_items(
+            GEMINI_WIRE.clean([item for items in chunk_results for item in items]), ("name", "due_date", "due_time")
+        )
+    with timings.stage("expand"):
+        processed_assignments = add_all_day_copies(assignments_list)
+    logger.debug("Returning %d processed assignment(s).", len(processed_assignments))
+    result = {"assignments": processed_assignments}
+    # empty results may come from a failed call, don't pin them in the cache
+    if processed_assignments:
+        response_cache.set(cache_key, result)
+    response = json_response(result)
+    response.headers["X-Cache"] = "MISS"
+    finish_timings(response, timings, "extract", "miss")
+    return response
+
+# Documents per /extract-assignments/batch request
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "32"))
+
+async def extract_document(text: str, timings: RequestTimings):
+    """Chunks of one batch document extracted concurrently; raises if any chunk fails."""
+    chunks = pack_chunks(split_blocks(text), estimate_tokens, GEMINI_CHUNK_TOKEN_BUDGET, GEMINI_CHUNK_MAX_BLOCKS)
+    chunk_results = await asyncio.gather(
+        *(request_assignments(build_prompt("".join(chunk)), timings) for chunk in chunks)
+    )
+    assignments_list = dedupe_items(
+        GEMINI_WIRE.clean([item for items in chunk_results for item in items]), ("name", "due_date", "due_time")
+    )
+    return add_all_day_copies(assignments_list)
+
+@app.post("/extract-assignments/batch", responses=json_body(batch_schema(ASSIGNMENTS_SCHEMA)))
+async def extract_assignments_batch(req: BatchExtractRequest):
+    """
+    Extract several documents (e.g. one paste per course) in one request.
+    Every chunk of every uncached document is sent to Gemini concurrently
+    (bounded by GEMINI_MAX_CONCURRENCY). Results are keyed by document id,
+    and a failing document only sets its own error.
+    """
+    ids = [doc.id for doc in req.documents]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=422, detail="Document ids must be unique")
+    if len(ids) > BATCH_MAX_DOCUMENTS:
+        raise HTTPException(status_code=422, detail=f"At most {BATCH_MAX_DOCUMENTS} documents per batch")
+    timings = RequestTimings()
+    results = {}
+    pending = []
+    with timings.stage("cache"):
+        for doc in req.documents:
+            cache_key = make_cache_key(doc.text, MODEL_NAME)
+            cached = response_cache.get(cache_key)
+            CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss")
+            if cached is not None:
+                results[doc.id] = {**cached, "cached": True}
+            else:
+                pending.append((doc, cache_key))
+    extracted = await asyncio.gather(
+        *(extract_document(doc.text, timings) for doc, _ in pending), return_exceptions=True
+    )
+    for (doc, cache_key), assignments_list in zip(pending, extracted):
+        if isinstance(assignments_list, Exception):
+            if isinstance(assignments_list, asyncio.TimeoutError):
+                error = "Gemini call timed out"
+            else:
+                error = f"{type(assignments_list).__name__}: {assignments_list}"
+            print(f"Batch document {doc.id!r} failed: {error}")
+            results[doc.id] = {"assignments": [], "error": error}
+            continue
+        result = {"assignments": assignments_list}
+        if assignments_list:
+            response_cache.set(cache_key, result)
+        results[doc.id] = result
+    # keep the request's document order
+    response = json_response({"results": {doc_id: {"cached": False, "error": None, **results[doc_id]} for doc_id in ids}})
+    finish_timings(response, timings, "batch", "hit" if not pending else "miss")
+    return response
+
+async def stream_chunk(prompt: str, out: asyncio.Queue):
+    """Stream one Gemini call and put each completed item on out, then None."""
+    parser = JSONArrayStreamParser()
+    try:
+        async with gemini_semaphore:
+            async with asyncio.timeout(GEMINI_TIMEOUT_S):
+                response = await gemini_model.generate_content_async(
+                    prompt, stream=True, request_options={"timeout": GEMINI_TIMEOUT_S}
+                )
+                async for chunk in response:
+                    for item in parser.feed(chunk.text):
+                        await out.put(item)
+    except Exception as e:
+        print(f"Error streaming Gemini response: {e}")
+    finally:
+        await out.put(None)
+
+async def stream_extracted(text: str):
+    """NDJSON lines for /extract-assignments/stream, one per item as it completes."""
+    cache_key = make_cache_key(text, MODEL_NAME)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        CACHE_LOOKUPS.inc(result="hit")
+        for item in cached["assignments"]:
+            yield to_json(item) + b"\n"
+        return
+    CACHE_LOOKUPS.inc(result="miss")
+    chunks = pack_chunks(split_blocks(text), estimate_tokens, GEMINI_CHUNK_TOKEN_BUDGET, GEMINI_CHUNK_MAX_BLOCKS)
+    out = asyncio.Queue()
+    tasks = [asyncio.create_task(stream_chunk(build_prompt("".join(chunk)), out)) for chunk in chunks]
+    key_fields = ("name", "due_date", "due_time")
+    seen = set()
+    assignments_list = []
+    try:
+        remaining = len(tasks)
+        while remaining:
+            item = await out.get()
+            if item is None:
+                remaining -= 1
+                continue
+            cleaned = GEMINI_WIRE.clean([item])
+            if not cleaned:
+                continue
+            item = cleaned[0]
+            key = item_key(item, key_fields)
+            if key in seen:
+                continue
+            seen.add(key)
+            assignments_list.append(item)
+            for processed in add_all_day_copies([item]):
+                yield to_json(processed) + b"\n"
+    finally:
+        # client went away or we're done: stop any call still running
+        for task in tasks:
+            task.cancel()
+    if assignments_list:
+        response_cache.set(cache_key, {"assignments": add_all_day_copies(assignments_list)})
+
+@app.post("/extract-assignments/stream")
+async def extract_assignments_stream(req: ExtractRequest):
+    """Streaming variant of /extract-assignments: one JSON item per line."""
+    return StreamingResponse(stream_extracted(req.text), media_type="application/x-ndjson")
 
 # To run the server: uvicorn gemini_api_backend:app --reload
\ No newline at end of file
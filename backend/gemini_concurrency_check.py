@@ -0,0 +1,129 @@
+"""
+Check of the Gemini backend's concurrency limit and call timeout, without
+network or an API key.
+
+gemini_model.generate_content_async is replaced by a stub that counts the
+calls in flight and answers after --latency-ms; prompts tagged "[slow]" never
+answer in time. The check fires --requests concurrent POST /extract-assignments
+requests plus one batch request with a slow document, and exits non-zero
+unless no more than GEMINI_MAX_CONCURRENCY calls were ever in flight (and the
+limit was reached), every slow call was cancelled by the GEMINI_TIMEOUT_S
+timeout and answered with an empty list (or the batch document's error), and
+every other request got its assignment.
+
+Run from the project root:
+    python -m backend.gemini_concurrency_check
+    python -m backend.gemini_concurrency_check --requests 200 --limit 4 --timeout-s 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None
+
+class StubGeminiModel:
+    """Stands in for genai.GenerativeModel: tracks concurrent calls and cancellations."""
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            name = prompt.split("Check assignment ", 1)[1].split()[0]
+            await asyncio.sleep(3600 if "[slow]" in prompt else self.latency_s)
+            return StubResponse(json.dumps([{"name": f"Assignment {name}", "due_date": "2025-10-01", "due_time": None}]))
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+def paste(i: int, slow: bool) -> str:
+    return f"Assignment\nCheck assignment {i} {'[slow]' if slow else ''}\nDue Oct 1 at 11:59pm"
+
+async def fire(app, requests: int, slow_every: int):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=None) as client:
+        singles = [
+            client.post("/extract-assignments", json={"text": paste(i, i % slow_every == 0)})
+            for i in range(requests)
+        ]
+        batch = client.post("/extract-assignments/batch", json={"documents": [
+            {"id": "fast", "text": paste(requests, False)},
+            {"id": "slow", "text": paste(requests + 1, True)},
+        ]})
+        return await asyncio.gather(*singles, batch)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="concurrent /extract-assignments requests")
+    parser.add_argument("--limit", type=int, default=8, help="GEMINI_MAX_CONCURRENCY")
+    parser.add_argument("--timeout-s", type=float, default=0.5, help="GEMINI_TIMEOUT_S")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stub latency of a call that answers")
+    parser.add_argument("--slow-every", type=int, default=10, help="every Nth request never answers in time")
+    args = parser.parse_args()
+
+    os.environ["GEMINI_MAX_CONCURRENCY"] = str(args.limit)
+    os.environ["GEMINI_TIMEOUT_S"] = str(args.timeout_s)
+    os.environ.setdefault("GEMINI_KEY", "check-key")  # the stub never calls Google
+    os.environ.setdefault("RESPONSE_CACHE_SIZE", "0")
+
+    from backend import gemini_api_backend as gemini
+
+    stub = StubGeminiModel(args.latency_ms / 1000)
+    gemini.gemini_model = stub
+    start = time.perf_counter()
+    *singles, batch = asyncio.run(fire(gemini.app, args.requests, args.slow_every))
+    elapsed = time.perf_counter() - start
+
+    failures = []
+    slow = [i for i in range(args.requests) if i % args.slow_every == 0]
+    for i, response in enumerate(singles):
+        if response.status_code != 200:
+            failures.append(f"request {i}: status {response.status_code}")
+            continue
+        names = [item["name"] for item in response.json()["assignments"]]
+        expected = [] if i in slow else [f"Assignment {i}"]
+        if names != expected:
+            failures.append(f"request {i}: assignments {names}, expected {expected}")
+    results = batch.json().get("results", {}) if batch.status_code == 200 else {}
+    if results.get("slow", {}).get("error") != "Gemini call timed out":
+        failures.append(f"batch slow document: {results.get('slow')}")
+    if results.get("fast", {}).get("error") is not None or not results.get("fast", {}).get("assignments"):
+        failures.append(f"batch fast document: {results.get('fast')}")
+    if stub.max_in_flight > args.limit:
+        failures.append(f"{stub.max_in_flight} calls in flight, limit {args.limit}")
+    if stub.max_in_flight < min(args.limit, args.requests):
+        failures.append(f"only {stub.max_in_flight} calls in flight, the limit {args.limit} was never reached")
+    if stub.cancelled != len(slow) + 1:
+        failures.append(f"{stub.cancelled} calls cancelled by the timeout, expected {len(slow) + 1}")
+    if stub.in_flight:
+        failures.append(f"{stub.in_flight} calls still in flight")
+
+    # every slow call holds its slot for the whole timeout
+    floor_s = (len(slow) + 1) * args.timeout_s / args.limit
+    print(f"{args.requests + 1} requests, {stub.calls} Gemini calls: at most {stub.max_in_flight} in flight "
+          f"(limit {args.limit}), {stub.cancelled} timed out after {args.timeout_s}s")
+    print(f"elapsed {elapsed:.2f}s (at least {floor_s:.2f}s for the timed-out calls)")
+    if failures:
+        for failure in failures[:20]:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print(f"OK: concurrency capped at {args.limit} and every slow call timed out")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# -----------------------------
+# Batched generation scheduler
+# -----------------------------
+class GenerationScheduler:
+    """
+    Collects prompts submitted from concurrent requests and runs them through
+    generate_batch together. A batch is closed as soon as it holds
+    max_batch_size prompts or max_wait_ms have passed since its first prompt
+    arrived. generate_batch takes a list of prompts and must return one result
+    per prompt, in order; each result is handed back on the Future returned by
+    submit().
+    """
+    def __init__(self, generate_batch, max_batch_size: int = 8, max_wait_ms: float = 10):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches_run = 0
+        self.prompts_run = 0
+
+    def submit(self, prompt) -> Future:
+        future = Future()
+        self._ensure_started()
+        self._queue.put((prompt, future))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="generation-scheduler", daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self):
+        # block for the first prompt, then fill the batch until it is full or the window closes
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # skip requests whose caller already gave up
+            batch = [(prompt, future) for prompt, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.generate_batch([prompt for prompt, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches_run += 1
+            self.prompts_run += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,116 @@
+"""
+Accuracy gate for GEMMA_INFERENCE_MODE.
+
+Runs the golden Canvas pastes (canvas_fixtures.py) through the Gemma
+extraction twice, once with the fp32 baseline and once with the given mode,
+and exits non-zero unless the generated text is identical for every prompt.
+
+Each mode runs in its own process with GEMMA_INFERENCE_MODE set, so it gets
+the same model, prompt prefix cache and prompt-lookup settings the server
+would, and generates through the server's generate_batch: every chunk on its
+own (prefix cache and prompt lookup, as for a lone request) and every
+multi-chunk paste in one batch (as the scheduler runs it).
+
+Run from the project root:
+    python -m backend.golden_check --mode int8
+    python -m backend.golden_check --mode bf16,compile
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+from backend import ai_llm_backend as backend
+from backend.canvas_fixtures import GOLDEN_FIXTURES
+
+def golden_chunks():
+    """Prompt ids of every chunk, per fixture, with every block sent to the model."""
+    backend.RULE_EXTRACTOR = False
+    backend.BLOCK_CACHE = False
+    chunks = {}
+    for name, text in GOLDEN_FIXTURES.items():
+        # loading the NER models prints; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, chunks[name], _, _ = backend.prepare_request(text)
+    return chunks
+
+def golden_prompts():
+    """Prompt ids per fixture chunk, with every block sent to the model."""
+    return {
+        f"{name}[{i}]": prompt_ids
+        for name, chunk_prompts in golden_chunks().items()
+        for i, prompt_ids in enumerate(chunk_prompts)
+    }
+
+def timed_generate(prompts):
+    start = time.perf_counter()
+    generations = backend.generate_batch(prompts)
+    return [text for text, _ in generations], time.perf_counter() - start
+
+def generate_all(chunks):
+    """{prompt name: (generated text, seconds)} through generate_batch, alone and batched."""
+    results = {}
+    for name, chunk_prompts in chunks.items():
+        for i, prompt_ids in enumerate(chunk_prompts):
+            (text,), seconds = timed_generate([prompt_ids])
+            results[f"{name}[{i}]"] = (text, seconds)
+        if len(chunk_prompts) > 1:
+            texts, seconds = timed_generate(chunk_prompts)
+            for i, text in enumerate(texts):
+                results[f"{name}[{i}] batched"] = (text, seconds / len(texts))
+    return results
+
+def child():
+    # stdout carries the result line; the backend's own prints go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        chunks = golden_chunks()
+        if "compile" in backend.GEMMA_INFERENCE_MODE:
+            generate_all(chunks)  # first pass pays for compilation
+        results = generate_all(chunks)
+    print(json.dumps(results), flush=True)
+
+def run_mode(mode: str):
+    """generate_all() in a fresh process running GEMMA_INFERENCE_MODE=mode."""
+    proc = subprocess.run(
+        [sys.executable, "-m", "backend.golden_check", "--mode", mode, "--child"],
+        env=dict(os.environ, GEMMA_INFERENCE_MODE=mode), stdout=subprocess.PIPE, text=True,
+    )
+    if proc.returncode != 0:
+        print(f"FAIL: the {mode} run exited with {proc.returncode}")
+        sys.exit(1)
+    return {name: tuple(result) for name, result in json.loads(proc.stdout.splitlines()[-1]).items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", required=True, help="inference mode(s) to check, e.g. int8 or bf16,compile")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    baseline = run_mode("fp32")
+    candidate = run_mode(args.mode)
+
+    mismatches = 0
+    print(f"{'prompt':<26} {'fp32 s':>8} {args.mode + ' s':>12} {'speedup':>8}  identical")
+    for name in baseline:
+        base_text, base_s = baseline[name]
+        cand_text, cand_s = candidate[name]
+        identical = base_text == cand_text
+        mismatches += not identical
+        print(f"{name:<26} {base_s:8.2f} {cand_s:12.2f} {base_s / cand_s:7.2f}x  {identical}")
+        if not identical:
+            print(f"  fp32:      {base_text!r}")
+            print(f"  {args.mode}: {cand_text!r}")
+    if mismatches:
+        print(f"FAIL: {mismatches} of {len(baseline)} outputs differ from fp32")
+        sys.exit(1)
+    print(f"OK: all {len(baseline)} outputs match fp32")
+
+if __name__ == "__main__":
+    main()
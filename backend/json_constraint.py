@@ -0,0 +1,164 @@
+import torch
+from transformers import LogitsProcessor
+
+# -----------------------------
+# Grammar-constrained decoding of the Assignments JSON array
+# -----------------------------
+# The output is forced into one compact shape:
+#   [{"assignment": "...", "due_date": "..." | null, "time": "..." | null}, ...]
+# and only EOS is allowed once the top-level array has closed, so generation
+# stops right there instead of running on to max_new_tokens.
+#
+# Each node is either a literal with alternatives {text: next node}, a string
+# body (any characters except quotes, backslashes and control characters) that
+# is closed by the quote starting the next node, or the end.
+GRAMMAR = {
+    "start": {'[{"assignment": "': "name", "[]": "end"},
+    "name": ("string", "after_name"),
+    "after_name": {'", "due_date": ': "date_value"},
+    "date_value": {"null": "after_date", '"': "date"},
+    "date": ("string", "date_close"),
+    "date_close": {'"': "after_date"},
+    "after_date": {', "time": ': "time_value"},
+    "time_value": {"null": "after_time", '"': "time"},
+    "time": ("string", "time_close"),
+    "time_close": {'"': "after_time"},
+    "after_time": {"}": "next_item"},
+    "next_item": {', {"assignment": "': "name", "]": "end"},
+    "end": "end",
+}
+START = ("start", "")
+END = ("end", "")
+
+def is_string_char(ch: str) -> bool:
+    return ch not in '"\\' and ch >= " " and ch != "�"
+
+def advance(state, text: str):
+    """State after consuming text from state, or None if text breaks the grammar."""
+    for ch in text:
+        if state is None:
+            return None
+        node, prefix = state
+        rule = GRAMMAR[node]
+        if rule == "end":
+            return None
+        if isinstance(rule, tuple):
+            if ch == '"':
+                # the closing quote is the first character of the next literal
+                state = advance((rule[1], ""), ch)
+            elif not is_string_char(ch):
+                return None
+            continue
+        prefix += ch
+        state = None
+        for literal, next_node in rule.items():
+            if literal == prefix:
+                state = (next_node, "")
+                break
+            if literal.startswith(prefix):
+                state = (node, prefix)
+    return state
+
+class AssignmentsJSONGrammar:
+    """
+    Vocabulary tables for one tokenizer. Building it decodes every token once,
+    so keep a single instance around and create a fresh processor per
+    generate call with logits_processor().
+    """
+    def __init__(self, tokenizer):
+        self.eos_token_id = tokenizer.eos_token_id
+        self.vocab_size = len(tokenizer)
+        # decode each token after an anchor so leading spaces survive
+        anchor = tokenizer("a", add_special_tokens=False)["input_ids"][-1]
+        anchor_text = tokenizer.decode([anchor])
+        decoded = tokenizer.batch_decode([[anchor, i] for i in range(self.vocab_size)])
+        special = set(tokenizer.all_special_ids) | set(getattr(tokenizer, "added_tokens_decoder", {}))
+        self.token_text = {}
+        self.by_first_char = {}
+        self.quoted_tokens = []
+        string_mask = torch.zeros(self.vocab_size, dtype=torch.bool)
+        for i, full in enumerate(decoded):
+            if i in special or not full.startswith(anchor_text):
+                continue
+            text = full[len(anchor_text):]
+            if not text:
+                continue
+            self.token_text[i] = text
+            self.by_first_char.setdefault(text[0], []).append(i)
+            if all(is_string_char(ch) for ch in text):
+                string_mask[i] = True
+            elif '"' in text:
+                self.quoted_tokens.append(i)
+        self.string_mask = string_mask
+        self._masks = {}
+
+    def allowed_mask(self, state):
+        """Boolean mask over the vocabulary of tokens allowed in state (cached)."""
+        mask = self._masks.get(state)
+        if mask is not None:
+            return mask
+        mask = torch.zeros(self.vocab_size, dtype=torch.bool)
+        if state is None or state == END:
+            mask[self.eos_token_id] = True
+        else:
+            node, prefix = state
+            rule = GRAMMAR[node]
+            if isinstance(rule, tuple):
+                mask |= self.string_mask
+                candidates = self.quoted_tokens
+            else:
+                first_chars = {literal[len(prefix)] for literal in rule if literal.startswith(prefix)}
+                candidates = [i for ch in first_chars for i in self.by_first_char.get(ch, [])]
+            for i in candidates:
+                if advance(state, self.token_text[i]) is not None:
+                    mask[i] = True
+        self._masks[state] = mask
+        return mask
+
+    def logits_processor(self):
+        return AssignmentsJSONLogitsProcessor(self)
+
+class AssignmentsJSONLogitsProcessor(LogitsProcessor):
+    """
+    Masks every token that would leave the Assignments grammar. The grammar
+    state of each row is rebuilt from its generated tokens, reusing the longest
+    prefix already seen, so it stays correct when candidate tokens are rolled
+    back (as in assisted / prompt-lookup decoding).
+    """
+    def __init__(self, grammar: AssignmentsJSONGrammar):
+        self.grammar = grammar
+        self.prompt_len = None
+        self._tokens = {}
+        self._states = {}
+
+    def row_state(self, row: int, generated):
+        tokens = self._tokens.setdefault(row, [])
+        states = self._states.setdefault(row, [START])
+        keep = 0
+        while keep < min(len(tokens), len(generated)) and tokens[keep] == generated[keep]:
+            keep += 1
+        del tokens[keep:]
+        del states[keep + 1:]
+        for token_id in generated[keep:]:
+            state = states[-1]
+            if state == END and token_id == self.grammar.eos_token_id:
+                pass  # finished rows keep receiving EOS padding
+            elif state is not None:
+                state = advance(state, self.grammar.token_text.get(token_id, "\x00"))
+            tokens.append(token_id)
+            states.append(state)
+        return states[-1]
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if self.prompt_len is None:
+            self.prompt_len = input_ids.shape[-1]
+        vocab = scores.shape[-1]
+        masks = []
+        for row in range(input_ids.shape[0]):
+            state = self.row_state(row, input_ids[row, self.prompt_len:].tolist())
+            mask = self.grammar.allowed_mask(state)
+            if vocab > mask.shape[0]:
+                mask = torch.cat([mask, torch.zeros(vocab - mask.shape[0], dtype=torch.bool)])
+            masks.append(mask[:vocab])
+        allowed = torch.stack(masks).to(scores.device)
+        return scores.masked_fill(~allowed, float("-inf"))
@@ -0,0 +1,65 @@
+import json
+
+# -----------------------------
+# Incremental JSON array parsing for streamed model output
+# -----------------------------
+class JSONArrayStreamParser:
+    """
+    Feed streamed model text in pieces and get back every object of the
+    top-level JSON array as soon as its closing brace arrives. Text before the
+    first "[" (e.g. a ```json fence) is skipped, and objects that don't parse
+    are dropped. Once the array closes, further text is ignored.
+    """
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._current = []
+
+    def feed(self, text: str):
+        """Consume a piece of text and return the objects it completed."""
+        objects = []
+        for ch in text:
+            if self.finished:
+                break
+            if not self.started:
+                if ch == "[":
+                    self.started = True
+                    self._depth = 1
+                continue
+            if self._depth > 1:
+                self._current.append(ch)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                if self._depth == 1:
+                    self._current = [ch]
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 1:
+                    obj = self._finish_object()
+                    if obj is not None:
+                        objects.append(obj)
+                elif self._depth == 0:
+                    self.finished = True
+        return objects
+
+    def _finish_object(self):
+        raw = "".join(self._current)
+        self._current = []
+        try:
+            obj = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+        return obj if isinstance(obj, dict) else None
@@ -0,0 +1,148 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# -----------------------------
+# Prometheus-style metrics (text exposition format, no client library)
+# -----------------------------
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(label_names, values) -> str:
+    if not label_names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(label_names, values)) + "}"
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label combination."""
+    def __init__(self, name: str, help_text: str, label_names=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    labels = format_labels(self.label_names + ("le",), key + (f"{bound:g}",))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = format_labels(self.label_names + ("le",), key + ("+Inf",))
+                lines.append(f"{self.name}_bucket{labels} {series['count']}")
+                labels = format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+class Counter:
+    """Monotonic counter, one series per label combination."""
+    def __init__(self, name: str, help_text: str, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.label_names, key)} {value:g}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, name: str, help_text: str, label_names=(), buckets=SECONDS_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names=()) -> Counter:
+        metric = Counter(name, help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+# Process-wide metrics shared by both extraction apps (each runs in its own
+# process, so the series never mix).
+metrics = MetricsRegistry()
+STAGE_SECONDS = metrics.histogram(
+    "extraction_stage_seconds", "Time spent in each extraction pipeline stage", ["stage"]
+)
+REQUEST_SECONDS = metrics.histogram(
+    "extraction_request_seconds", "End-to-end extraction request latency", ["endpoint", "cache"]
+)
+TOKENS = metrics.histogram(
+    "extraction_tokens", "Prompt and generated tokens per extraction request", ["kind"], TOKEN_BUCKETS
+)
+CACHE_LOOKUPS = metrics.counter(
+    "response_cache_lookups_total", "Response cache lookups by result", ["result"]
+)
+BLOCK_CACHE_LOOKUPS = metrics.counter(
+    "block_cache_lookups_total", "Block-level extraction cache lookups by result", ["result"]
+)
+BLOCK_CACHE_SAVED_SECONDS = metrics.counter(
+    "block_cache_saved_seconds_total", "Estimated extraction time saved by block cache hits"
+)
+
+class RequestTimings:
+    """
+    Stage durations of one request. Every stage is observed in
+    STAGE_SECONDS and summed per name for the Server-Timing header, so
+    stages that run once per chunk report their total time.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        STAGE_SECONDS.observe(seconds, stage=name)
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. "ner;dur=12.5, generate;dur=840.1, total;dur=860.0"."""
+        with self._lock:
+            parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.durations.items()]
+        parts.append(f"total;dur={self.total() * 1000:.1f}")
+        return ", ".join(parts)
@@ -0,0 +1,71 @@
+import glob
+import json
+import os
+import struct
+
+import torch
+
+# -----------------------------
+# Memory-mapped safetensors weights
+# -----------------------------
+# Tensors built here point straight into a private (copy-on-write) mmap of
+# the .safetensors files, so their pages live in the OS page cache and are
+# shared by every process that maps the same files instead of each worker
+# holding its own copy. Nothing writes to the weights during inference; a
+# stray in-place write would only copy that page, never touch the file.
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+def safetensors_files(model_path: str, local_files_only: bool = False):
+    """The .safetensors files of a local model directory or a hub model (from the local cache if possible)."""
+    if not os.path.isdir(model_path):
+        from huggingface_hub import snapshot_download
+        model_path = snapshot_download(model_path, allow_patterns=["*.safetensors", "*.json"], local_files_only=local_files_only)
+    files = sorted(glob.glob(os.path.join(model_path, "*.safetensors")))
+    if not files:
+        raise FileNotFoundError(f"No .safetensors files in {model_path}")
+    return files
+
+def read_header(path: str):
+    """(header dict, byte offset where the tensor data starts)."""
+    with open(path, "rb") as f:
+        header_len = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_len))
+    header.pop("__metadata__", None)
+    return header, 8 + header_len
+
+def checkpoint_dtype(files):
+    """dtype of the floating point weights stored in the checkpoint."""
+    for path in files:
+        header, _ = read_header(path)
+        for info in header.values():
+            dtype = SAFETENSORS_DTYPES[info["dtype"]]
+            if dtype.is_floating_point:
+                return dtype
+    return torch.float32
+
+def mmap_state_dict(files):
+    """State dict whose tensors are views of private mmaps of the given files."""
+    state = {}
+    for path in files:
+        header, data_start = read_header(path)
+        storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+        raw = torch.empty(0, dtype=torch.uint8).set_(storage)
+        for name, info in header.items():
+            dtype = SAFETENSORS_DTYPES[info["dtype"]]
+            start, end = info["data_offsets"]
+            data = raw[data_start + start:data_start + end]
+            if (data_start + start) % dtype.itemsize:
+                data = data.clone()  # misaligned for its dtype; only this tensor is copied
+            state[name] = data.view(dtype).reshape(info["shape"])
+    return state
@@ -0,0 +1,60 @@
+import threading
+import time
+
+# -----------------------------
+# Lazy, process-wide model registry
+# -----------------------------
+class ModelRegistry:
+    """
+    Holds the heavy models (spaCy pipelines, tokenizer, LLM) as lazy singletons.
+    A model is only loaded the first time it is requested, so importing the app
+    is cheap and a process only pays for the models it actually uses.
+    """
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+        self.created_at = time.perf_counter()
+        self.load_seconds = {}
+        self.ready = False
+        self.ready_seconds = None
+
+    def register(self, name: str, loader):
+        """Register a zero-argument loader under name (does not load it)."""
+        with self._registry_lock:
+            self._loaders[name] = loader
+            self._locks[name] = threading.Lock()
+
+    def get(self, name: str):
+        """Return the model registered under name, loading it on first use."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self._loaders:
+            raise KeyError(f"No model registered as {name!r}")
+        # one lock per model so a slow load doesn't block the others
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                start = time.perf_counter()
+                model = self._loaders[name]()
+                self.load_seconds[name] = round(time.perf_counter() - start, 3)
+                print(f"Loaded {name} in {self.load_seconds[name]}s")
+                self._models[name] = model
+        return model
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def mark_ready(self):
+        self.ready = True
+        self.ready_seconds = round(time.perf_counter() - self.created_at, 3)
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "ready_seconds": self.ready_seconds,
+            "loaded": sorted(self._models),
+            "load_seconds": dict(self.load_seconds),
+        }
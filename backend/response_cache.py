@@ -0,0 +1,131 @@
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# -----------------------------
+# Content-addressed response cache
+# -----------------------------
+def normalize_input(text: str) -> str:
+    """
+    Normalize a paste for cache keying: unify line endings, drop trailing
+    whitespace and blank lines. Leading whitespace and inner spacing are kept
+    because the tagging rules look at them.
+    """
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines if line.strip())
+
+def make_cache_key(text: str, model_name: str, year: int = None) -> str:
+    """
+    Hash of the normalized input, the model (or a setup string naming the model
+    and every setting the response depends on) and the year the prompt assumes.
+    """
+    year = year or datetime.date.today().year
+    payload = f"{model_name}\0{year}\0{normalize_input(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Two-tier cache for JSON-serializable responses: an in-memory LRU with a
+    TTL, optionally backed by a SQLite file that survives restarts and can be
+    shared by workers on the same host.
+    """
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 86400, db_path: str = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.db_path = db_path
+        # opened on first use in each process: a SQLite connection must not be
+        # used across fork, and forked workers (EXTRACTION_WORKERS) inherit this object
+        self._db = None
+        self._db_pid = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connection(self):
+        """This process's SQLite connection (None without a db_path); call with _lock held."""
+        if self.db_path is None:
+            return None
+        if self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    @classmethod
+    def from_env(cls, prefix: str = "RESPONSE_CACHE", default_size: int = 256):
+        """Build a cache from <prefix>_SIZE, <prefix>_TTL_S and <prefix>_DB."""
+        return cls(
+            max_entries=int(os.getenv(f"{prefix}_SIZE", str(default_size))),
+            ttl_seconds=float(os.getenv(f"{prefix}_TTL_S", "86400")),
+            db_path=os.getenv(f"{prefix}_DB") or None,
+        )
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            db = self._connection()
+            if db is not None:
+                row = db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+            db = self._connection()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at),
+                )
+                db.commit()
+
+    def count_lookups(self, hits: int, misses: int, disk_hits: int = 0):
+        """Add lookups made on another process's copy of this cache (e.g. a pool worker's)."""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.disk_hits += disk_hits
+
+    def _remember(self, key: str, value, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "max_size": self.max_entries,
+            "disk": self.db_path is not None,
+        }
@@ -0,0 +1,123 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from fastapi import Response
+from pydantic_core import SchemaSerializer, SchemaValidator, ValidationError, core_schema, to_json
+
+# -----------------------------
+# Shared assignment schema (both backends and ai_output_pydantic)
+# -----------------------------
+# One compact item type for every extractor. Each backend keeps its own field
+# names on the wire (Gemma: assignment/time, Gemini: name/due_time), so a
+# WireSchema maps the item's fields to them. Validation and serialization run
+# in pydantic-core straight from/to the slotted dataclass: model output is
+# validated once, and responses go out as JSON bytes through json_response
+# instead of being validated again by a response_model.
+ITEM_FIELDS = ("name", "due_date", "due_time", "source")
+
+@dataclass(slots=True)
+class AssignmentItem:
+    name: str
+    due_date: Optional[str] = None  # YYYY-MM-DD
+    due_time: Optional[str] = None  # HH:MM, 24h
+    source: Optional[str] = None  # "rule" (parsed from tags) or "llm"
+
+def optional_str_schema():
+    return core_schema.with_default_schema(core_schema.nullable_schema(core_schema.str_schema()), default=None)
+
+class WireSchema:
+    """
+    AssignmentItem under one wire format. wire_names maps item fields to the
+    names used on the wire; fields left out are neither read nor written.
+    item_type may be a subclass of AssignmentItem (without fields of its own)
+    to validate into.
+    """
+    def __init__(self, wire_names: Dict[str, str], item_type: type = AssignmentItem):
+        self.wire_names = wire_names
+        fields = [
+            core_schema.dataclass_field(
+                field,
+                core_schema.str_schema() if field == "name" else optional_str_schema(),
+                validation_alias=wire_names.get(field, field),
+                serialization_alias=wire_names.get(field, field),
+                serialization_exclude=field not in wire_names,
+            )
+            for field in ITEM_FIELDS
+        ]
+        item_schema = core_schema.dataclass_schema(
+            item_type,
+            core_schema.dataclass_args_schema("AssignmentItem", fields),
+            list(ITEM_FIELDS),
+            slots=True,
+        )
+        self._item_validator = SchemaValidator(item_schema)
+        self._list_validator = SchemaValidator(core_schema.list_schema(item_schema))
+        self._list_serializer = SchemaSerializer(core_schema.list_schema(item_schema))
+
+    def items(self, data) -> List[AssignmentItem]:
+        """Items from wire-format dicts (e.g. parsed model output); malformed ones are dropped."""
+        try:
+            return self._list_validator.validate_python(data)
+        except ValidationError:
+            items = []
+            for entry in data if isinstance(data, list) else []:
+                try:
+                    items.append(self._item_validator.validate_python(entry))
+                except ValidationError:
+                    continue
+            return items
+
+    def item(self, data) -> AssignmentItem:
+        """One item from a wire-format dict (raises pydantic_core.ValidationError)."""
+        return self._item_validator.validate_python(data)
+
+    def dump(self, items: List[AssignmentItem]) -> List[dict]:
+        """Wire-format dicts of items, as cached and returned."""
+        return self._list_serializer.to_python(items, by_alias=True)
+
+    def clean(self, data) -> List[dict]:
+        """Wire-format dicts restricted to the schema: dump(items(data))."""
+        return self.dump(self.items(data))
+
+    def json_schema(self) -> dict:
+        """JSON schema of one wire-format item, for the OpenAPI docs."""
+        properties = {}
+        for field in ITEM_FIELDS:
+            if field in self.wire_names:
+                properties[self.wire_names[field]] = (
+                    {"type": "string"} if field == "name" else {"anyOf": [{"type": "string"}, {"type": "null"}]}
+                )
+        return {"type": "object", "properties": properties, "required": [self.wire_names["name"]]}
+
+GEMMA_WIRE = WireSchema({"name": "assignment", "due_date": "due_date", "due_time": "time", "source": "source"})
+GEMINI_WIRE = WireSchema({"name": "name", "due_date": "due_date", "due_time": "due_time"})
+
+def json_response(content) -> Response:
+    """content (dicts, lists, dataclasses) serialized straight to JSON bytes."""
+    return Response(to_json(content), media_type="application/json")
+
+def assignments_schema(wire: WireSchema, **properties) -> dict:
+    """JSON schema of {"assignments": [item, ...], **properties}."""
+    return {
+        "type": "object",
+        "properties": {"assignments": {"type": "array", "items": wire.json_schema()}, **properties},
+        "required": ["assignments"],
+    }
+
+def batch_schema(document_schema: dict) -> dict:
+    """JSON schema of a batch response: {"results": {document id: result}}."""
+    document_schema = dict(document_schema, required=[])
+    document_schema["properties"] = dict(
+        document_schema["properties"],
+        cached={"type": "boolean"},
+        error={"anyOf": [{"type": "string"}, {"type": "null"}]},  # set when this document failed
+    )
+    return {
+        "type": "object",
+        "properties": {"results": {"type": "object", "additionalProperties": document_schema}},  # keyed by document id
+        "required": ["results"],
+    }
+
+def json_body(schema: dict) -> dict:
+    """responses= entry documenting the 200 body of an endpoint that returns json_response."""
+    return {200: {"content": {"application/json": {"schema": schema}}}}
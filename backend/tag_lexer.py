@@ -0,0 +1,86 @@
+import re
+
+try:
+    from backend.date_normalizer import normalize_time
+except ImportError:  # running from inside backend/
+    from date_normalizer import normalize_time
+
+# -----------------------------
+# Single-pass tagging lexer (TAGGING_MODE=lexer)
+# -----------------------------
+# lex_tagged_text gives the same text as
+#   clean_all_assignment_blocks(remove_ignore_lines(mark_tags(text)))
+# with NER_TIERS=rule, without spaCy: the rule tier's entities are the
+# DUE_DATE_PATTERN matches, the same ones the mark_tags safeguard tags, and
+# the lexer applies that pattern directly. The sm/trf tiers can tag dates the
+# pattern misses, which the lexer can't.
+DUE_DATE_PATTERN = re.compile(
+    r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2}(?: at \d{1,2}:\d{2}\s?(?:am|pm))?\b',
+    flags=re.IGNORECASE
+)
+# same split as mark_tags (the captured header words come back as their own pieces)
+BLOCK_SPLIT_PATTERN = re.compile(r'(?=(Assignment|Quiz)\b)')
+# searched in line.lower()
+IGNORE_LINE_PATTERN = re.compile(r'not available|points possible|no submission|available until')
+HEADER_LINE_PATTERN = re.compile(r'\s*(Assignment|Quiz)\s*', flags=re.IGNORECASE)
+DUE_WORD_PATTERN = re.compile(r'\bDue\b', flags=re.IGNORECASE)
+DUE_SPAN_PATTERN = re.compile(r'<DUE>.*?</DUE>')
+# a paste that already contains these tags would be split differently by the
+# regex pipeline, so the lexer leaves it to that pipeline
+TAG_LIKE_PATTERN = re.compile(r'</?(?:IGNORE|ASSIGNMENT)>', flags=re.IGNORECASE)
+
+def replace_due_match(match):
+    """DUE_DATE_PATTERN.sub callback: the matched date as a <DUE> tag, or unchanged if it doesn't parse."""
+    d, t = normalize_time(match.group(0))
+    if not d and not t:
+        return match.group(0)
+    parts = []
+    if d:
+        parts.append(f"<DATE>{d}</DATE>")
+    if t:
+        parts.append(f"<TIME>{t}</TIME>")
+    return "<DUE>" + " ".join(parts) + "</DUE>"
+
+def clean_due_tags(block_text: str):
+    """Keep only the first <DUE> tag after the 'Due' keyword and move it right after the keyword."""
+    # search for the 'Due' keyword
+    match = DUE_WORD_PATTERN.search(block_text)
+    if not match:
+        return block_text
+    before_due = block_text[:match.end()]
+    after_due = block_text[match.end():]
+    #find the first <DUE> tag in the text after 'Due'
+    first_due = DUE_SPAN_PATTERN.search(after_due)
+    if not first_due:
+        return block_text
+    #remove all <DUE> tags in the remainder and readd only the first
+    return before_due + first_due.group(0) + DUE_SPAN_PATTERN.sub('', after_due)
+
+def lex_block(block: str):
+    """Tagged and cleaned text of one raw block, or None for blocks mark_tags drops."""
+    stripped = block.strip()
+    if not stripped or stripped in ("Assignment", "Quiz"):
+        return None
+    lines = block.split("\n")
+    named = False
+    for i, line in enumerate(lines):
+        lowered = line.lower()
+        if IGNORE_LINE_PATTERN.search(lowered):
+            lines[i] = ""  # an <IGNORE> line, which remove_ignore_lines would drop again
+        elif HEADER_LINE_PATTERN.fullmatch(line):
+            lines[i] = ""
+        elif not named and line.strip() and not lowered.startswith("due"):
+            lines[i] = f"<ASSIGNMENT_NAME>{line.strip()}</ASSIGNMENT_NAME>"
+            named = True
+    marked = "<ASSIGNMENT>" + DUE_DATE_PATTERN.sub(replace_due_match, "\n".join(lines)) + "</ASSIGNMENT>"
+    return clean_due_tags("\n".join(line for line in marked.split("\n") if line.strip()))
+
+def lex_tagged_text(text: str):
+    """
+    Returns (cleaned text, number of blocks), or None when the paste already
+    contains <IGNORE>/<ASSIGNMENT> tags and must go through the regex pipeline.
+    """
+    if TAG_LIKE_PATTERN.search(text):
+        return None
+    blocks = [b for b in (lex_block(block) for block in BLOCK_SPLIT_PATTERN.split(text)) if b is not None]
+    return "\n".join(blocks), len(blocks)
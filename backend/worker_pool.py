@@ -0,0 +1,67 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Forked worker pool for CPU-bound extraction
+# -----------------------------
+# set in each worker by start_worker; lets start() wait until every worker is up
+startup_barrier = None
+
+def start_worker(init_worker, barrier):
+    global startup_barrier
+    startup_barrier = barrier
+    if init_worker is not None:
+        init_worker()
+
+def worker_started():
+    """Blocks until every worker runs it, so each worker answers exactly once."""
+    startup_barrier.wait()
+    return os.getpid()
+
+class WorkerPool:
+    """
+    Fixed pool of forked processes. start() calls preload() in the parent
+    first, so everything it loads (model weights, spaCy pipelines) is shared
+    with the workers copy-on-write instead of being loaded once per worker;
+    init_worker() then runs once in every worker before its first task.
+    Tasks must be module-level functions; results come back on Futures.
+    """
+    def __init__(self, workers: int, preload=None, init_worker=None):
+        self.workers = workers
+        self.preload = preload
+        self.init_worker = init_worker
+        self._executor = None
+        self.pids = []
+        self.start_seconds = None
+
+    def start(self):
+        start = time.perf_counter()
+        if self.preload is not None:
+            self.preload()
+        context = multiprocessing.get_context("fork")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=start_worker,
+            initargs=(self.init_worker, context.Barrier(self.workers)),
+        )
+        # one task per worker that only returns once all of them have run init_worker
+        futures = [self._executor.submit(worker_started) for _ in range(self.workers)]
+        self.pids = sorted(f.result() for f in futures)
+        self.start_seconds = round(time.perf_counter() - start, 3)
+        logger.info("Started %d extraction worker(s) in %ss: %s", self.workers, self.start_seconds, self.pids)
+
+    def submit(self, fn, *args) -> Future:
+        return self._executor.submit(fn, *args)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def status(self):
+        return {"workers": self.workers, "pids": self.pids, "start_seconds": self.start_seconds}
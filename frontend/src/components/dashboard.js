@@ -6,8 +6,11 @@ import SignIn from "./signIn";
 import AddEvent from "./addAssignment";
 import { DateTime } from "luxon";
 
+// Backend base URL; set REACT_APP_API_URL when it doesn't run on this machine
+const API_URL = process.env.REACT_APP_API_URL || "http://127.0.0.1:8000";
+
 export async function extractAssignments(text) {
-    const response = await fetch("http://127.0.0.1:8000/extract-assignments", {    
+    const response = await fetch(`${API_URL}/extract-assignments`, {
         method: "POST",
         headers: {
             "Content-Type": "application/json",
@@ -27,6 +30,53 @@ export async function extractAssignments(text) {
     }));
 }
 
+// Inserts events (Calendar API event resources) into one calendar through the
+// backend, which sends them as Calendar batch requests instead of one
+// events.insert round trip per event. Returns a per-event status list.
+export async function insertEvents(token, calendarId, events) {
+    const response = await fetch(`${API_URL}/calendar/insert-events`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            Authorization: `Bearer ${token}`,
+        },
+        body: JSON.stringify({ calendar_id: calendarId, events }),
+    });
+    if (!response.ok) {
+        throw new Error("Failed to insert events");
+    }
+    return response.json();
+}
+
+export function buildEventResource(ev, userTimeZone) {
+    let finalDueDate = ev.dueDate;
+    if (ev._scareMode) {
+        finalDueDate = DateTime.fromISO(ev.dueDate).minus({ days: 1 }).toISODate();
+    }
+
+    if (ev.time) {
+        const startDateTime = new Date(`${finalDueDate}T${ev.time}`);
+        const endDateTime = new Date(startDateTime.getTime() + 60 * 60 * 1000);
+
+        return {
+            summary: ev.title,
+            start: {
+                dateTime: startDateTime.toISOString(),
+                timeZone: userTimeZone,
+            },
+            end: {
+                dateTime: endDateTime.toISOString(),
+                timeZone: userTimeZone,
+            },
+        };
+    }
+    return {
+        summary: ev.title,
+        start: { date: finalDueDate },
+        end: { date: finalDueDate },
+    };
+}
+
 export default function Dashboard() {
     const location = window.history.state?.usr || {};
     const token = location?.token;
@@ -34,6 +84,7 @@ export default function Dashboard() {
     const [calendars, setCalendars] = useState([]);
     const [selectedCalendars, setSelectedCalendars] = useState([]);
     const [eventsByCalendar, setEventsByCalendar] = useState({});
+    const [userTimeZone, setUserTimeZone] = useState(null);
     const [showTopDropdown, setShowTopDropdown] = useState(false);
     const [showAiDropdown, setShowAiDropdown] = useState(false);
 
@@ -71,20 +122,20 @@ export default function Dashboard() {
         if (token) fetchCalendars();
     }, [token]);
 
-    // Fetch events
-    const fetchEvents = async (calendarIds) => {
-        if (!calendarIds.length) return setEventsByCalendar({});
-        const allEvents = {};
-
-        // Get user timezone from Calendar API or fallback
+    // Timezone setting, cached from the last events refresh
+    const getUserTimeZone = async () => {
+        if (userTimeZone) return userTimeZone;
         const { result } = await window.gapi.client.calendar.settings.get({ setting: "timezone" });
-        const userTimeZone = result?.value || Intl.DateTimeFormat().resolvedOptions().timeZone;
+        return result?.value || Intl.DateTimeFormat().resolvedOptions().timeZone;
+    };
 
-        // Calculate start and end of the day in user’s TZ, then convert to UTC ISO
-        const todayInUserTimeZone = DateTime.now().setZone(userTimeZone);
-        const startOfDayUTC = todayInUserTimeZone.startOf("day").toUTC().toISO(); //display events for the entire day
+    // Fetch events straight from Google, one events.list per calendar
+    const fetchEventsDirect = async (calendarIds) => {
+        const allEvents = {};
+        const timeZone = await getUserTimeZone();
 
-        console.log("Start:", startOfDayUTC);
+        // Calculate start of the day in user’s TZ, then convert to UTC ISO
+        const startOfDayUTC = DateTime.now().setZone(timeZone).startOf("day").toUTC().toISO();
 
         for (let id of calendarIds) {
             try {
@@ -102,8 +153,44 @@ export default function Dashboard() {
                 allEvents[id] = [];
             }
         }
-
         setEventsByCalendar(allEvents);
+        setUserTimeZone(timeZone);
+    };
+
+    // Fetch events: the backend lists every selected calendar concurrently and
+    // only pulls what changed since the last refresh (see calendar_sync.py).
+    // When the backend can't be reached, list them from Google directly.
+    const fetchEvents = async (calendarIds) => {
+        if (!calendarIds.length) return setEventsByCalendar({});
+        let data;
+        try {
+            const response = await fetch(`${API_URL}/calendar/events`, {
+                method: "POST",
+                headers: {
+                    "Content-Type": "application/json",
+                    Authorization: `Bearer ${token}`,
+                },
+                body: JSON.stringify({ calendar_ids: calendarIds, max_results: 50 }),
+            });
+            if (!response.ok) {
+                throw new Error("Failed to fetch events");
+            }
+            data = await response.json();
+        } catch (err) {
+            console.error("Backend events listing failed, using the Calendar API:", err);
+            try {
+                window.gapi.client.setToken({ access_token: token });
+                await fetchEventsDirect(calendarIds);
+            } catch (err) {
+                console.error("Error fetching events:", err);
+            }
+            return;
+        }
+        for (const [id, err] of Object.entries(data.errors || {})) {
+            console.error(`Error fetching events for calendar ${id}:`, err);
+        }
+        setEventsByCalendar(data.events_by_calendar);
+        setUserTimeZone(data.timezone);
     };
 
 
@@ -159,38 +246,9 @@ export default function Dashboard() {
     const handleAddAssignment = async (ev, calendarId) => {
         if (!calendarId) return alert("Please choose a calendar!");
     
-        let finalDueDate = ev.dueDate;
-        if (ev._scareMode) {
-            finalDueDate = DateTime.fromISO(ev.dueDate).minus({ days: 1 }).toISODate();
-        }
-    
-        const { result } = await window.gapi.client.calendar.settings.get({ setting: "timezone" });
-        const userTimeZone = result?.value || Intl.DateTimeFormat().resolvedOptions().timeZone;
-    
-        let eventResource;
+        const timeZone = await getUserTimeZone();
     
-        if (ev.time) {
-            const startDateTime = new Date(`${finalDueDate}T${ev.time}`);
-            const endDateTime = new Date(startDateTime.getTime() + 60 * 60 * 1000);
-    
-            eventResource = {
-                summary: ev.title,
-                start: {
-                    dateTime: startDateTime.toISOString(),
-                    timeZone: userTimeZone,
-                },
-                end: {
-                    dateTime: endDateTime.toISOString(),
-                    timeZone: userTimeZone,
-                },
-            };
-        } else {
-            eventResource = {
-                summary: ev.title,
-                start: { date: finalDueDate },
-                end: { date: finalDueDate },
-            };
-        }
+        const eventResource = buildEventResource(ev, timeZone);
     
         try {
             await window.gapi.client.calendar.events.insert({
@@ -203,6 +261,34 @@ export default function Dashboard() {
             console.error("Failed to add AI assignment:", err);
         }
     };
+
+    // Add every AI assignment in one request per calendar
+    const handleAddAllAssignments = async () => {
+        if (aiEvents.some((ev) => !ev._chosenCalendar)) return alert("Please choose a calendar for every assignment!");
+
+        const timeZone = await getUserTimeZone();
+
+        const byCalendar = {};
+        for (const ev of aiEvents) {
+            if (!byCalendar[ev._chosenCalendar]) byCalendar[ev._chosenCalendar] = [];
+            byCalendar[ev._chosenCalendar].push(ev);
+        }
+
+        const added = new Set();
+        for (const [calendarId, evs] of Object.entries(byCalendar)) {
+            try {
+                const { results } = await insertEvents(token, calendarId, evs.map((ev) => buildEventResource(ev, timeZone)));
+                results.forEach((r) => {
+                    if (r.status === "inserted") added.add(evs[r.index]);
+                    else console.error(`Failed to add "${evs[r.index].title}":`, r.error);
+                });
+            } catch (err) {
+                console.error("Failed to add AI assignments:", err);
+            }
+        }
+        fetchEvents(selectedCalendars);
+        setAiEvents((prev) => prev.filter((e) => !added.has(e)));
+    };
     // const isDarkMode = window.matchMedia && window.matchMedia('(prefers-color-scheme: dark)').matches;
 
 
@@ -281,6 +367,15 @@ export default function Dashboard() {
                                                 Extract Assignments
                                             </button>
 
+                                            {aiEvents.length > 0 && (
+                                                <button
+                                                    onClick={handleAddAllAssignments}
+                                                    className="bg-blue-500 hover:bg-blue-600 text-white px-3 py-1 rounded w-full mb-2"
+                                                >
+                                                    Add All
+                                                </button>
+                                            )}
+
                                             {aiEvents.length === 0 && <p className="text-gray-500 text-sm">No AI-generated events yet. <br></br> NOTE: Currently, AI-Generation is only available on localhost.</p>}
 
                                             {aiEvents.map((ev, i) => (